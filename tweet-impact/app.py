@@ -1,17 +1,44 @@
 # app.py — minimalistyczna aplikacja Flask do przeglądu tweetów i wykresu 15 min
 from flask import Flask, render_template, request, jsonify, abort
-import os, glob
+import os, glob, functools, threading
+import numpy as np
 import pandas as pd
-from datetime import timedelta
 from zoneinfo import ZoneInfo
-from bisect import bisect_left
+
+from prices import load_prices, list_price_files, tree_signature, files_end_ns
+from symbols import SymbolRegistry, symbol_for_dir, parse_symbols
+from tweets import empty_tweets, load_tweet_table, normalize_tweets, filter_tweets
+from price_store import PriceStore, PartitionedPriceStore, open_price_store, ts_ns, NS_PER_MIN
+from tweet_index import TweetIndex
+from response_cache import ResponseCache, make_etag
+from downsample import parse_resample, downsample_window, MAX_POINTS_MIN
+import event_study
+from impact_stats import ImpactMatrix, GROUP_COLUMNS, DEFAULT_QUANTILES
+from http_encoding import dumps, pick_encoding, compress, JSON_MIMETYPE
+import metrics
+from metrics import phase, startup_phase
+from warmup import Warmup
+from ingest import Watcher, AppendedCsv
 
 DISPLAY_TZ = ZoneInfo("Europe/Warsaw")
 PRICES_SOURCE_TZ = "Europe/Warsaw"
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-TWEETS_CSV = os.path.join(BASE_DIR, "data", "all_musk_posts.csv")
-PRICES_DIR = os.path.join(BASE_DIR, "data", "TSLA_sorted")
+# ścieżki danych można nadpisać zmiennymi środowiska (np. bench.py na danych syntetycznych)
+TWEETS_CSV = os.environ.get("TWEETS_CSV") or os.path.join(BASE_DIR, "data", "all_musk_posts.csv")
+PRICES_DIR = os.environ.get("PRICES_DIR") or os.path.join(BASE_DIR, "data", "TSLA_sorted")
+# symbol domyślny (PRICES_DIR, rozgrzewany na starcie); inne data/<SYMBOL>_sorted — leniwie (symbols.py)
+PRICES_SYMBOL = symbol_for_dir(PRICES_DIR)
+# liczba procesów do parsowania CSV cen przy przebudowie cache (0 = wszystkie rdzenie)
+PRICES_WORKERS = int(os.environ.get("PRICES_WORKERS", "0") or 0)
+# PRICES_PARTITIONED=1: lata cen ładowane leniwie (LRU), w pamięci najwyżej ~PRICES_MEMORY_LIMIT_MB
+PRICES_PARTITIONED = os.environ.get("PRICES_PARTITIONED", "0") == "1"
+PRICES_MEMORY_LIMIT_MB = int(os.environ.get("PRICES_MEMORY_LIMIT_MB", "512") or 512)
+# APP_WARMUP=background (domyślnie): dane wczytywane w wątku, import app.py nie czeka;
+# APP_WARMUP=sync: wczytanie przy imporcie (gunicorn preload_app, narzędzia potrzebujące danych od razu)
+APP_WARMUP = (os.environ.get("APP_WARMUP", "background") or "background").lower()
+# co ile sekund sprawdzać nowe / zmienione pliki cen i dopisane tweety (0 = bez obserwatora)
+DATA_WATCH_INTERVAL = float(os.environ.get("DATA_WATCH_INTERVAL", "30") or 0)
 
 app = Flask(
     __name__,
@@ -19,194 +46,357 @@ app = Flask(
     static_folder=os.path.join(BASE_DIR, "static"),
 )
 
-def to_utc(series, source_tz: str):
-    """
-    Zamienia kolumnę czasu na tz-aware UTC.
-    - Jeśli wartości mają już strefę (np. '2025-03-10 15:31:00+01:00') -> tylko konwersja do UTC.
-    - Jeśli są 'naive' (bez strefy), interpretuj je jako source_tz (u Ciebie Europe/Warsaw), potem do UTC.
-    Obsługuje zmiany czasu (DST).
-    """
-    s = pd.to_datetime(series, errors="coerce", utc=False)
-
-    # tz-aware?
-    try:
-        has_tz = s.dt.tz is not None
-    except Exception:
-        has_tz = False
-
-    if has_tz:
-        return s.dt.tz_convert("UTC")
-
-    # Naive -> potraktuj jako lokalne Europe/Warsaw
-    tz = ZoneInfo(source_tz)
-    # pandas>=2.2: parametry dla DST; jeśli masz 2.1, usuń je
-    s = s.dt.tz_localize(tz, nonexistent="shift_forward", ambiguous="NaT")
-    return s.dt.tz_convert("UTC")
-
 # ===== Loader: Tweety =====
+TWEETS_PRICES_MIN = "2017-09-17 21:00:00+00:00"
+# górna granica tweetów (start, przeładowanie, wiersze dopisane na żywo) — domyślnie koniec bieżących
+# cen, więc rośnie razem z dniami dociąganymi przez obserwatora; TWEETS_PRICES_MAX w środowisku to jawne
+# nadpisanie (data albo "" = bez granicy)
+TWEETS_PRICES_MAX = os.environ.get("TWEETS_PRICES_MAX")
+
 def load_tweets(
     csv_path: str = TWEETS_CSV,
-    prices_min: str = "2017-09-17 21:00:00+00:00",
-    prices_max: str = "2025-03-07 20:54:00+00:00"
+    prices_min: str = TWEETS_PRICES_MIN,
+    prices_max: str = None,
+    use_cache: bool = True,
 ) -> pd.DataFrame:
     if not os.path.exists(csv_path):
         print(f"[startup] Brak pliku tweetów: {csv_path}")
-        return pd.DataFrame(columns=["tweet_id", "text", "created_at", "isReply", "isRetweet", "isQuote"])
-
-    df = pd.read_csv(csv_path, low_memory=False)
-    df["tweet_id"] = df["id"] if "id" in df.columns else range(1, len(df) + 1)
-    df["text"] = df["fullText"].fillna("") if "fullText" in df.columns else df.get("text", "").fillna("")
-
-    if "createdAt" not in df.columns:
-        raise ValueError("Brakuje kolumny 'createdAt' w pliku z tweetami.")
-    # createdAt -> UTC
-    df["created_at"] = pd.to_datetime(df["createdAt"], errors="coerce", utc=True)
+        return empty_tweets()
 
-    for flag in ["isReply", "isRetweet", "isQuote"]:
-        if flag not in df.columns:
-            df[flag] = False
+    # typowane parsowanie + snapshot binarny (data/.cache/) — patrz tweets.py
+    return filter_tweets(load_tweet_table(csv_path, use_cache=use_cache), prices_min, prices_max,
+                         session=True, ascending=False)
 
-    # --- FILTR zakresu czasowego ---
-    prices_min = pd.to_datetime(prices_min, utc=True)
-    prices_max = pd.to_datetime(prices_max, utc=True)
-    df = df[(df["created_at"] >= prices_min) & (df["created_at"] <= prices_max)]
 
-    df = df.dropna(subset=["created_at"]).sort_values("created_at", ascending=False).reset_index(drop=True)
-    # >>> tylko tweety z godzin 15:30–21:45 czasu PL (uwzględnia DST)
-    _local = df["created_at"].dt.tz_convert(DISPLAY_TZ)
-    mask = (
-        ((_local.dt.hour > 15) | ((_local.dt.hour == 15) & (_local.dt.minute >= 35))) &
-        ((_local.dt.hour < 21) | ((_local.dt.hour == 21) & (_local.dt.minute <= 50)))
-    )
-    df = df[mask].reset_index(drop=True)
-
-    return df[["tweet_id", "text", "created_at", "isReply", "isRetweet", "isQuote"]]
+def prepare_tweets(df: pd.DataFrame, prices_min=TWEETS_PRICES_MIN, prices_max=None) -> pd.DataFrame:
+    """
+    Surowe wiersze CSV tweetów -> TWEET_COLUMNS, od najnowszych, tylko zakres cen i godziny sesji
+    15:35–21:50 czasu PL. prices_max=None: bez górnej granicy.
+    """
+    return filter_tweets(normalize_tweets(df), prices_min, prices_max, session=True, ascending=False)
 
 
-def load_prices_from_dir(base_dir: str = PRICES_DIR) -> pd.DataFrame:
+def _has_price_files(base_dir: str) -> bool:
     if not os.path.isdir(base_dir):
         print(f"[startup] Brak katalogu cen: {base_dir}")
-        return pd.DataFrame(columns=["datetime", "open", "high", "low", "close"])
-
-    files = glob.glob(os.path.join(base_dir, "**", "*.csv"), recursive=True)
-    if not files:
+        return False
+    if not glob.glob(os.path.join(base_dir, "**", "*.csv"), recursive=True):
         print(f"[startup] Nie znaleziono CSV w {base_dir}")
-        return pd.DataFrame(columns=["datetime", "open", "high", "low", "close"])
+        return False
+    return True
 
-    frames = []
-    for path in files:
-        try:
-            raw = pd.read_csv(path, low_memory=False)
-
-            # wybierz kolumnę czasu
-            dt_col = next((c for c in ["datetime", "time", "timestamp", "date", "Date", "Time"] if c in raw.columns), None)
-            if not dt_col:
-                continue
-
-            def pick(col):
-                if col in raw.columns: return raw[col]
-                if col.capitalize() in raw.columns: return raw[col.capitalize()]
-                if col.upper() in raw.columns: return raw[col.upper()]
-                raise KeyError(col)
-            
-            part = pd.DataFrame({
-                "datetime": to_utc(raw[dt_col], PRICES_SOURCE_TZ),  # <--- TYLKO TA ZMIANA
-                "open":  pd.to_numeric(pick("open"), errors="coerce"),
-                "high":  pd.to_numeric(pick("high"), errors="coerce"),
-                "low":   pd.to_numeric(pick("low"),  errors="coerce"),
-                "close": pd.to_numeric(pick("close"),errors="coerce"),
-            }).dropna(subset=["datetime"])
-
-            frames.append(part)
-        except Exception as e:
-            print(f"[prices] pomijam {path}: {e}")
-            continue
-
-    if not frames:
+
+def load_prices_from_dir(base_dir: str = PRICES_DIR, use_cache: bool = True,
+                         workers: int = PRICES_WORKERS) -> pd.DataFrame:
+    if not _has_price_files(base_dir):
         return pd.DataFrame(columns=["datetime", "open", "high", "low", "close"])
 
-    all_prices = pd.concat(frames, ignore_index=True)
-    all_prices = all_prices.sort_values("datetime").reset_index(drop=True)
-    return all_prices
+    # parsowanie + cache binarny (data/.cache/) — patrz prices.py
+    return load_prices(base_dir, PRICES_SOURCE_TZ, use_cache=use_cache, workers=workers)
+
+
+def load_price_store(base_dir: str = PRICES_DIR, use_cache: bool = True,
+                     workers: int = PRICES_WORKERS, progress=None) -> PriceStore:
+    """
+    Magazyn cen wprost nad cache .npy (mmap) — workery gunicorna mapują te same pliki,
+    więc dane cen są w pamięci raz, niezależnie od liczby workerów (patrz gunicorn.conf.py).
+    """
+    if not _has_price_files(base_dir):
+        return PriceStore(None)
+    return open_price_store(base_dir, PRICES_SOURCE_TZ, use_cache=use_cache, workers=workers,
+                            progress=progress)
 
 # ===== Inicjalizacja =====
-TWEETS_DF = load_tweets()
-PRICES_DF = load_prices_from_dir()
+# Na start puste dane; etapy rozgrzewania podmieniają je, gdy są gotowe (tweety zwykle przed cenami).
+# (czasy faz startu -> log + /metrics: tweet_impact_startup_seconds)
+TWEETS_DF = empty_tweets()
+TWEET_INDEX = TweetIndex(TWEETS_DF, DISPLAY_TZ)
+PRICE_STORE = PriceStore(None)
+# całej ramki cen nie trzymamy — gdy naprawdę potrzebna: PRICE_STORE.df (budowana przy pierwszym użyciu)
+PRICES_DF = None
+# macierz % zmian tweety × +1..+60 min pod /api/stats — migawka dla pary (TWEET_INDEX, PRICE_STORE);
+# generation 0 = jeszcze nie policzona (przy PRICES_PARTITIONED liczona dopiero przy pierwszym /api/stats)
+IMPACT_MATRIX = ImpactMatrix(TWEET_INDEX, PRICE_STORE)
+IMPACT_MATRIX_LOCK = threading.Lock()
+WARMUP = Warmup(("tweets", "prices", "stats"))
+TWEETS_WATCH = AppendedCsv(TWEETS_CSV)
+TWEETS_BOUND = None   # górna granica (tweets_prices_max), z którą wczytano bieżące TWEETS_DF
+PRICES_SIGNATURE = []
+
+
+def tweets_prices_max():
+    """
+    Górna granica tweetów: TWEETS_PRICES_MAX (nadpisanie; "" = bez granicy), inaczej koniec doby ostatniego
+    pliku cen bieżącego PRICE_STORE (PRICES_SIGNATURE) — a zanim ceny się rozgrzeją (tweety idą pierwsze):
+    ostatniego pliku na dysku. Z sygnatury, więc bez czytania cen (także przy PRICES_PARTITIONED).
+    """
+    if TWEETS_PRICES_MAX is not None:
+        return TWEETS_PRICES_MAX or None
+    if PRICES_SIGNATURE:
+        last = files_end_ns([rel for rel, _, _ in PRICES_SIGNATURE], PRICES_SOURCE_TZ)
+    else:
+        last = files_end_ns(list_price_files(PRICES_DIR), PRICES_SOURCE_TZ) if os.path.isdir(PRICES_DIR) else None
+    return None if last is None else pd.Timestamp(last, tz="UTC")
+
+
+def _warm_tweets():
+    global TWEETS_DF, TWEET_INDEX, TWEETS_BOUND
+    TWEETS_WATCH.mark()   # stan pliku PRZED wczytaniem — co dopisze się w trakcie, dociągnie obserwator
+    TWEETS_BOUND = tweets_prices_max()
+    with startup_phase("load_tweets"):
+        df = load_tweets(prices_max=TWEETS_BOUND)
+    WARMUP.progress("tweets", 1, 2)
+    # indeks filtrów listy (flagi, lata, LRU wyników) — budowany raz
+    with startup_phase("tweet_index"):
+        index = TweetIndex(df, DISPLAY_TZ)
+    TWEET_INDEX, TWEETS_DF = index, df
+    WARMUP.progress("tweets", 2, 2)
+
+
+def _price_tree_signature(base_dir: str = PRICES_DIR) -> list:
+    return tree_signature(base_dir, list_price_files(base_dir)) if os.path.isdir(base_dir) else []
+
+
+def _open_prices(progress=None, base_dir: str = PRICES_DIR):
+    # indeks cen (searchsorted po int64 ns) nad mmap cache; postęp = pliki CSV przy przebudowie cache
+    if PRICES_PARTITIONED and os.path.isdir(base_dir):
+        return PartitionedPriceStore(base_dir, PRICES_SOURCE_TZ, PRICES_MEMORY_LIMIT_MB * 2**20,
+                                     workers=PRICES_WORKERS)
+    return load_price_store(base_dir, progress=progress)
+
+
+def _warm_prices():
+    global PRICE_STORE, PRICES_SIGNATURE
+    PRICES_SIGNATURE = _price_tree_signature()
+    with startup_phase("price_store"):
+        PRICE_STORE = _open_prices(progress=lambda done, total: WARMUP.progress("prices", done, total))
+
+
+# pozostałe symbole (benchmarki) otwierane przy pierwszym żądaniu; domyślny to zawsze bieżący PRICE_STORE
+SYMBOLS = SymbolRegistry(os.path.dirname(os.path.abspath(PRICES_DIR)),
+                         opener=lambda path: _open_prices(base_dir=path), signature=_price_tree_signature,
+                         pinned={PRICES_SYMBOL: (PRICES_DIR, lambda: PRICE_STORE)})
+
+
+def _warm_stats():
+    # ceny partycjonowane: macierz wciągnęłaby na starcie całą historię (wszystkie lata) mimo limitu
+    # pamięci — liczymy ją leniwie, przy pierwszym /api/stats (current_impact_matrix)
+    if isinstance(PRICE_STORE, PartitionedPriceStore):
+        print("[startup] impact_matrix: przy pierwszym /api/stats (ceny partycjonowane)")
+        return
+    with startup_phase("impact_matrix"):
+        current_impact_matrix()
+
+
+def current_impact_matrix() -> ImpactMatrix:
+    """Migawka dla bieżących (TWEET_INDEX, PRICE_STORE) — przeliczana (tylko dotknięte wiersze), gdy nieaktualna."""
+    global IMPACT_MATRIX
+    matrix = IMPACT_MATRIX
+    if matrix.index is TWEET_INDEX and matrix.store is PRICE_STORE:
+        return matrix
+    with IMPACT_MATRIX_LOCK:   # równoległe żądania liczą macierz raz
+        IMPACT_MATRIX = IMPACT_MATRIX.refreshed(TWEET_INDEX, PRICE_STORE)
+        return IMPACT_MATRIX
+
+
+WARMUP_STEPS = [("tweets", _warm_tweets), ("prices", _warm_prices), ("stats", _warm_stats)]
+# procesy pul (forkserver / spawn) importują uruchomiony app.py jako __mp_main__ — tam bez rozgrzewania
+if __name__ == "__mp_main__":
+    pass
+elif APP_WARMUP == "sync":
+    WARMUP.run(WARMUP_STEPS)
+else:
+    WARMUP.start(WARMUP_STEPS)
+
+
+# ===== Dociąganie nowych danych (bez restartu) =====
+# Obserwator (ingest.py) co DATA_WATCH_INTERVAL s: nowe / zmienione pliki dzienne cen -> cache .npy
+# aktualizowany tylko o te pliki (prices.update_cache_arrays), dopisane wiersze tweetów -> scalenie.
+# Nowy magazyn / indeks budujemy obok i podmieniamy jednym przypisaniem globala; endpointy biorą
+# referencję raz na żądanie, więc trwające żądania kończą na starych danych, nowe widzą nowe.
+def _ingest_prices() -> bool:
+    global PRICE_STORE, PRICES_SIGNATURE
+    signature = _price_tree_signature()
+    if signature == PRICES_SIGNATURE:
+        return False
+    store = _open_prices()
+    PRICE_STORE, PRICES_SIGNATURE = store, signature
+    print(f"[ingest] ceny: nowa wersja {store.version}")
+    return True
+
+
+def _ingest_symbols() -> bool:
+    changed = SYMBOLS.refresh()
+    if changed:
+        print(f"[ingest] symbole: odświeżono {', '.join(changed)}")
+    return bool(changed)
+
+
+def _ingest_tweets() -> bool:
+    global TWEETS_DF, TWEET_INDEX, TWEETS_BOUND
+    change = TWEETS_WATCH.poll()
+    prices_max = tweets_prices_max()   # po _ingest_prices — obejmuje dni cen dociągnięte w tym obiegu
+    if prices_max != TWEETS_BOUND:
+        # granica się przesunęła (nowe dni cen): wcześniej odrzucone tweety z tych dni wracają — jak po restarcie
+        TWEETS_WATCH.mark()
+        change = ("reload", None)
+    if change is None:
+        return False
+    kind, rows = change
+    TWEETS_BOUND = prices_max
+    if kind == "reload":
+        df = load_tweets(prices_max=prices_max)
+        index = TweetIndex(df, DISPLAY_TZ)
+    else:
+        # dopisane wiersze doklejane do istniejących indeksów (tablice, postings) — bez pełnej przebudowy
+        index = TWEET_INDEX.appended(prepare_tweets(rows, TWEETS_PRICES_MIN, prices_max))
+        if index is TWEET_INDEX:
+            return False
+        df = index.df
+    TWEET_INDEX, TWEETS_DF = index, df
+    print(f"[ingest] tweety: {len(df)} wierszy ({kind})")
+    return True
+
+
+def _ingest_stats() -> bool:
+    """Po podmianie cen / tweetów: przelicz tylko dotknięte wiersze macierzy /api/stats."""
+    previous = IMPACT_MATRIX
+    if previous.generation == 0:   # jeszcze nie policzona (leniwa) — policzy ją pierwsze /api/stats
+        return False
+    matrix = current_impact_matrix()
+    if matrix is previous:
+        return False
+    print(f"[ingest] statystyki: przeliczono {matrix.computed} z {len(matrix.index)} wierszy")
+    return True
+
+
+DATA_WATCHER = Watcher(DATA_WATCH_INTERVAL, [("prices", _ingest_prices), ("symbols", _ingest_symbols),
+                                             ("tweets", _ingest_tweets), ("stats", _ingest_stats)])
+
+
+def start_watcher():
+    """
+    Obserwator danych (rusza po rozgrzaniu) — opt-in: wołany z __main__ i z post_fork gunicorna
+    (wątek nie przeżyłby forka); sam import app.py (narzędzia, bench) nie startuje wątku.
+    Przebudowy cache między workerami serializuje blokada plikowa (prices.cache_lock).
+    """
+    if DATA_WATCH_INTERVAL > 0:
+        DATA_WATCHER.start(wait_for=WARMUP.wait)
+
+
+if os.environ.get("DATA_WATCH_AUTOSTART", "0") == "1":
+    start_watcher()
 
 # ===== Pomocnicze =====
 def slice_prices_for_window(start_dt_utc: pd.Timestamp, minutes: int = 15):
-    """Zwraca (df_window, used_start, reason) — reason in ["ok","fallback_next","no_data"]"""
-    if PRICES_DF.empty:
-        return PRICES_DF.copy(), start_dt_utc, "no_data"
-
-    end_dt = start_dt_utc + timedelta(minutes=minutes)
-    win = PRICES_DF[(PRICES_DF["datetime"] >= start_dt_utc) &
-                    (PRICES_DF["datetime"] <= end_dt)].copy()
-    if not win.empty:
-        return win, start_dt_utc, "ok"
-
-    # fallback: najbliższy punkt >= start
-    ts_ns = PRICES_DF["datetime"].astype("int64").values
-    pos = bisect_left(ts_ns, int(start_dt_utc.value))
-    if pos < len(PRICES_DF):
-        new_start = PRICES_DF.iloc[pos]["datetime"]
-        new_end = new_start + timedelta(minutes=minutes)
-        win2 = PRICES_DF[(PRICES_DF["datetime"] >= new_start) &
-                         (PRICES_DF["datetime"] <= new_end)].copy()
-        if not win2.empty:
-            return win2, new_start, "fallback_next"
-
-    return PRICES_DF.iloc[0:0].copy(), start_dt_utc, "no_data"
+    """Zwraca (df_window, used_start, reason) — reason in ["ok","fallback_next","no_data"]
+    df_window traktuj jako tylko do odczytu."""
+    return PRICE_STORE.window(start_dt_utc, minutes)
 
 # ===== NOWE: wycinek w sztywnych granicach (bez fallbacku) =====
 def slice_prices_between(start_dt_utc: pd.Timestamp, end_dt_utc: pd.Timestamp):
     """
-    Zwraca df z PRICES_DF dla [start_dt_utc, end_dt_utc] BEZ żadnego przesuwania.
+    Zwraca df cen dla [start_dt_utc, end_dt_utc] BEZ żadnego przesuwania.
+    Wyszukiwanie binarne; wynik to widok (tylko do odczytu).
     """
-    if PRICES_DF.empty:
-        return PRICES_DF.iloc[0:0].copy()
-    return PRICES_DF[(PRICES_DF["datetime"] >= start_dt_utc) &
-                     (PRICES_DF["datetime"] <= end_dt_utc)].copy()
+    with phase("slice"):
+        return PRICE_STORE.between(start_dt_utc, end_dt_utc)
 
 # ===== Procentowe zmiany względem chwili tweeta =====
 def _minute_close_at(dt_utc: pd.Timestamp):
-    """Zwróć kurs close w minucie dt_utc (ostatni tick w tej minucie). Gdy brak – None."""
-    if PRICES_DF.empty:
-        return None
-    minute = pd.Timestamp(dt_utc).floor("min")
-    dfm = PRICES_DF.copy()
-    dfm["minute"] = dfm["datetime"].dt.floor("min")
-    row = (dfm[dfm["minute"] == minute].sort_values("datetime").tail(1))
-    return None if row.empty else float(row.iloc[0]["open"]) #wedlug mnie powinno byc w open
+    """Zwróć kurs w minucie dt_utc (OPEN ostatniego ticku w tej minucie). Gdy brak – None."""
+    vals, found = PRICE_STORE.open_at_minutes([ts_ns(dt_utc) // NS_PER_MIN])
+    return float(vals[0]) if found[0] else None #wedlug mnie powinno byc w open
 
 def percent_changes_from(start_dt_utc: pd.Timestamp,
                          intervals=(1,2,3,4,5,6,7,8,9,10,15,30,60)):
     """
     Zwraca słownik {minuty: %zmiana} liczony względem ceny w minucie tweeta.
     Jeśli brak ceny w danej minucie – wartość to None.
+    Jeden wektorowy lookup po indeksie minut PRICE_STORE (bez kopiowania cen).
     """
-    base = _minute_close_at(start_dt_utc)
-    out = {}
-    for m in intervals:
-        price = _minute_close_at(start_dt_utc + pd.Timedelta(minutes=m))
-        if base is not None and price is not None:
-            out[m] = round((price - base) / base * 100, 2)
-        else:
-            out[m] = None
-    return out
+    with phase("pct"):
+        return PRICE_STORE.percent_changes(start_dt_utc, intervals)
 
 
 # ===== Trasy =====
+WARMUP_RETRY_AFTER = 1   # s — podpowiedź dla klienta, kiedy ponowić żądanie w trakcie rozgrzewania
+
+def warmup_response(*stages):
+    """
+    None, gdy etapy rozgrzewania są gotowe; inaczej odpowiedź 503
+    {"reason": "warming_up" | "data_error", "warmup": {...}} z nagłówkiem Retry-After.
+    """
+    if all(WARMUP.ready(st) for st in stages):
+        return None
+    state = WARMUP.snapshot()
+    failed = any(state[st]["state"] == "error" for st in stages)
+    resp = jsonify({"reason": "data_error" if failed else "warming_up",
+                    "warmup": {st: state[st] for st in stages}})
+    resp.status_code = 503
+    if not failed:
+        resp.headers["Retry-After"] = str(WARMUP_RETRY_AFTER)
+    return resp
+
+
+def requires_data(*stages):
+    """Dekorator endpointów danych: dopóki etapy rozgrzewania nie są gotowe, od razu 503 (warmup_response)."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            busy = warmup_response(*stages)
+            return fn(*args, **kwargs) if busy is None else busy
+        return wrapper
+    return decorator
+
+
 @app.route("/health")
 def health():
-    return jsonify({
-        "tweets_rows": int(len(TWEETS_DF)),
-        "prices_rows": int(len(PRICES_DF)),
-        "tweets_min": str(TWEETS_DF["created_at"].min()) if len(TWEETS_DF) else None,
-        "tweets_max": str(TWEETS_DF["created_at"].max()) if len(TWEETS_DF) else None,
-        "prices_min": str(PRICES_DF["datetime"].min()) if len(PRICES_DF) else None,
-        "prices_max": str(PRICES_DF["datetime"].max()) if len(PRICES_DF) else None,
-    })
+    tweets, prices = TWEET_INDEX.df, PRICE_STORE.describe()
+    out = {
+        "ready": WARMUP.ready(),
+        "warmup": WARMUP.snapshot(),
+        "ingest": DATA_WATCHER.snapshot(),
+        "tweets_rows": int(len(tweets)),
+        "prices_rows": prices["rows"],
+        "tweets_min": str(tweets["created_at"].min()) if len(tweets) else None,
+        "tweets_max": str(tweets["created_at"].max()) if len(tweets) else None,
+        "prices_min": prices["min"],
+        "prices_max": prices["max"],
+        "symbols": SYMBOLS.describe(),
+        "stats": {"version": IMPACT_MATRIX.version, "rows": int(len(IMPACT_MATRIX.pct)),
+                  "mb": round(IMPACT_MATRIX.nbytes / 2**20, 1)},
+    }
+    if "partitions" in prices:
+        out["prices_partitions"] = prices["partitions"]
+    return jsonify(out)
+
+
+# ---- instrumentacja: Server-Timing dla każdego żądania + /metrics (Prometheus) ----
+@app.before_request
+def _begin_timing():
+    metrics.begin_request(request.endpoint or "unknown")
+
+
+@app.after_request
+def _end_timing(resp):
+    timing = metrics.end_request(resp.status_code)
+    if timing is not None:
+        resp.headers["Server-Timing"] = metrics.server_timing(*timing)
+    return resp
+
+
+metrics.REGISTRY.register(metrics.Gauge(
+    "tweet_impact_data_rows", "Wiersze wczytanych danych (ceny: załadowane partycje).",
+    fn=lambda: [({"data": "tweets"}, len(TWEET_INDEX)), ({"data": "prices"}, PRICE_STORE.describe()["rows"])]))
+metrics.REGISTRY.register(metrics.Gauge(
+    "tweet_impact_response_cache_total", "Trafienia / chybienia cache odpowiedzi /api/price.", kind="counter",
+    fn=lambda: [({"result": "hit"}, PRICE_RESPONSE_CACHE.hits), ({"result": "miss"}, PRICE_RESPONSE_CACHE.misses)]))
+
+
+@app.route("/metrics")
+def metrics_endpoint():
+    return app.response_class(metrics.REGISTRY.render(), content_type=metrics.PROMETHEUS_CONTENT_TYPE)
 
 
 @app.route("/")
@@ -214,125 +404,115 @@ def index():
     """Widok 2-kolumnowy: lewa – lista, prawa – szczegóły."""
     # Na wejściu pokaż pierwszy tweet (jeśli jest), resztę JS dociągnie.
     initial_id = None
-    if len(TWEETS_DF):
-        initial_id = str(TWEETS_DF.iloc[0]["tweet_id"])
+    tweets = TWEET_INDEX.df
+    if len(tweets):
+        initial_id = str(tweets.iloc[0]["tweet_id"])
     return render_template("index.html", initial_id=initial_id)
 
 # ---- API: lista tweetów z filtrami + paginacja ----
-@app.route("/api/tweets")
-def api_tweets():
-    """
-    Query params:
-      page (int, default 1), per_page (int, default 20)
-      year (int albo 'all')
-      reply, retweet, quote: '1' włącza filtr 'tylko takie'; '0' ignoruje
-      q (szukaj w tekście – opcjonalnie)
-    """
-    page = int(request.args.get("page", 1))
-    per_page = min(max(int(request.args.get("per_page", 20)), 5), 100)
+def _list_filters():
+    """(rok|None, reply, retweet, quote, q) z query stringa — wspólne dla listy i nawigacji."""
     year = request.args.get("year", "all")
     q = (request.args.get("q") or "").strip()
 
-
     # bezpieczne parsowanie (-1/0/1)
     def _p(name):
         try:
             return int(request.args.get(name, 0) or 0)
         except ValueError:
             return 0
-        
-    f_reply   = _p("reply")
-    f_retweet = _p("retweet")
-    f_quote   = _p("quote")
 
-
-    df = TWEETS_DF.copy()
-
-     # --- NORMALIZACJA FLAG -> bool (kluczowe dla ~) ---
-    for col in ("isReply", "isRetweet", "isQuote"):
-        if col in df.columns:
-            # zamień NaN na False i rzutuj na bool (0/1/0.0/1.0 -> False/True)
-            df[col] = df[col].fillna(False).astype(bool)
-
-    # filtr rok
+    # filtr rok (niepoprawny rok = bez filtra)
+    y = None
     if year != "all":
         try:
             y = int(year)
-            df = df[df["created_at"].dt.year == y]
         except Exception:
             pass
+    return y, _p("reply"), _p("retweet"), _p("quote"), q
 
-    # flagi
-    if f_reply == 1:
-        df = df[df["isReply"]]
-    elif f_reply == -1:
-        df = df[~df["isReply"]]
-
-    if f_retweet == 1:
-        df = df[df["isRetweet"]]
-    elif f_retweet == -1:
-        df = df[~df["isRetweet"]]
-
-    if f_quote == 1:
-        df = df[df["isQuote"]]
-    elif f_quote == -1:
-        df = df[~df["isQuote"]]
 
+@app.route("/api/tweets")
+@requires_data("tweets")
+def api_tweets():
+    """
+    Query params:
+      page (int, default 1), per_page (int, default 20)
+      year (int albo 'all')
+      reply, retweet, quote: '1' włącza filtr 'tylko takie'; '0' ignoruje
+      q (szukaj w tekście – opcjonalnie)
+    """
+    page = int(request.args.get("page", 1))
+    per_page = min(max(int(request.args.get("per_page", 20)), 5), 100)
+    y, f_reply, f_retweet, f_quote, q = _list_filters()
+    index = TWEET_INDEX   # jedna wersja danych na całe żądanie (obserwator może podmienić indeks)
 
-    # prosty search w tekście
-    if q:
-        df = df[df["text"].str.contains(q, case=False, na=False)]
+    # flagi + prosty search w tekście -> pozycje z indeksu (LRU), strona = wycinek
+    with phase("filter"):
+        positions = index.query(y, f_reply, f_retweet, f_quote, q)
 
-    total = len(df)
+    total = len(positions)
     start = (page - 1) * per_page
     end = start + per_page
-    subset = df.iloc[start:end].copy()
-
-    subset["created_at_display"] = subset["created_at"].dt.tz_convert(DISPLAY_TZ)\
-        .dt.strftime("%Y-%m-%d %H:%M:%S %Z")
-
-    items = [{
-        "tweet_id": str(r.tweet_id),
-        "text": r.text,
-        "created_at_display": r.created_at_display,
-        "isReply": bool(r.isReply),
-        "isRetweet": bool(r.isRetweet),
-        "isQuote": bool(r.isQuote),
-        "year": int(r.created_at.year)
-    } for r in subset.itertuples(index=False)]
-
-    # lista dostępnych lat (do selecta)
-    years = sorted(TWEETS_DF["created_at"].dt.year.unique().tolist(), reverse=True)
-
-    return jsonify({
-        "items": items,
-        "page": page,
-        "per_page": per_page,
-        "total": int(total),
-        "years": years
-    })
+    with phase("page"):
+        items = index.items(positions[start:end])
+
+    with phase("serialize"):
+        return jsonify({
+            "items": items,
+            "page": page,
+            "per_page": per_page,
+            "total": int(total),
+            "years": index.years   # lista dostępnych lat (do selecta) — policzona raz
+        })
 
 # ---- API: pojedynczy tweet (do prawej kolumny) ----
 @app.route("/api/tweet/<tweet_id>")
+@requires_data("tweets")
 def api_tweet(tweet_id):
-    row = TWEETS_DF[TWEETS_DF["tweet_id"].astype(str) == str(tweet_id)]
-    if row.empty:
+    """
+    Szczegóły tweeta + prev_id/next_id (sąsiedzi na liście).
+    Opcjonalnie te same filtry co /api/tweets (year, reply, retweet, quote, q) —
+    wtedy nawigacja idzie po przefiltrowanej liście.
+    """
+    index = TWEET_INDEX
+    pos = index.position(tweet_id)
+    if pos is None:
         abort(404)
-    t = row.iloc[0]
-    created_ts = int(pd.Timestamp(t["created_at"]).timestamp())
-    created_display = pd.Timestamp(t["created_at"]).tz_convert(DISPLAY_TZ)\
-        .strftime("%Y-%m-%d %H:%M:%S %Z")
-    return jsonify({
-        "tweet_id": str(t["tweet_id"]),
-        "text": t["text"],
-        "isReply": bool(t["isReply"]),
-        "isRetweet": bool(t["isRetweet"]),
-        "isQuote": bool(t["isQuote"]),
-        "created_ts": created_ts,
-        "created_display": created_display
-    })
+    positions = index.query(*_list_filters())
+    return jsonify(index.detail(pos, positions))
+
+def _int_arg(value, default: int, lo: int, hi: int) -> int:
+    """int z parametru z domyślną wartością przy błędzie i przycięciem do [lo, hi]."""
+    try:
+        v = int(value)
+    except Exception:
+        v = default
+    return max(lo, min(v, hi))
+
+
+def _encoded_json(payload):
+    """Odpowiedź JSON przez szybki serializer (tablice numpy wprost), skompresowana wg Accept-Encoding."""
+    with phase("serialize"):
+        body = dumps(payload)
+    with phase("compress"):
+        body, used = compress(body, pick_encoding(request.accept_encodings))
+    resp = app.response_class(body, content_type=JSON_MIMETYPE)
+    if used:
+        resp.headers["Content-Encoding"] = used
+    resp.vary.add("Accept-Encoding")
+    return resp
+
+
+# cache odpowiedzi /api/price (LRU); klucz zawiera PRICE_STORE.version, więc nowe dane = nowe klucze
+PRICE_CACHE_SIZE = 2048
+PRICE_CACHE_MAX_AGE = 3600   # s; potem przeglądarka / proxy pyta warunkowo (If-None-Match -> 304)
+PRICE_RESPONSE_CACHE = ResponseCache(PRICE_CACHE_SIZE)
+PRICE_MAX_POINTS = 10_000    # max_points powyżej tej wartości i tak nic nie redukuje
+PRICE_SYMBOLS_MAX = 8        # symboli w jednym żądaniu (okna obok siebie)
 
 @app.route("/api/price")
+@requires_data("prices")
 def api_price():
     """
     Query params:
@@ -340,23 +520,18 @@ def api_price():
       minutes – ile minut PO tweecie (domyślnie 15)
       pre     – ile minut PRZED tweetem (domyślnie 0; np. 10)
       format  – "text" dla legacy listy minut; domyślnie JSON
+      resample   – np. "5min" / "15min" / "1h": świece OHLC zagregowane po stronie serwera (tylko JSON)
+      max_points – górny limit punktów (min. 3); powyżej — LTTB po close (kształt linii zachowany)
+      layout  – "columns": {"t": [...], "open": [...], ...} zamiast listy "points" (mniejszy JSON)
+      symbol  – symbol cen (domyślnie PRICES_SYMBOL, np. TSLA); lista po przecinku (albo symbols=) —
+                okna kilku symboli obok siebie na wspólnej osi czasu (tylko JSON, patrz _render_price_multi)
+    Odpowiedź kompresowana (br / gzip) wg Accept-Encoding.
     """
     start_unix = (request.args.get("start", "") or "").strip()
     fmt = (request.args.get("format", "") or "").lower()
 
-    # minutes
-    try:
-        minutes = int(request.args.get("minutes", 15))
-    except Exception:
-        minutes = 15
-    minutes = max(1, min(minutes, 24*60))  # bezpieczny limit
-
-    # pre (minuty przed)
-    try:
-        pre = int(request.args.get("pre", 0))
-    except Exception:
-        pre = 0
-    pre = max(0, min(pre, 120))  # np. pozwól do 120 min wstecz
+    minutes = _int_arg(request.args.get("minutes", 15), 15, 1, 24*60)  # bezpieczny limit
+    pre = _int_arg(request.args.get("pre", 0), 0, 0, 120)               # np. pozwól do 120 min wstecz
 
     # brak startu
     if not start_unix:
@@ -374,46 +549,122 @@ def api_price():
             return jsonify(resp)
         return ("Zły parametr start.", 400, {"Content-Type": "text/plain; charset=utf-8"})
 
+    try:
+        resample = parse_resample(request.args.get("resample"))
+    except ValueError as e:
+        return jsonify({"points": [], "reason": "bad_resample", "error": str(e)}), 400
+    max_points = _int_arg(request.args.get("max_points", 0), 0, 0, PRICE_MAX_POINTS)
+    if max_points:   # 1–2 przycięte do minimum LTTB (pierwszy + środek + ostatni) — jak reszta zakresu
+        max_points = max(max_points, MAX_POINTS_MIN)
+
+    symbols = parse_symbols(request.args.get("symbols") or request.args.get("symbol")) or (PRICES_SYMBOL,)
+    unknown = [sym for sym in symbols if sym not in SYMBOLS.dirs]
+    if unknown or len(symbols) > PRICE_SYMBOLS_MAX:
+        error = (f"nieznane symbole: {', '.join(unknown)}" if unknown
+                 else f"maksymalnie {PRICE_SYMBOLS_MAX} symboli na żądanie")
+        return jsonify({"points": [], "reason": "bad_symbol", "error": error, "available": SYMBOLS.symbols}), 400
+    if len(symbols) > 1 and fmt == "text":
+        return ("Format text obsługuje jeden symbol.", 400, {"Content-Type": "text/plain; charset=utf-8"})
+    # pierwsze użycie symbolu = otwarcie (albo zbudowanie) jego cache
+    with phase("symbols"):
+        stores = {sym: SYMBOLS.get(sym) for sym in symbols}
+
+    # --- cache odpowiedzi + ETag: okno jest funkcją (start, minutes, pre, format, redukcji) i wersji cen ---
+    if fmt == "text":
+        fmt_key = "text"
+    else:
+        fmt_key = "columns" if (request.args.get("layout", "") or "").lower() == "columns" else "json"
+    # wersje w kluczu i dane odpowiedzi z tych samych magazynów
+    key = (int(start_dt.value // 10**9), minutes, pre, fmt_key, resample, max_points,
+           tuple((sym, store.version) for sym, store in stores.items()))
+    # osobny wpis cache (i ETag) na każde kodowanie — skompresowane ciało liczymy raz
+    encoding = pick_encoding(request.accept_encodings)
+    etag = make_etag(*key, encoding)
+    if request.if_none_match.contains(etag):
+        resp = app.response_class(status=304)
+    else:
+        cached = PRICE_RESPONSE_CACHE.get((key, encoding))
+        if cached is None:
+            if len(stores) == 1:
+                (symbol, store), = stores.items()
+                body, content_type = _render_price(start_dt, minutes, pre, fmt_key, resample, max_points,
+                                                   store, symbol)
+            else:
+                body, content_type = _render_price_multi(start_dt, minutes, pre, resample, max_points, stores)
+            with phase("compress"):
+                body, used = compress(body, encoding)
+            cached = (body, content_type, used)
+            PRICE_RESPONSE_CACHE.put((key, encoding), cached)
+        resp = app.response_class(cached[0], content_type=cached[1])
+        if cached[2]:
+            resp.headers["Content-Encoding"] = cached[2]
+    resp.set_etag(etag)
+    resp.vary.add("Accept-Encoding")
+    resp.headers["Cache-Control"] = f"public, max-age={PRICE_CACHE_MAX_AGE}"
+    return resp
+
+
+def _render_price(start_dt: pd.Timestamp, minutes: int, pre: int, fmt: str,
+                  resample=None, max_points: int = 0, store=None, symbol: str = None):
+    """
+    Właściwa odpowiedź /api/price -> (body: bytes, content_type); wynik trafia do PRICE_RESPONSE_CACHE.
+    fmt: "json" (lista points), "columns" (kolumny z tablic numpy) albo "text" (legacy).
+    store: magazyn cen (domyślnie bieżący PRICE_STORE); symbol — dopisywany do odpowiedzi JSON.
+    """
+    if store is None:
+        store = PRICE_STORE
     # --- SZTYWNE okno: [start - pre, start + minutes] ---
     win_start = start_dt - pd.Timedelta(minutes=pre)
     win_end   = start_dt + pd.Timedelta(minutes=minutes)
-    df = slice_prices_between(win_start, win_end)
-    reason = "ok" if not df.empty else "no_data"
-
-    # punkty do wykresu
-    points = [
-        {
-            "t": int(pd.Timestamp(r["datetime"]).value // 10**9),
-            "open": float(r["open"]),
-            "high": float(r["high"]),
-            "low":  float(r["low"]),
-            "close": float(r["close"]),
-        }
-        for _, r in df.iterrows()
-    ]
+    with phase("slice"):
+        win = store.arrays_between(win_start, win_end)
+    reason = "ok" if len(win["datetime"]) else "no_data"
+
+    # punkty do wykresu (kolumnami, bez iterrows); opcjonalnie świece N-min / LTTB
+    source_points = len(win["datetime"])
+    if resample or max_points:
+        with phase("downsample"):
+            win = downsample_window(win, resample, max_points)
+    columns = {"t": np.asarray(win["datetime"]) // 10**9,
+               **{k: np.asarray(win[k], dtype=np.float64) for k in ("open", "high", "low", "close")}}
+    if fmt == "columns":
+        payload = dict(columns)
+    else:
+        payload = {"points": [
+            {"t": t, "open": o, "high": h, "low": l, "close": c}
+            for t, o, h, l, c in zip(*(columns[k].tolist() for k in ("t", "open", "high", "low", "close")))
+        ]}
 
-    payload = {
-        "points": points,
+    payload.update({
         "reason": reason,
         "requested_start": int(pd.Timestamp(start_dt).value // 10**9),
         "used_start":      int(pd.Timestamp(start_dt).value // 10**9),  # NIE PRZESUWAMY
         # pomoc do zablokowania zakresu osi X w frontendzie
         "x_start": int(pd.Timestamp(win_start).value // 10**9),
         "x_end":   int(pd.Timestamp(win_end).value   // 10**9),
-    }
+    })
+    if symbol:
+        payload["symbol"] = symbol
+    if resample or max_points:
+        payload["downsampled"] = {"resample": resample, "max_points": max_points or None,
+                                  "source_points": source_points}
 
     # % zmiany względem minuty tweeta (jeśli brak ceny w minucie tweeta, będzie None)
     try:
-        payload["pct_changes"] = percent_changes_from(start_dt)
+        with phase("pct"):
+            payload["pct_changes"] = store.percent_changes(start_dt)
     except Exception:
         # niech API się nie wywala nawet, jeśli helpera brak
         payload["pct_changes"] = {}
 
     # --- JSON domyślnie ---
     if fmt != "text":
-        return jsonify(payload)
+        with phase("serialize"):
+            return dumps(payload), JSON_MIMETYPE
 
     # --- Legacy: wersja tekstowa (lista minut) dla kompatybilności ---
+    with phase("slice"):
+        df = store.between(win_start, win_end)
     grid_start = pd.Timestamp(win_start).floor("min")
     grid_end   = pd.Timestamp(win_end).floor("min")
     idx = pd.date_range(start=grid_start, end=grid_end, freq="1min", tz="UTC")
@@ -446,9 +697,255 @@ def api_price():
         header.append("Brak danych cenowych w tym oknie.")
 
     body = "\n".join(header + [""] + lines)
-    return (body, 200, {"Content-Type": "text/plain; charset=utf-8"})
+    return body.encode("utf-8"), "text/plain; charset=utf-8"
+
+
+def _render_price_multi(start_dt: pd.Timestamp, minutes: int, pre: int, resample=None, max_points: int = 0,
+                        stores: dict = None):
+    """
+    Okno [start - pre, start + minutes] dla kilku symboli naraz -> (body JSON, content_type):
+      {"symbols": [...], "t": [...], "series": {"<SYM>": {"open", "high", "low", "close", "reason"}},
+       "pct_changes": {"<SYM>": {...}}, "reason", "requested_start", "used_start", "x_start", "x_end"}
+    "t" = wspólna oś (suma znaczników czasu wszystkich symboli), serie wyrównane do niej
+    przez searchsorted — null tam, gdzie symbol nie ma notowania.
+    """
+    win_start = start_dt - pd.Timedelta(minutes=pre)
+    win_end   = start_dt + pd.Timedelta(minutes=minutes)
+    with phase("slice"):
+        wins = {sym: store.arrays_between(win_start, win_end) for sym, store in stores.items()}
+    source_points = {sym: len(w["datetime"]) for sym, w in wins.items()}
+    if resample or max_points:
+        with phase("downsample"):
+            wins = {sym: downsample_window(w, resample, max_points) for sym, w in wins.items()}
+
+    with phase("align"):
+        stamps = {sym: np.asarray(w["datetime"], dtype=np.int64) // 10**9 for sym, w in wins.items()}
+        t = np.unique(np.concatenate(list(stamps.values())))
+        series = {}
+        for sym, w in wins.items():
+            pos = np.searchsorted(t, stamps[sym])
+            cols = {}
+            for k in ("open", "high", "low", "close"):
+                col = np.full(len(t), np.nan)
+                col[pos] = np.asarray(w[k], dtype=np.float64)
+                cols[k] = [None if v != v else v for v in col.tolist()]
+            series[sym] = {**cols, "reason": "ok" if source_points[sym] else "no_data"}
+
+    payload = {
+        "symbols": list(stores),
+        "t": t,
+        "series": series,
+        "reason": "ok" if any(source_points.values()) else "no_data",
+        "requested_start": int(pd.Timestamp(start_dt).value // 10**9),
+        "used_start":      int(pd.Timestamp(start_dt).value // 10**9),
+        "x_start": int(pd.Timestamp(win_start).value // 10**9),
+        "x_end":   int(pd.Timestamp(win_end).value   // 10**9),
+    }
+    if resample or max_points:
+        payload["downsampled"] = {"resample": resample, "max_points": max_points or None,
+                                  "source_points": source_points}
+    with phase("pct"):
+        payload["pct_changes"] = {sym: store.percent_changes(start_dt) for sym, store in stores.items()}
+    with phase("serialize"):
+        return dumps(payload), JSON_MIMETYPE
+
+
+# ---- API: wiele okien cenowych w jednym żądaniu ----
+PRICE_BATCH_MAX = 2000
+PCT_INTERVALS = (1,2,3,4,5,6,7,8,9,10,15,30,60)
+
+@app.route("/api/price/batch", methods=["POST"])
+@requires_data("prices")
+def api_price_batch():
+    """
+    Body (JSON): {"starts": [unix seconds, ...], "minutes": 15, "pre": 0, "symbol": "TSLA"}
+    Wszystkie okna liczone naraz (searchsorted na tablicach startów + macierz % zmian).
+    Odpowiedź kolumnowa, kluczem jest start (unix s, jako tekst):
+      {"minutes", "pre", "symbol", "windows": {"<start>": {"t": [...], "open": [...], "high": [...], "low": [...],
+       "close": [...], "reason", "x_start", "x_end", "pct_changes": {...}}}}
+    """
+    body = request.get_json(silent=True) or {}
+    raw_starts = body.get("starts")
+    if not isinstance(raw_starts, list):
+        return jsonify({"error": "starts musi być listą unix seconds"}), 400
+    if len(raw_starts) > PRICE_BATCH_MAX:
+        return jsonify({"error": f"maksymalnie {PRICE_BATCH_MAX} startów na żądanie"}), 400
+    minutes = _int_arg(body.get("minutes", 15), 15, 1, 24*60)
+    pre = _int_arg(body.get("pre", 0), 0, 0, 120)
+    # jeden symbol na żądanie: "symbols" ani lista po przecinku nie są obsługiwane (wiele symboli: /api/price)
+    raw_symbol = body.get("symbol") or ""
+    if "symbols" in body or not isinstance(raw_symbol, str) or "," in raw_symbol:
+        return jsonify({"error": "batch przyjmuje jeden symbol w polu \"symbol\" "
+                                 "(wiele symboli naraz: /api/price?symbol=A,B)"}), 400
+    symbol = raw_symbol.strip().upper() or PRICES_SYMBOL
+    if symbol not in SYMBOLS.dirs:
+        return jsonify({"error": f"symbol: jeden z {', '.join(SYMBOLS.symbols)}"}), 400
+
+    windows = {}
+    starts = []
+    for raw in raw_starts:
+        try:
+            starts.append(int(float(raw)))
+        except Exception:
+            windows[str(raw)] = {"t": [], "reason": "bad_start"}
+    starts = np.unique(np.asarray(starts, dtype=np.int64))
+
+    if len(starts):
+        with phase("symbols"):
+            store = SYMBOLS.get(symbol)
+        start_ns = starts * 10**9
+        win_start = start_ns - pre * NS_PER_MIN
+        win_end = start_ns + minutes * NS_PER_MIN
+        with phase("slice"):
+            wins = store.windows_many(win_start, win_end)
+        with phase("pct"):
+            _, base_found, pct = store.change_matrix(start_ns, PCT_INTERVALS)
+
+        for k, s in enumerate(starts.tolist()):
+            w = wins[k]
+            windows[str(s)] = {
+                "t": np.asarray(w["datetime"]) // 10**9,
+                **{c: np.asarray(w[c], dtype=np.float64) for c in ("open", "high", "low", "close")},
+                "reason": "ok" if len(w["datetime"]) else "no_data",
+                "x_start": int(win_start[k] // 10**9),
+                "x_end": int(win_end[k] // 10**9),
+                "pct_changes": {m: (round(float(v), 2) if not np.isnan(v) else None)
+                                for m, v in zip(PCT_INTERVALS, pct[k])},
+            }
+
+    return _encoded_json({"minutes": minutes, "pre": pre, "symbol": symbol, "windows": windows})
+
+
+# ---- API: agregaty wpływu (zmaterializowana macierz, patrz impact_stats.py) ----
+STATS_CACHE = ResponseCache(256)
+STATS_MAX_QUANTILES = 20
+
+@app.route("/api/stats")
+@requires_data("stats")
+def api_stats():
+    """
+    Agregaty % zmian OPEN po +m minutach (jak pct_changes w /api/price) dla przefiltrowanych tweetów.
+    Query params:
+      year, reply, retweet, quote, q – filtry jak w /api/tweets
+      group_by  – po przecinku: year, isReply, isRetweet, isQuote (puste = jedna grupa)
+      intervals – np. "1-10,15,30,60" (z zakresu 1..60; domyślnie jak pct_changes)
+      quantiles – np. "0.1,0.25,0.75,0.9"
+    Odpowiedź: {"intervals", "group_by", "filters", "version",
+                "groups": [{"key", "tweets", "count", "mean", "median", "quantiles": {"0.25": [...]}}]}
+    — listy w grupie wyrównane do "intervals".
+    """
+    with phase("matrix"):
+        matrix = current_impact_matrix()   # indeks tweetów i macierz z tej samej migawki
+    year, f_reply, f_retweet, f_quote, q = _list_filters()
+    try:
+        group_by = tuple(dict.fromkeys(GROUP_COLUMNS[g.strip().lower()]
+                                       for g in (request.args.get("group_by") or "").split(",") if g.strip()))
+    except KeyError as e:
+        return jsonify({"error": f"nieznane group_by: {e.args[0]} (dostępne: year, isReply, isRetweet, isQuote)"}), 400
+    try:
+        spec = request.args.get("intervals")
+        intervals = event_study.parse_intervals(spec) if spec else PCT_INTERVALS
+        matrix.columns(intervals)
+        spec = request.args.get("quantiles")
+        quantiles = tuple(sorted({float(x) for x in spec.split(",") if x.strip()})) if spec else DEFAULT_QUANTILES
+        if len(quantiles) > STATS_MAX_QUANTILES or any(not 0 < x < 1 for x in quantiles):
+            raise ValueError(f"quantiles: do {STATS_MAX_QUANTILES} wartości z przedziału (0, 1)")
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    key = (year, f_reply, f_retweet, f_quote, q, group_by, intervals, quantiles, matrix.version)
+    payload = STATS_CACHE.get(key)
+    if payload is None:
+        with phase("filter"):
+            positions = matrix.index.query(year, f_reply, f_retweet, f_quote, q)
+        with phase("aggregate"):
+            groups = matrix.group_stats(positions, group_by, intervals, quantiles)
+        payload = {
+            "intervals": list(intervals),
+            "group_by": list(group_by),
+            "filters": {"year": year, "reply": f_reply, "retweet": f_retweet, "quote": f_quote, "q": q},
+            "version": matrix.version,
+            "groups": groups,
+        }
+        STATS_CACHE.put(key, payload)
+    return _encoded_json(payload)
+
+
+# ---- API: event study (zwroty nadwyżkowe względem okna przed tweetem) ----
+EVENT_STUDY_MAX_INTERVALS = 60
+
+@app.route("/api/event_study", methods=["GET", "POST"])
+@requires_data("prices")
+def api_event_study():
+    """
+    GET:  ?start=<unix s>[,<unix s>…] albo ?tweet_id=<id>; opcjonalnie lookback, window, intervals, min_obs
+    POST (JSON): {"starts": [...], "lookback": 60, "window": 0, "intervals": "1-10,15,30,60" | [1, 5, 15],
+                  "min_obs": 10}
+    lookback – minuty przed tweetem (dryf i zmienność), window – okno wychylenia HIGH/LOW (0 = max interwał).
+    Odpowiedź: {"lookback", "window", "intervals", "min_obs",
+                "events": {"<start>": {"reason", "base", "baseline", "returns", "abnormal", "zscore",
+                                       "max_up", "max_down"}},
+                "summary": {"n", "mean_abnormal", "t"}}   (średnie po zdarzeniach z bazą)
+    """
+    if request.method == "POST":
+        params = request.get_json(silent=True) or {}
+        raw_starts = params.get("starts")
+        if not isinstance(raw_starts, list):
+            return jsonify({"error": "starts musi być listą unix seconds"}), 400
+    else:
+        params = request.args
+        raw_starts = [s for s in (params.get("start") or "").split(",") if s.strip()]
+        tweet_id = params.get("tweet_id")
+        if tweet_id:
+            busy = warmup_response("tweets")   # tweet_id -> czas tweeta wymaga gotowego indeksu tweetów
+            if busy is not None:
+                return busy
+            index = TWEET_INDEX
+            pos = index.position(tweet_id)
+            if pos is None:
+                abort(404)
+            raw_starts.append(int(index.created_ts[pos]))
+    if len(raw_starts) > PRICE_BATCH_MAX:
+        return jsonify({"error": f"maksymalnie {PRICE_BATCH_MAX} startów na żądanie"}), 400
+
+    try:
+        raw_intervals = params.get("intervals") or event_study.DEFAULT_INTERVALS
+        intervals = (event_study.parse_intervals(raw_intervals) if isinstance(raw_intervals, str)
+                     else tuple(sorted({int(m) for m in raw_intervals})))
+    except (TypeError, ValueError) as e:
+        return jsonify({"error": f"złe intervals: {e}"}), 400
+    if not intervals or len(intervals) > EVENT_STUDY_MAX_INTERVALS or intervals[0] < 1 or intervals[-1] > 24*60:
+        return jsonify({"error": f"intervals: 1..{EVENT_STUDY_MAX_INTERVALS} wartości z zakresu 1..1440"}), 400
+    lookback = _int_arg(params.get("lookback", event_study.DEFAULT_LOOKBACK), event_study.DEFAULT_LOOKBACK,
+                        2, event_study.MAX_LOOKBACK)
+    window = _int_arg(params.get("window", 0), 0, 0, 24*60) or max(intervals)
+    min_obs = _int_arg(params.get("min_obs", event_study.MIN_BASELINE_OBS), event_study.MIN_BASELINE_OBS,
+                       2, lookback)
+
+    events = {}
+    starts = []
+    for raw in raw_starts:
+        try:
+            starts.append(int(float(raw)))
+        except Exception:
+            events[str(raw)] = {"reason": "bad_start"}
+    starts = np.unique(np.asarray(starts, dtype=np.int64))
+
+    with phase("study"):
+        result = event_study.event_study(PRICE_STORE, starts * 10**9, intervals, lookback, window, min_obs)
+    for i, s in enumerate(starts.tolist()):
+        events[str(s)] = event_study.event_record(result, i, intervals, min_obs)
+
+    return _encoded_json({
+        "lookback": lookback, "window": window, "intervals": list(intervals), "min_obs": min_obs,
+        "events": events, "summary": event_study.summarize(result, intervals),
+    })
+
 
 
 if __name__ == "__main__":
+    # debug=True: reloader uruchamia serwer w procesie potomnym — obserwator tylko tam
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        start_watcher()
     app.run(debug=True)
 
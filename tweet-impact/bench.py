@@ -0,0 +1,277 @@
+# bench.py — benchmarki: start aplikacji, loadery, opóźnienia API (Flask test client), eksport
+# Dane syntetyczne (synthetic_data.py) w skali 1× / 10× / 100×, wynik jako raport JSON do porównań.
+#   python bench.py --scale 1 --out bench_x1.json
+#   python bench.py --scale 10 --out bench_x10.json --compare bench_x1.json
+import os, sys, json, time, argparse, platform, subprocess, tempfile, shutil, contextlib, io
+import numpy as np
+
+from synthetic_data import ensure_dataset, HISTORY_YEARS, WORDS
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+WORK_DIR = os.path.join(tempfile.gettempdir(), "tweet-impact-bench")
+REPORT_VERSION = 1
+SECTIONS = ("cold_start", "loaders", "endpoints", "export")
+
+
+# ===== Pomiar =====
+def summarize(samples) -> dict:
+    """Czasy (sekundy) -> statystyki w ms."""
+    ms = np.asarray(samples, dtype=np.float64) * 1000
+    if not len(ms):
+        return {"n": 0}
+    return {
+        "n": int(len(ms)),
+        "mean_ms": round(float(ms.mean()), 3),
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p90_ms": round(float(np.percentile(ms, 90)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "max_ms": round(float(ms.max()), 3),
+    }
+
+
+def timed(fn, repeat: int = 1) -> list:
+    out = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        fn()
+        out.append(time.perf_counter() - t0)
+    return out
+
+
+@contextlib.contextmanager
+def quiet():
+    """Wycisza printy loaderów / eksportu w trakcie pomiaru."""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+def data_env(info: dict) -> dict:
+    # bez obserwatora plików — jego polling nie miesza się do pomiarów
+    return {"TWEETS_CSV": info["tweets_csv"], "PRICES_DIR": info["prices_dir"], "DATA_WATCH_INTERVAL": "0"}
+
+
+# ===== Sekcje =====
+def bench_cold_start(info: dict, repeat: int) -> dict:
+    """
+    Świeży proces: czas samego importu app.py (rozgrzewanie w tle) i do gotowości wszystkich danych;
+    bez cache cen (pełne parsowanie CSV) i z gotowym cache.
+    """
+    from prices import cache_dir_for
+    env = {**os.environ, **data_env(info), "APP_WARMUP": "background"}
+    code = ("import time; t = time.perf_counter(); import app; i = time.perf_counter() - t; "
+            "app.WARMUP.wait(); print(i, time.perf_counter() - t)")
+
+    def run_once():
+        out = subprocess.run([sys.executable, "-c", code], cwd=BASE_DIR, env=env,
+                             capture_output=True, text=True, check=True)
+        return tuple(float(x) for x in out.stdout.strip().splitlines()[-1].split())
+
+    cold = []
+    for _ in range(repeat):
+        shutil.rmtree(cache_dir_for(info["prices_dir"]), ignore_errors=True)
+        cold.append(run_once())
+    warm = [run_once() for _ in range(repeat)]
+    return {
+        "no_cache": {"import": summarize([c[0] for c in cold]), "ready": summarize([c[1] for c in cold])},
+        "warm_cache": {"import": summarize([w[0] for w in warm]), "ready": summarize([w[1] for w in warm])},
+    }
+
+
+def bench_loaders(app, info: dict, repeat: int) -> dict:
+    from price_store import open_price_store
+    out = {}
+    with quiet():
+        out["load_tweets_no_cache"] = summarize(
+            timed(lambda: app.load_tweets(info["tweets_csv"], use_cache=False), repeat))
+        app.load_tweets(info["tweets_csv"])   # snapshot na pewno gotowy
+        out["load_tweets_snapshot"] = summarize(timed(lambda: app.load_tweets(info["tweets_csv"]), repeat))
+        out["load_prices_from_dir_no_cache"] = summarize(
+            timed(lambda: app.load_prices_from_dir(info["prices_dir"], use_cache=False), repeat))
+        app.load_prices_from_dir(info["prices_dir"])   # cache na pewno gotowy
+        out["load_prices_from_dir_cache"] = summarize(
+            timed(lambda: app.load_prices_from_dir(info["prices_dir"]), repeat))
+        out["open_price_store_mmap"] = summarize(
+            timed(lambda: open_price_store(info["prices_dir"], app.PRICES_SOURCE_TZ), repeat))
+    return out
+
+
+def endpoint_requests(app, n: int, seed: int) -> dict:
+    """Zestawy żądań: nazwa -> lista (metoda, url, body). Parametry losowane z danych."""
+    rng = np.random.default_rng(seed)
+    index = app.TWEET_INDEX
+    ids = index.tweet_ids
+    starts = index.created_ts
+    pick = lambda a, k=n: a[rng.integers(0, len(a), k)].tolist() if len(a) else []
+    years = index.years or ["all"]
+    pages = max(1, len(ids) // 20)
+
+    return {
+        "tweets_page": [("GET", f"/api/tweets?page={int(p)}&per_page=20", None)
+                        for p in rng.integers(1, pages + 1, n)],
+        "tweets_filtered": [("GET", f"/api/tweets?year={y}&reply=-1&retweet=-1&page=1", None)
+                            for y in pick(np.asarray(years))],
+        "tweets_search": [("GET", f"/api/tweets?q={w}&page=1", None)
+                          for w in pick(np.asarray(WORDS))],
+        "tweet_detail": [("GET", f"/api/tweet/{i}", None) for i in pick(ids)],
+        "price_15m": [("GET", f"/api/price?start={s}&minutes=15", None) for s in pick(starts)],
+        "price_day_columns": [("GET", f"/api/price?start={s}&minutes=1440&pre=60&layout=columns", None)
+                              for s in pick(starts)],
+        "price_day_resampled": [("GET", f"/api/price?start={s}&minutes=1440&pre=60&resample=5min", None)
+                                for s in pick(starts)],
+        "price_repeat": [("GET", f"/api/price?start={int(starts[0])}&minutes=60", None)] * n if len(starts) else [],
+        "price_batch_200": [("POST", "/api/price/batch", {"starts": pick(starts, 200), "minutes": 60})
+                            for _ in range(max(1, n // 10))],
+        "event_study_200": [("POST", "/api/event_study", {"starts": pick(starts, 200)})
+                            for _ in range(max(1, n // 10))],
+        "stats_grouped": [("GET", f"/api/stats?year={y}&group_by=reply,retweet&intervals=1-60", None)
+                          for y in pick(np.asarray(years))],
+    }
+
+
+def bench_endpoints(app, n: int, seed: int) -> dict:
+    client = app.app.test_client()
+    out = {}
+    for name, reqs in endpoint_requests(app, n, seed).items():
+        app.PRICE_RESPONSE_CACHE.clear()
+        app.STATS_CACHE.clear()
+        samples, statuses = [], {}
+        for method, url, body in reqs:
+            t0 = time.perf_counter()
+            resp = client.open(url, method=method, json=body)
+            resp.get_data()
+            samples.append(time.perf_counter() - t0)
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+        out[name] = {**summarize(samples), "status": {str(k): v for k, v in sorted(statuses.items())}}
+    return out
+
+
+def bench_export(info: dict, work_dir: str, formats) -> dict:
+    import export_dataset
+    export_dataset.TWEETS_CSV = info["tweets_csv"]
+    export_dataset.PRICES_DIR = info["prices_dir"]
+    out = {}
+    for fmt in formats:
+        if fmt != "csv":
+            try:
+                export_dataset._require_pyarrow()
+            except Exception as e:
+                out[fmt] = {"skipped": str(e)}
+                continue
+        path = os.path.join(work_dir, f"export.{fmt}")
+        with quiet():
+            t0 = time.perf_counter()
+            export_dataset.run(out_path=path, fmt=fmt)
+            elapsed = time.perf_counter() - t0
+        rows = len(export_dataset.read_output(export_dataset.output_path_for(path, fmt), fmt))
+        out[fmt] = {"seconds": round(elapsed, 3), "rows": rows,
+                    "rows_per_s": round(rows / elapsed, 1) if elapsed else None}
+    return out
+
+
+# ===== Raport =====
+def environment() -> dict:
+    import numpy, pandas
+    try:
+        rev = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=BASE_DIR,
+                             capture_output=True, text=True).stdout.strip() or None
+    except OSError:
+        rev = None
+    return {
+        "git_rev": rev,
+        "python": platform.python_version(),
+        "numpy": numpy.__version__,
+        "pandas": pandas.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+
+def flatten(d: dict, prefix: str = "") -> dict:
+    out = {}
+    for k, v in d.items():
+        key = f"{prefix}.{k}" if prefix else str(k)
+        if isinstance(v, dict):
+            out.update(flatten(v, key))
+        elif isinstance(v, (int, float)) and not isinstance(v, bool):
+            out[key] = v
+    return out
+
+
+def compare(report: dict, baseline: dict):
+    """Tabela: metryka, baseline, teraz, stosunek (teraz / baseline) — tylko wspólne metryki czasu."""
+    now, base = flatten(report["results"]), flatten(baseline.get("results", {}))
+    keys = [k for k in now if k in base and (k.endswith("_ms") or k.endswith("seconds") or k.endswith("rows_per_s"))]
+    print(f"{'metryka':60s} {'baseline':>12s} {'teraz':>12s} {'x':>7s}")
+    for k in keys:
+        ratio = now[k] / base[k] if base[k] else float("nan")
+        print(f"{k:60s} {base[k]:12.3f} {now[k]:12.3f} {ratio:7.2f}")
+
+
+def run(scale: int = 1, years: int = HISTORY_YEARS, seed: int = 0, work_dir: str = WORK_DIR,
+        requests_n: int = 200, repeat: int = 3, sections=SECTIONS, formats=("csv",)) -> dict:
+    data_dir = os.path.join(work_dir, f"x{scale}-y{years}-s{seed}")
+    info = ensure_dataset(data_dir, scale, years, seed)
+
+    # app.py wczytuje dane przy imporcie — ścieżki przez zmienne środowiska, zanim go zaimportujemy
+    os.environ.update(data_env(info))
+    results = {}
+    if "cold_start" in sections:
+        print("[bench] cold start…")
+        results["cold_start"] = bench_cold_start(info, repeat)
+    if "loaders" in sections or "endpoints" in sections:
+        with quiet():
+            import app
+            app.WARMUP.wait()
+        if "loaders" in sections:
+            print("[bench] loadery…")
+            results["loaders"] = bench_loaders(app, info, repeat)
+        if "endpoints" in sections:
+            print("[bench] endpointy…")
+            results["endpoints"] = bench_endpoints(app, requests_n, seed)
+    if "export" in sections:
+        print("[bench] eksport…")
+        results["export"] = bench_export(info, data_dir, formats)
+
+    return {
+        "version": REPORT_VERSION,
+        "env": environment(),
+        "params": {"scale": scale, "years": years, "seed": seed, "requests": requests_n, "repeat": repeat},
+        "data": {"price_files": info["prices"]["files"], "price_rows": info["prices"]["rows"],
+                 "tweets_rows": info["tweets"]["rows"]},
+        "results": results,
+    }
+
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser(description="Benchmarki tweet-impact na danych syntetycznych.")
+    ap.add_argument("--scale", type=int, default=1, help="Mnożnik liczby wierszy (1, 10, 100…).")
+    ap.add_argument("--years", type=int, default=HISTORY_YEARS, help="Długość historii cen w latach.")
+    ap.add_argument("--seed", type=int, default=0, help="Ziarno generatora danych i żądań.")
+    ap.add_argument("--work-dir", type=str, default=WORK_DIR, help="Gdzie trzymać wygenerowane dane.")
+    ap.add_argument("--requests", type=int, default=200, help="Żądań na endpoint.")
+    ap.add_argument("--repeat", type=int, default=3, help="Powtórzeń pomiarów startu / loaderów.")
+    ap.add_argument("--only", type=str, default=",".join(SECTIONS),
+                    help=f"Sekcje do uruchomienia, np. 'endpoints,export' (dostępne: {','.join(SECTIONS)}).")
+    ap.add_argument("--formats", type=str, default="csv", help="Formaty eksportu, np. 'csv,parquet'.")
+    ap.add_argument("--out", type=str, default="", help="Zapisz raport JSON do pliku.")
+    ap.add_argument("--compare", type=str, default="", help="Porównaj z wcześniejszym raportem JSON.")
+    args = ap.parse_args()
+
+    sections = tuple(s.strip() for s in args.only.split(",") if s.strip())
+    unknown = set(sections) - set(SECTIONS)
+    if unknown:
+        ap.error(f"nieznane sekcje: {', '.join(sorted(unknown))}")
+
+    report = run(args.scale, args.years, args.seed, args.work_dir, args.requests, args.repeat, sections,
+                 tuple(f.strip() for f in args.formats.split(",") if f.strip()))
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+        print(f"✓ Raport: {args.out}")
+    else:
+        print(text)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(report, json.load(f))
@@ -0,0 +1,93 @@
+# downsample.py — redukcja liczby punktów okna cenowego przed wysłaniem do wykresu
+# resample: agregacja OHLC do świec N-minutowych (first/max/min/last), wektorowo (reduceat).
+# lttb: Largest-Triangle-Three-Buckets na CLOSE — wybiera max_points prawdziwych notowań,
+# zachowując kształt linii (szczyty/dołki), zamiast co k-tego punktu.
+import re
+import numpy as np
+
+from price_store import NS_PER_MIN
+
+RESAMPLE_MAX_MINUTES = 24 * 60
+MAX_POINTS_MIN = 3
+
+_RESAMPLE_RE = re.compile(r"\s*(\d+)\s*(min|m|h)?\s*", re.IGNORECASE)
+
+
+def parse_resample(spec):
+    """
+    "5min" / "15m" / "1h" / "5" -> liczba minut; puste -> None.
+    ValueError przy złym formacie albo poza zakresem 1..1440 min.
+    """
+    if spec is None or str(spec).strip() == "":
+        return None
+    m = _RESAMPLE_RE.fullmatch(str(spec))
+    if not m:
+        raise ValueError(f"zły resample: {spec!r} (np. 5min, 15min, 1h)")
+    minutes = int(m.group(1)) * (60 if (m.group(2) or "").lower() == "h" else 1)
+    if not 1 <= minutes <= RESAMPLE_MAX_MINUTES:
+        raise ValueError(f"resample poza zakresem 1..{RESAMPLE_MAX_MINUTES} min: {spec!r}")
+    return minutes
+
+
+def resample_ohlc(arrays: dict, minutes: int) -> dict:
+    """
+    Świece co `minutes` minut (kubełki wyrównane do epoki, jak floor(t)), tylko niepuste.
+    arrays: {"datetime": int ns (posortowane), "open", "high", "low", "close"} -> ten sam układ,
+    datetime = początek kubełka.
+    """
+    ts = np.asarray(arrays["datetime"], dtype=np.int64)
+    if not len(ts):
+        return arrays
+    step = minutes * NS_PER_MIN
+    bucket = ts // step
+    starts = np.flatnonzero(np.r_[True, bucket[1:] != bucket[:-1]])
+    ends = np.r_[starts[1:], len(ts)] - 1
+    return {
+        "datetime": bucket[starts] * step,
+        "open": np.asarray(arrays["open"], dtype=np.float64)[starts],
+        "high": np.maximum.reduceat(np.asarray(arrays["high"], dtype=np.float64), starts),
+        "low": np.minimum.reduceat(np.asarray(arrays["low"], dtype=np.float64), starts),
+        "close": np.asarray(arrays["close"], dtype=np.float64)[ends],
+    }
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indeksy punktów wybranych przez LTTB (pierwszy i ostatni zawsze zostają).
+    Pętla po kubełkach (n_out iteracji), obliczenia w kubełku wektorowe.
+    """
+    n = len(x)
+    if n_out >= n or n_out < MAX_POINTS_MIN:
+        return np.arange(n)
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    # granice n_out - 2 kubełków środkowych (bez pierwszego i ostatniego punktu)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # średnie kubełków (punkt C dla poprzedniego kubełka) — liczone naraz z sum skumulowanych
+    cx = np.r_[0.0, np.cumsum(x)]
+    cy = np.r_[0.0, np.cumsum(y)]
+    lo, hi = edges[:-1], edges[1:]
+    mean_x = (cx[hi] - cx[lo]) / (hi - lo)
+    mean_y = (cy[hi] - cy[lo]) / (hi - lo)
+    mean_x = np.r_[mean_x, x[-1]]
+    mean_y = np.r_[mean_y, y[-1]]
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for k in range(n_out - 2):
+        bx, by = x[lo[k]:hi[k]], y[lo[k]:hi[k]]
+        area = np.abs((x[a] - mean_x[k + 1]) * (by - y[a]) - (x[a] - bx) * (mean_y[k + 1] - y[a]))
+        a = int(lo[k] + np.argmax(area))
+        out[k + 1] = a
+    return out
+
+
+def downsample_window(arrays: dict, resample=None, max_points=None) -> dict:
+    """resample (minuty) a potem max_points (LTTB po close) — zwraca słownik tablic jak wejście."""
+    if resample:
+        arrays = resample_ohlc(arrays, resample)
+    if max_points and len(arrays["datetime"]) > max_points:
+        keep = lttb_indices(arrays["datetime"], arrays["close"], max_points)
+        arrays = {k: np.asarray(v)[keep] for k, v in arrays.items()}
+    return arrays
@@ -0,0 +1,203 @@
+# event_study.py — analiza zdarzeń (event study) dla wielu tweetów naraz na magazynie cen minutowych
+# Model stałej średniej: z okna PRZED tweetem (lookback minut) liczymy dryf i zmienność minutowych
+# stóp zwrotu OPEN->OPEN, potem dla każdego interwału m:
+#   zwrot      R_m  = (OPEN[t0+m] - OPEN[t0]) / OPEN[t0] * 100      (jak change_matrix / eksport)
+#   nadwyżkowy AR_m = R_m - dryf * m
+#   z-score    z_m  = AR_m / (zmienność * sqrt(m))
+# oraz maksymalne wychylenie HIGH / LOW w oknie [t0, t0 + window] względem OPEN[t0].
+# Wszystko macierzowo (tweety × minuty); tweety dzielone na porcje roczne, które mogą iść równolegle.
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+
+from prices import resolve_workers, process_pool_context
+from price_store import PriceStore, NS_PER_MIN
+
+DEFAULT_INTERVALS = (1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 15, 30, 60)
+DEFAULT_LOOKBACK = 60       # minut przed tweetem do estymacji dryfu i zmienności
+MIN_BASELINE_OBS = 10       # mniej stóp zwrotu w oknie bazowym => brak AR / z (NaN)
+MAX_LOOKBACK = 24 * 60
+CHUNK_EVENTS = 20_000       # tweetów na porcję (macierz tweety × lookback nie rośnie bez końca)
+
+RESULT_FIELDS = ("base", "found", "baseline_n", "drift", "vol", "returns", "abnormal", "zscore",
+                 "max_up", "max_down")
+
+
+def parse_intervals(spec: str) -> tuple:
+    """'1-20,30,60' -> (1,2,…,20,30,60)."""
+    out = []
+    for part in (spec or "").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            a, b = part.split("-", 1)
+            out.extend(range(int(a), int(b) + 1))
+        else:
+            out.append(int(part))
+    if not out:
+        raise ValueError(f"Pusta lista interwałów: {spec!r}")
+    return tuple(sorted(set(out)))
+
+
+# ===== Jedna porcja (ciągły wycinek cen) =====
+def study_arrays(arrays: dict, starts, intervals=DEFAULT_INTERVALS, lookback: int = DEFAULT_LOOKBACK,
+                 window: int = None, min_obs: int = MIN_BASELINE_OBS) -> dict:
+    """
+    Event study dla chwil starts (int ns UTC) nad słownikiem tablic cen (jak arrays_between),
+    który obejmuje pełne minuty [min(start) - lookback, max(start) + max(intervals, window)].
+    Zwraca słownik tablic RESULT_FIELDS; returns / abnormal / zscore mają kształt [len(starts), len(intervals)].
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    intervals = np.asarray(tuple(intervals), dtype=np.int64)
+    window = int(window or intervals.max())
+    store = PriceStore.from_arrays(arrays, version="chunk")
+    base_min = starts // NS_PER_MIN
+
+    # --- okno bazowe: lookback stóp zwrotu minuta do minuty, kończące się na minucie tweeta ---
+    prices, found = store.open_at_minutes(base_min[:, None] + np.arange(-int(lookback), 1, dtype=np.int64))
+    prev, cur = prices[:, :-1], prices[:, 1:]
+    ok = found[:, :-1] & found[:, 1:] & (prev != 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        r = np.where(ok, (cur - prev) / prev * 100, 0.0)
+    n = ok.sum(axis=1)
+    enough = n >= max(2, int(min_obs))
+    drift = np.where(enough, r.sum(axis=1) / np.maximum(n, 1), np.nan)
+    dev = np.where(ok, r - drift[:, None], 0.0)
+    vol = np.where(enough, np.sqrt((dev ** 2).sum(axis=1) / np.maximum(n - 1, 1)), np.nan)
+
+    # --- zwroty po tweecie, nadwyżkowe i standaryzowane ---
+    base, base_found, ret = store.change_matrix(starts, intervals)
+    abnormal = ret - drift[:, None] * intervals[None, :]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        zscore = np.where(vol[:, None] > 0, abnormal / (vol[:, None] * np.sqrt(intervals)[None, :]), np.nan)
+
+    # --- wychylenie HIGH / LOW w oknie: redukcje po zakresach pozycji (reduceat na parach lo, hi) ---
+    lo, hi = store.bounds_many(base_min * NS_PER_MIN, (base_min + window) * NS_PER_MIN)
+    has = (hi > lo) & base_found & (base != 0)
+    max_up = np.full(len(starts), np.nan)
+    max_down = np.full(len(starts), np.nan)
+    if has.any():
+        bounds = np.column_stack([lo, hi]).ravel()
+        high = np.fmax.reduceat(np.append(np.asarray(store.cols["high"], dtype=np.float64), np.nan), bounds)[::2]
+        low = np.fmin.reduceat(np.append(np.asarray(store.cols["low"], dtype=np.float64), np.nan), bounds)[::2]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            max_up = np.where(has, (high - base) / base * 100, np.nan)
+            max_down = np.where(has, (low - base) / base * 100, np.nan)
+
+    return {"base": base, "found": base_found, "baseline_n": n, "drift": drift, "vol": vol,
+            "returns": ret, "abnormal": abnormal, "zscore": zscore, "max_up": max_up, "max_down": max_down}
+
+
+def _study_chunk(job):
+    """Wersja dla puli procesów: job = (arrays, starts, intervals, lookback, window, min_obs)."""
+    return study_arrays(*job)
+
+
+# ===== Wiele tweetów: porcje roczne =====
+def year_chunks(starts, max_size: int = CHUNK_EVENTS) -> list:
+    """
+    Pozycje tweetów pogrupowane po roku (UTC) — każda porcja potrzebuje tylko swojego wycinka cen;
+    lata z więcej niż max_size tweetami dzielone dalej.
+    """
+    years = np.asarray(starts, dtype=np.int64).astype("datetime64[ns]").astype("datetime64[Y]")
+    uniq, inverse = np.unique(years, return_inverse=True)
+    out = []
+    for k in range(len(uniq)):
+        idx = np.flatnonzero(inverse == k)
+        out.extend(np.array_split(idx, -(-len(idx) // max_size)) if len(idx) > max_size else [idx])
+    return out
+
+
+def event_study(store, starts, intervals=DEFAULT_INTERVALS, lookback: int = DEFAULT_LOOKBACK,
+                window: int = None, min_obs: int = MIN_BASELINE_OBS, workers: int = 1) -> dict:
+    """
+    Event study dla chwil starts (int ns UTC) na dowolnym magazynie cen (PriceStore / PartitionedPriceStore).
+    Porcje roczne liczone niezależnie; workers > 1 — w puli procesów (None / 0 = wszystkie rdzenie).
+    Wynik jak study_arrays, w kolejności starts.
+    """
+    starts = np.asarray(starts, dtype=np.int64)
+    intervals = tuple(int(m) for m in intervals)
+    window = int(window or max(intervals))
+    span = max(max(intervals), window)
+    out = {
+        "base": np.full(len(starts), np.nan), "found": np.zeros(len(starts), dtype=bool),
+        "baseline_n": np.zeros(len(starts), dtype=np.int64),
+        "drift": np.full(len(starts), np.nan), "vol": np.full(len(starts), np.nan),
+        "max_up": np.full(len(starts), np.nan), "max_down": np.full(len(starts), np.nan),
+        **{k: np.full((len(starts), len(intervals)), np.nan) for k in ("returns", "abnormal", "zscore")},
+    }
+    if not len(starts) or store.empty:
+        return out
+
+    chunks = year_chunks(starts)
+    jobs = []
+    for idx in chunks:
+        minutes = starts[idx] // NS_PER_MIN
+        # pełne minuty na brzegach — indeks minut wycinka = indeks minut całego magazynu
+        lo = (int(minutes.min()) - int(lookback)) * NS_PER_MIN
+        hi = (int(minutes.max()) + span + 1) * NS_PER_MIN - 1
+        jobs.append((store.arrays_between(lo, hi), starts[idx], intervals, lookback, window, min_obs))
+
+    workers = min(resolve_workers(workers), len(jobs))
+    results = None
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=process_pool_context()) as pool:
+                results = list(pool.map(_study_chunk, [
+                    ({c: np.asarray(a) for c, a in arrays.items()}, *rest) for arrays, *rest in jobs]))
+        except (OSError, RuntimeError) as e:
+            print(f"[event_study] pula procesów niedostępna ({e}), liczę sekwencyjnie")
+            results = None
+    if results is None:
+        results = [_study_chunk(job) for job in jobs]
+
+    for idx, res in zip(chunks, results):
+        for k in RESULT_FIELDS:
+            out[k][idx] = res[k]
+    return out
+
+
+def summarize(result: dict, intervals) -> dict:
+    """
+    Średnie po zdarzeniach (tylko z bazą): {"n", "mean_abnormal": {m}, "t": {m}} —
+    t = średnia / (odchylenie / sqrt(liczba)), przekrojowo po tweetach.
+    """
+    ar = result["abnormal"]
+    valid = ~np.isnan(ar)
+    n = valid.sum(axis=0)
+    total = np.where(valid, ar, 0.0).sum(axis=0)
+    mean = np.where(n > 0, total / np.maximum(n, 1), np.nan)
+    dev = np.where(valid, ar - mean[None, :], 0.0)
+    sd = np.sqrt((dev ** 2).sum(axis=0) / np.maximum(n - 1, 1))
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where((n > 1) & (sd > 0), mean / (sd / np.sqrt(n)), np.nan)
+    return {
+        "n": int(valid.any(axis=1).sum()),
+        "mean_abnormal": {m: _round(v, 4) for m, v in zip(intervals, mean)},
+        "t": {m: _round(v, 3) for m, v in zip(intervals, t)},
+    }
+
+
+def _round(v, digits: int):
+    return None if v is None or np.isnan(v) else round(float(v), digits)
+
+
+def event_record(result: dict, i: int, intervals, min_obs: int = MIN_BASELINE_OBS) -> dict:
+    """Wynik jednego zdarzenia jako słownik do JSON (NaN -> None)."""
+    if not result["found"][i]:
+        reason = "no_data"
+    elif result["baseline_n"][i] < max(2, int(min_obs)):
+        reason = "no_baseline"
+    else:
+        reason = "ok"
+    return {
+        "reason": reason,
+        "base": _round(result["base"][i], 4),
+        "baseline": {"n": int(result["baseline_n"][i]), "drift": _round(result["drift"][i], 5),
+                     "vol": _round(result["vol"][i], 5)},
+        "returns": {m: _round(v, 2) for m, v in zip(intervals, result["returns"][i])},
+        "abnormal": {m: _round(v, 4) for m, v in zip(intervals, result["abnormal"][i])},
+        "zscore": {m: _round(v, 3) for m, v in zip(intervals, result["zscore"][i])},
+        "max_up": _round(result["max_up"][i], 4),
+        "max_down": _round(result["max_down"][i], 4),
+    }
@@ -1,14 +1,22 @@
-# export_dataset.py — eksport tweetów do CSV z % zmianą po 1..20, 30, 60 min
+# export_dataset.py — eksport tweetów do CSV / Parquet / Arrow z % zmianą po 1..20, 30, 60 min
 # Tryb podglądu: ograniczenie do pierwszych N tweetów
-import os, glob, argparse
+import os, glob, json, shutil, argparse
+import numpy as np
 import pandas as pd
 from datetime import timedelta
 from zoneinfo import ZoneInfo
 
+from prices import load_prices, list_price_files, tree_signature, read_price_file
+from price_store import PriceStore, NS_PER_MIN, open_price_store
+from symbols import discover_symbols, symbol_for_dir, parse_symbols
+from tweets import load_tweet_table, filter_tweets
+from event_study import event_study, parse_intervals, DEFAULT_LOOKBACK, MIN_BASELINE_OBS
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 DATA_DIR = os.path.join(BASE_DIR, "data")
 TWEETS_CSV = os.path.join(DATA_DIR, "all_musk_posts.csv")
 PRICES_DIR = os.path.join(DATA_DIR, "TSLA_sorted")
+PRICES_SYMBOL = symbol_for_dir(PRICES_DIR)   # symbol domyślny; inne: data/<SYMBOL>_sorted (--symbols)
 OUT_CSV = os.path.join(DATA_DIR, "tweet_impact_dataset.csv")
 OUT_CSV_PREVIEW = os.path.join(DATA_DIR, "tweet_impact_dataset_preview.csv")
 
@@ -19,137 +27,471 @@ PRICES_SOURCE_TZ = "Europe/Warsaw"   # tak jak w app.py
 PRICES_MIN = "2010-06-29 21:00:00+00:00"
 PRICES_MAX = "2025-03-07 20:54:00+00:00"
 
-def to_utc(series, source_tz: str):
-    s = pd.to_datetime(series, errors="coerce", utc=False)
-    try:
-        has_tz = s.dt.tz is not None
-    except Exception:
-        has_tz = False
-    if has_tz:
-        return s.dt.tz_convert("UTC")
-    tz = ZoneInfo(source_tz)
-    s = s.dt.tz_localize(tz, nonexistent="shift_forward", ambiguous="NaT")
-    return s.dt.tz_convert("UTC")
-
-def load_tweets(csv_path: str, prices_min: str, prices_max: str) -> pd.DataFrame:
-    if not os.path.exists(csv_path):
-        raise FileNotFoundError(f"Brak pliku z tweetami: {csv_path}")
-    df = pd.read_csv(csv_path, low_memory=False)
-
-    df["tweet_id"] = df["id"] if "id" in df.columns else range(1, len(df)+1)
-    df["text"] = df["fullText"].fillna("") if "fullText" in df.columns else df.get("text", "").fillna("")
+INTERVALS = tuple(list(range(1,21)) + [30,60])
 
-    if "createdAt" not in df.columns:
-        raise ValueError("Brakuje kolumny 'createdAt' w pliku z tweetami.")
-    df["created_at"] = pd.to_datetime(df["createdAt"], errors="coerce", utc=True)
+MANIFEST_VERSION = 1
+CHECKPOINT_EVERY = 5000   # tweetów na checkpoint w trybie --incremental
 
-    # --- filtr po czasie, dokładnie jak chciałaś
-    lo = pd.to_datetime(prices_min, utc=True)
-    hi = pd.to_datetime(prices_max, utc=True)
-    df = df[(df["created_at"] >= lo) & (df["created_at"] <= hi)]
-
-    df = df.dropna(subset=["created_at"]).sort_values("created_at").reset_index(drop=True)
+def load_tweets(csv_path: str, prices_min: str, prices_max: str, use_cache: bool = True) -> pd.DataFrame:
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(f"Brak pliku z tweetami: {csv_path}")
+    # wspólne parsowanie + snapshot z app.py (tweets.py); tu bez filtra godzin sesji, od najstarszych
+    df = filter_tweets(load_tweet_table(csv_path, use_cache=use_cache), prices_min, prices_max)
     return df[["tweet_id", "text", "created_at"]]
 
-def load_prices_from_dir(base_dir: str) -> pd.DataFrame:
+def load_prices_from_dir(base_dir: str, use_cache: bool = True, workers: int = 0) -> pd.DataFrame:
     if not os.path.isdir(base_dir):
         raise FileNotFoundError(f"Brak katalogu z cenami: {base_dir}")
     files = glob.glob(os.path.join(base_dir, "**", "*.csv"), recursive=True)
     if not files:
         raise FileNotFoundError(f"Nie znaleziono plików CSV w {base_dir}")
 
-    frames = []
-    for path in files:
-        try:
-            raw = pd.read_csv(path, low_memory=False)
-            dt_col = next((c for c in ["datetime","time","timestamp","date","Date","Time"] if c in raw.columns), None)
-            if not dt_col:
-                continue
-            def pick(col):
-                if col in raw.columns: return raw[col]
-                if col.capitalize() in raw.columns: return raw[col.capitalize()]
-                if col.upper() in raw.columns: return raw[col.upper()]
-                raise KeyError(col)
-            part = pd.DataFrame({
-                "datetime": to_utc(raw[dt_col], PRICES_SOURCE_TZ),
-                "open":  pd.to_numeric(pick("open"),  errors="coerce"),
-                "high":  pd.to_numeric(pick("high"),  errors="coerce"),
-                "low":   pd.to_numeric(pick("low"),   errors="coerce"),
-                "close": pd.to_numeric(pick("close"), errors="coerce"),
-            }).dropna(subset=["datetime"])
-            frames.append(part)
-        except Exception as e:
-            print(f"[prices] pomijam {path}: {e}")
-    if not frames:
+    prices = load_prices(base_dir, PRICES_SOURCE_TZ, use_cache=use_cache, workers=workers)
+    if prices.empty:
         raise RuntimeError("Nie udało się wczytać żadnych danych cenowych.")
-    return pd.concat(frames, ignore_index=True).sort_values("datetime").reset_index(drop=True)
+    return prices
+
+def symbol_dirs(symbols) -> dict:
+    """{symbol: katalog cen} dla podanych symboli (ValueError, gdy któregoś nie ma w data/)."""
+    known = {**discover_symbols(DATA_DIR), PRICES_SYMBOL: PRICES_DIR}
+    unknown = [s for s in symbols if s not in known]
+    if unknown:
+        raise ValueError(f"Nieznane symbole: {', '.join(unknown)} (dostępne: {', '.join(sorted(known))})")
+    return {s: known[s] for s in symbols}
+
+def benchmark_columns(symbols, intervals) -> list:
+    """Kolumny dokładane przez kolejne symbole z --symbols (na końcu wiersza)."""
+    return [c for sym in symbols
+            for c in [f"{sym}_price_at_tweet_open"] + [f"{sym}_change_{m}m" for m in intervals]]
+
+def benchmark_frame(starts: np.ndarray, benchmarks: dict, intervals, typed: bool) -> pd.DataFrame:
+    """OPEN w minucie tweeta i % zmiany dla symboli porównawczych (NaN = brak notowania)."""
+    cols = {}
+    for sym, store in benchmarks.items():
+        if store.empty or not len(starts):
+            base, pct = np.full(len(starts), np.nan), np.full((len(starts), len(intervals)), np.nan)
+        else:
+            base, found, pct = store.change_matrix(starts, intervals)
+            base = np.where(found, base, np.nan)
+        cols[f"{sym}_price_at_tweet_open"] = base.astype(np.float64)
+        for j, m in enumerate(intervals):
+            cols[f"{sym}_change_{m}m"] = pct[:, j].round(2).astype(np.float32) if typed else pct[:, j].round(2)
+    return pd.DataFrame(cols, columns=benchmark_columns(benchmarks, intervals))
+
+def study_columns(intervals) -> list:
+    """Kolumny dokładane przez --event-study (po kolumnach change_*)."""
+    return (["baseline_n", "baseline_drift", "baseline_vol"]
+            + [f"abnormal_{m}m" for m in intervals] + ["max_up", "max_down"])
+
+def study_frame(starts: np.ndarray, store: PriceStore, intervals, study: dict, typed: bool) -> pd.DataFrame:
+    """Event study (event_study.py) dla chwil starts jako ramka kolumn study_columns."""
+    res = event_study(store, starts, intervals, study.get("lookback", DEFAULT_LOOKBACK), study.get("window"),
+                      study.get("min_obs", MIN_BASELINE_OBS), study.get("workers", 1))
+    cols = {"baseline_n": res["baseline_n"], "baseline_drift": res["drift"], "baseline_vol": res["vol"],
+            **{f"abnormal_{m}m": res["abnormal"][:, j] for j, m in enumerate(intervals)},
+            "max_up": res["max_up"], "max_down": res["max_down"]}
+    if typed:
+        return pd.DataFrame({k: (v.astype(np.int32) if k == "baseline_n" else v.astype(np.float32))
+                             for k, v in cols.items()})
+    return pd.DataFrame({k: (v if k == "baseline_n" else np.round(v, 4)) for k, v in cols.items()})
+
+def impact_frame(tweets: pd.DataFrame, store: PriceStore, intervals=INTERVALS, typed: bool = False,
+                 study: dict = None, benchmarks: dict = None) -> pd.DataFrame:
+    """
+    Cała macierz tweety × interwały naraz (tablice minut int64 + searchsorted), bez pętli po wierszach.
+    Pomija tweety spoza zakresu cen i bez ceny OPEN w minucie tweeta; % zmiany OPEN (minuta +m vs minuta tweeta)
+    zaokrąglone do 0.01.
+    typed=True (parquet/arrow): tweet_id int64, datetime jako timestamp UTC, zmiany float32;
+    typed=False (CSV): dotychczasowy układ z tekstową datą w czasie PL.
+    study: {"lookback", "window", "min_obs", "workers"} — dodatkowo kolumny event study (dryf i zmienność
+    z okna przed tweetem, zwroty nadwyżkowe, wychylenie HIGH/LOW); None = bez nich.
+    benchmarks: {symbol: magazyn cen} — kolumny <SYM>_price_at_tweet_open / <SYM>_change_*
+    dla tych samych chwil (wiersze wyznacza nadal store).
+    """
+    n = len(tweets)
+    if tweets.empty or store.empty:
+        keep = np.zeros(n, dtype=bool)
+        base, pct = np.empty(n), np.empty((n, len(intervals)))
+    else:
+        starts = tweets["created_at"].astype("int64").to_numpy()
+        minutes = starts // NS_PER_MIN
+        in_range = (minutes >= store.minute_keys[0]) & (minutes <= store.minute_keys[-1])
+        base, found, pct = store.change_matrix(starts, intervals)
+        keep = in_range & found
+
+    sel = tweets[keep].reset_index(drop=True)
+    created = pd.to_datetime(sel["created_at"], utc=True)
+    if typed:
+        out = pd.DataFrame({
+            "tweet_id": pd.to_numeric(sel["tweet_id"], errors="coerce").astype("Int64"),
+            "datetime": created,
+            "text": sel["text"].astype(object),
+            "price_at_tweet_open": base[keep].astype(np.float64),
+        })
+        changes = pct[keep].round(2).astype(np.float32)
+    else:
+        out = pd.DataFrame({
+            "tweet_id": sel["tweet_id"].astype(str),
+            "datetime": created.dt.tz_convert(DISPLAY_TZ).dt.strftime("%Y-%m-%d %H:%M:%S %Z"),
+            "text": sel["text"],
+            "price_at_tweet_open": base[keep],   # pomocniczo, można usunąć
+        })
+        changes = pct[keep].round(2)
+    changes = pd.DataFrame(changes, columns=[f"change_{m}m" for m in intervals])
+    if study is None and not benchmarks:
+        return pd.concat([out, changes], axis=1)
+    starts = sel["created_at"].astype("int64").to_numpy() if len(sel) else np.empty(0, dtype=np.int64)
+    parts = [out, changes]
+    if study is not None:
+        parts.append(study_frame(starts, store, intervals, study, typed))
+    if benchmarks:
+        parts.append(benchmark_frame(starts, benchmarks, intervals, typed))
+    return pd.concat(parts, axis=1)
+
+# ===== Zapis / odczyt wyniku =====
+# csv – jak dotąd; parquet / arrow (IPC) – kolumny typowane, wymagają pyarrow (opcjonalna zależność)
+OUTPUT_FORMATS = {"csv": ".csv", "parquet": ".parquet", "arrow": ".arrow"}
+CHUNK_ROWS = 50_000   # tweetów na porcję / row group przy zapisie strumieniowym
+
+def _require_pyarrow():
+    try:
+        import pyarrow as pa
+    except ImportError as e:
+        raise RuntimeError("Format parquet/arrow wymaga pakietu pyarrow (pip install pyarrow).") from e
+    return pa
+
+def output_path_for(path: str, fmt: str) -> str:
+    """Podmienia rozszerzenie na właściwe dla formatu (tweet_impact_dataset.csv -> .parquet)."""
+    root, ext = os.path.splitext(path)
+    return root + OUTPUT_FORMATS[fmt] if ext in OUTPUT_FORMATS.values() else path
+
+def arrow_schema(intervals, study: bool = False, benchmarks=()):
+    pa = _require_pyarrow()
+    fields = ([("tweet_id", pa.int64()), ("datetime", pa.timestamp("ns", tz="UTC")),
+               ("text", pa.string()), ("price_at_tweet_open", pa.float64())]
+              + [(f"change_{m}m", pa.float32()) for m in intervals])
+    if study:
+        fields += [(c, pa.int32() if c == "baseline_n" else pa.float32()) for c in study_columns(intervals)]
+    fields += [(c, pa.float64() if c.endswith("_price_at_tweet_open") else pa.float32())
+               for c in benchmark_columns(benchmarks, intervals)]
+    return pa.schema(fields)
 
-def build_minute_open_series(prices_df: pd.DataFrame) -> pd.Series:
+class ImpactWriter:
     """
-    >>> UWAGA: korzystamy z OPEN (nie close) <<<
-    Dla każdej minuty bierzemy ostatni rekord i jego 'open'.
+    Strumieniowy zapis wyniku porcjami (CSV: dopisywanie, parquet: row groups, arrow: record batches).
+    Piszemy do pliku .tmp i podmieniamy atomowo w close() — przerwany run nie zostawia połowy pliku.
     """
-    df = prices_df.copy()
-    df["minute"] = df["datetime"].dt.floor("min")
-    per_min = df.sort_values("datetime").groupby("minute").last()
-    s = per_min["open"].astype(float)   # <--- OPEN
-    s.index = pd.to_datetime(s.index)
-    return s
-
-def pct_changes_for_tweet(minute_series: pd.Series, tweet_dt_utc: pd.Timestamp,
-                          intervals=(1,2,3,4,5,6,7,8,9,10,11,12,13,14,15,16,17,18,19,20,30,60)):
-    base_minute = pd.Timestamp(tweet_dt_utc).floor("min")
-    base = minute_series.get(base_minute, None)  # OPEN w minucie tweeta
-    out = {}
-    for m in intervals:
-        target = base_minute + pd.Timedelta(minutes=m)
-        p = minute_series.get(target, None)      # OPEN w minucie +m
-        if base is not None and p is not None and base != 0:
-            out[m] = round((p - base) / base * 100.0, 2)
+
+    def __init__(self, path: str, fmt: str = "csv", intervals=INTERVALS, study: bool = False, benchmarks=()):
+        if fmt not in OUTPUT_FORMATS:
+            raise ValueError(f"Nieznany format: {fmt}")
+        self.path, self.fmt, self.tmp = path, fmt, path + ".tmp"
+        self.rows = 0
+        self._writer = self._sink = None
+        if fmt == "csv":
+            self._header = True
+            return
+        pa = _require_pyarrow()
+        self.schema = arrow_schema(intervals, study, benchmarks)
+        if fmt == "parquet":
+            import pyarrow.parquet as pq
+            self._writer = pq.ParquetWriter(self.tmp, self.schema)
         else:
-            out[m] = None
-    return out, base
+            self._sink = pa.OSFile(self.tmp, "wb")
+            self._writer = pa.ipc.new_file(self._sink, self.schema)
+
+    def write(self, df: pd.DataFrame):
+        if self.fmt == "csv":
+            df.to_csv(self.tmp, index=False, header=self._header, mode="w" if self._header else "a")
+            self._header = False
+        elif len(df):
+            pa = _require_pyarrow()
+            table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+            self._writer.write_table(table)
+        self.rows += len(df)
+
+    def close(self):
+        if self.fmt == "csv" and self._header:
+            self.write(pd.DataFrame())   # pusty wynik -> pusty plik (jak to_csv pustej ramki)
+        if self._writer is not None:
+            self._writer.close()
+        if self._sink is not None:
+            self._sink.close()
+        os.replace(self.tmp, self.path)
+
+    def abort(self):
+        try:
+            if self._writer is not None:
+                self._writer.close()
+            if self._sink is not None:
+                self._sink.close()
+        finally:
+            if os.path.exists(self.tmp):
+                os.remove(self.tmp)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            self.abort()
+
+def read_output(path: str, fmt: str = "csv") -> pd.DataFrame:
+    if fmt == "csv":
+        return pd.read_csv(path, dtype={"tweet_id": str})
+    pa = _require_pyarrow()
+    if fmt == "parquet":
+        import pyarrow.parquet as pq
+        table = pq.read_table(path)
+    else:
+        with pa.memory_map(path, "r") as src:
+            table = pa.ipc.open_file(src).read_all()
+    return table.to_pandas()
+
+def write_output(df: pd.DataFrame, path: str, fmt: str = "csv", intervals=INTERVALS, study: bool = False,
+                 benchmarks=()):
+    """Zapis atomowy całej ramki (plik tymczasowy + os.replace)."""
+    with ImpactWriter(path, fmt, intervals, study, benchmarks) as w:
+        w.write(df)
+
+# ===== Manifest (tryb przyrostowy) =====
+# <out>.manifest.json: parametry eksportu, ostatni przetworzony tweet, sygnatura plików cen
+# (ścieżka, mtime_ns, rozmiar) oraz – w trakcie runu – checkpoint do wznowienia.
+def manifest_path_for(out_path: str) -> str:
+    return out_path + ".manifest.json"
+
+def parts_dir_for(out_path: str) -> str:
+    return out_path + ".parts"
+
+def part_path_for(parts_dir: str, k: int, fmt: str = "csv") -> str:
+    return os.path.join(parts_dir, f"{k:05d}{OUTPUT_FORMATS[fmt]}")
+
+def read_manifest(path: str):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def write_manifest(path: str, manifest: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+
+def changed_price_ranges(base_dir: str, old_sig: list, new_sig: list):
+    """
+    Zakresy czasu [lo_ns, hi_ns] z plików cen nowych lub zmienionych względem old_sig.
+    None, gdy jakiś plik zniknął (wtedy bezpieczniej przeliczyć wszystko).
+    """
+    old = {rel: (mtime, size) for rel, mtime, size in old_sig}
+    new_rels = {rel for rel, _, _ in new_sig}
+    if any(rel not in new_rels for rel in old):
+        return None
+    ranges = []
+    for rel, mtime, size in new_sig:
+        if old.get(rel) == (mtime, size):
+            continue
+        try:
+            part = read_price_file(os.path.join(base_dir, rel), PRICES_SOURCE_TZ)
+        except Exception as e:
+            print(f"[prices] pomijam {rel}: {e}")
+            continue
+        if part is None or part.empty:
+            continue
+        ts = part["datetime"].astype("int64")
+        ranges.append([int(ts.min()), int(ts.max())])
+    return ranges
+
+def pending_mask(starts: np.ndarray, since_ns, ranges, intervals, study: dict = None) -> np.ndarray:
+    """
+    Tweety do przeliczenia: nowsze niż since_ns albo z oknem +max(intervals) na zmienionych cenach
+    (z event study także okno bazowe -lookback i okno wychylenia +window).
+    """
+    if since_ns is None or ranges is None:
+        return np.ones(len(starts), dtype=bool)
+    mask = starts > since_ns
+    base = (starts // NS_PER_MIN) * NS_PER_MIN
+    span = max(intervals) * NS_PER_MIN
+    before = 0
+    if study is not None:
+        span = max(span, int(study.get("window") or 0) * NS_PER_MIN)
+        before = int(study.get("lookback", DEFAULT_LOOKBACK)) * NS_PER_MIN
+    for lo, hi in ranges:
+        mask |= (base - before <= hi) & (base + span >= lo)
+    return mask
+
+def merge_rows(existing: pd.DataFrame, fresh: pd.DataFrame, recomputed_ids, tweets: pd.DataFrame) -> pd.DataFrame:
+    """Podmienia wiersze przeliczonych tweetów; kolejność jak w tweets (rosnąco po czasie)."""
+    if existing is not None and len(existing):
+        existing = existing[~existing["tweet_id"].astype(str).isin(recomputed_ids)]
+        merged = pd.concat([existing, fresh], ignore_index=True) if len(fresh) else existing
+    else:
+        merged = fresh
+    order = pd.Series(np.arange(len(tweets)), index=tweets["tweet_id"].astype(str))
+    order = order[~order.index.duplicated()]
+    pos = merged["tweet_id"].astype(str).map(order).fillna(len(tweets))
+    return merged.iloc[np.argsort(pos.to_numpy(), kind="stable")].reset_index(drop=True)
+
+def run_incremental(tweets: pd.DataFrame, store: PriceStore, intervals, out_path: str, settings: dict,
+                    price_sig: list, checkpoint_every: int = CHECKPOINT_EVERY, fmt: str = "csv",
+                    study: dict = None, price_dir: str = PRICES_DIR, benchmarks: dict = None,
+                    benchmark_files: dict = None) -> pd.DataFrame:
+    """
+    Przelicza tylko nowe tweety i tweety dotknięte nowymi/zmienionymi plikami cen, scala z istniejącym
+    wynikiem. Co checkpoint_every tweetów dopisuje świeże wiersze jako część w <out>.parts + checkpoint,
+    więc przerwany run się wznawia; plik wynikowy jest przepisywany raz, na końcu.
+    benchmarks: {symbol: magazyn}, benchmark_files: {symbol: (katalog, sygnatura)} — zmiany w plikach
+    symboli porównawczych też wyznaczają tweety do przeliczenia.
+    """
+    benchmarks = benchmarks or {}
+    bench_sig = {sym: sig for sym, (_, sig) in (benchmark_files or {}).items()}
+    mpath = manifest_path_for(out_path)
+    manifest = read_manifest(mpath)
+    starts = tweets["created_at"].astype("int64").to_numpy()
+    latest_ns = int(starts.max()) if len(starts) else None
+
+    usable = (manifest is not None and manifest.get("version") == MANIFEST_VERSION
+              and manifest.get("settings") == settings
+              and (os.path.exists(out_path) or manifest.get("last_tweet_ns") is None))
+    if not usable:
+        print("   • brak zgodnego manifestu — przeliczam wszystko")
+        manifest = {"version": MANIFEST_VERSION, "settings": settings,
+                    "last_tweet_ns": None, "price_files": [], "checkpoint": None}
+    ckpt = manifest.get("checkpoint")
+    parts_dir = parts_dir_for(out_path)
+    if (ckpt and "parts" in ckpt and ckpt.get("price_files") == price_sig
+            and ckpt.get("benchmark_files", {}) == bench_sig):
+        print(f"   • wznawiam od checkpointu ({pd.to_datetime(ckpt['done_ns'], utc=True)})")
+    else:
+        shutil.rmtree(parts_dir, ignore_errors=True)   # części porzuconego, niewznawialnego runu
+        since = manifest.get("last_tweet_ns")
+        ranges = changed_price_ranges(price_dir, manifest.get("price_files") or [], price_sig) \
+            if since is not None else None
+        old_bench = manifest.get("benchmark_files") or {}
+        for sym, (base_dir, sig) in (benchmark_files or {}).items():
+            if ranges is None:
+                break
+            extra = changed_price_ranges(base_dir, old_bench.get(sym) or [], sig)
+            ranges = None if extra is None else ranges + extra
+        ckpt = {"price_files": price_sig, "since_ns": since, "ranges": ranges, "done_ns": None, "parts": 0}
+        if bench_sig:
+            ckpt["benchmark_files"] = bench_sig
+
+    todo = pending_mask(starts, ckpt["since_ns"], ckpt["ranges"], intervals, study)
+    recomputed = todo.copy()   # wszystkie tweety tego runu (także te z poprzednich checkpointów)
+    if ckpt["done_ns"] is not None:
+        todo &= starts > ckpt["done_ns"]
+    idx = np.flatnonzero(todo)
+    print(f"   • do przeliczenia: {len(idx)} z {len(tweets)} tweetów")
 
-def run(limit: int = 0, prices_min: str = PRICES_MIN, prices_max: str = PRICES_MAX, out_path: str = OUT_CSV):
+    # Co checkpoint zapisujemy tylko świeże wiersze porcji do osobnego pliku części (<out>.parts/NNNNN);
+    # scalenie z istniejącym wynikiem i przepisanie pliku wyjściowego — raz, na końcu runu.
+    typed = fmt != "csv"
+    os.makedirs(parts_dir, exist_ok=True)
+    n_parts = ckpt.get("parts", 0)
+    step = max(1, int(checkpoint_every))
+    pos = 0
+    while pos < len(idx):
+        # nie rozcinamy tweetów o tym samym czasie między checkpointami (done_ns = "wszystko <=")
+        end = min(pos + step, len(idx))
+        end = int(np.searchsorted(starts[idx], starts[idx[end - 1]], side="right"))
+        fresh = impact_frame(tweets.iloc[idx[pos:end]], store, intervals, typed, study, benchmarks)
+        write_output(fresh, part_path_for(parts_dir, n_parts, fmt), fmt, intervals, study is not None,
+                     tuple(benchmarks))
+        n_parts += 1
+        ckpt.update({"done_ns": int(starts[idx[end - 1]]), "parts": n_parts})
+        manifest["checkpoint"] = ckpt
+        write_manifest(mpath, manifest)
+        pos = end
+
+    existing = read_output(out_path, fmt) if usable and os.path.exists(out_path) else None
+    if recomputed.any() or existing is None:
+        parts = [read_output(part_path_for(parts_dir, k, fmt), fmt) for k in range(n_parts)]
+        parts = [part for part in parts if len(part)]
+        fresh = (pd.concat(parts, ignore_index=True) if parts
+                 else impact_frame(tweets.iloc[0:0], store, intervals, typed, study, benchmarks))
+        merged = merge_rows(existing, fresh, set(tweets["tweet_id"].iloc[recomputed].astype(str)), tweets)
+        write_output(merged, out_path, fmt, intervals, study is not None, tuple(benchmarks))
+    else:
+        merged = existing
+    manifest.update({"last_tweet_ns": latest_ns, "price_files": price_sig, "checkpoint": None})
+    if bench_sig:
+        manifest["benchmark_files"] = bench_sig
+    write_manifest(mpath, manifest)
+    shutil.rmtree(parts_dir, ignore_errors=True)
+    return merged
+
+def run(limit: int = 0, prices_min: str = PRICES_MIN, prices_max: str = PRICES_MAX, out_path: str = OUT_CSV,
+        use_cache: bool = True, workers: int = 0, intervals=INTERVALS,
+        incremental: bool = False, checkpoint_every: int = CHECKPOINT_EVERY,
+        fmt: str = "csv", chunk_rows: int = CHUNK_ROWS,
+        event_study: bool = False, lookback: int = DEFAULT_LOOKBACK, window: int = 0, symbols=None):
+    """
+    event_study=True: dodatkowe kolumny event study (event_study.py) — baseline z `lookback` minut
+    przed tweetem, zwroty nadwyżkowe per interwał, wychylenie HIGH/LOW w `window` minut (0 = max interwał).
+    symbols: np. ("TSLA", "SPY") — pierwszy wyznacza wiersze i kolumny change_*, kolejne (benchmarki)
+    dokładają kolumny <SYM>_price_at_tweet_open / <SYM>_change_*; domyślnie tylko PRICES_SYMBOL.
+    """
+    symbols = tuple(symbols or (PRICES_SYMBOL,))
+    dirs = symbol_dirs(symbols)
+    price_dir = dirs[symbols[0]]
+    out_path = output_path_for(out_path, fmt)
     print("[1/4] Wczytuję tweety…")
-    tweets = load_tweets(TWEETS_CSV, prices_min, prices_max)
+    tweets = load_tweets(TWEETS_CSV, prices_min, prices_max, use_cache=use_cache)
     if limit and limit > 0:
         tweets = tweets.head(limit).copy()
     print(f"   ✓ {len(tweets)} tweetów po filtrze czasu; limit={limit or 'brak'}")
 
-    print("[2/4] Wczytuję ceny…")
-    prices = load_prices_from_dir(PRICES_DIR)
+    print(f"[2/4] Wczytuję ceny {symbols[0]}…")
+    price_sig = tree_signature(price_dir, list_price_files(price_dir))
+    prices = load_prices_from_dir(price_dir, use_cache=use_cache, workers=workers)
     print(f"   ✓ {len(prices)} wierszy cen")
+    # benchmarki: tylko wskazane symbole, wprost nad mmap cache (bez ramki w pamięci)
+    benchmarks, benchmark_files = {}, {}
+    for sym in symbols[1:]:
+        benchmark_files[sym] = (dirs[sym], tree_signature(dirs[sym], list_price_files(dirs[sym])))
+        benchmarks[sym] = open_price_store(dirs[sym], PRICES_SOURCE_TZ, use_cache=use_cache, workers=workers)
+        print(f"   ✓ {sym}: {len(benchmarks[sym])} wierszy cen")
 
-    print("[3/4] Buduję serię minutową OPEN… (OPEN, nie close)")
-    minute_open = build_minute_open_series(prices)
-    min_dt, max_dt = minute_open.index.min(), minute_open.index.max()
+    print("[3/4] Buduję indeks minutowy OPEN… (OPEN, nie close)")
+    store = PriceStore(prices)
+    min_dt = pd.to_datetime(store.minute_keys[0] * NS_PER_MIN, utc=True)
+    max_dt = pd.to_datetime(store.minute_keys[-1] * NS_PER_MIN, utc=True)
     print(f"   ✓ Zakres cen: {min_dt} → {max_dt} (UTC)")
 
-    print("[4/4] Liczę zmiany i zapisuję CSV…")
-    intervals = tuple(list(range(1,21)) + [30,60])
-
-    rows = []
-    for r in tweets.itertuples(index=False):
-        dt = pd.Timestamp(r.created_at)  # UTC
-        if dt.floor("min") < min_dt or dt.floor("min") > max_dt:
-            continue
-        pct, base_price = pct_changes_for_tweet(minute_open, dt, intervals=intervals)
-        if base_price is None:
-            continue
-        row = {
-            "tweet_id": str(r.tweet_id),
-            "datetime": pd.Timestamp(dt).tz_convert(DISPLAY_TZ).strftime("%Y-%m-%d %H:%M:%S %Z"),
-            "text": r.text,
-            "price_at_tweet_open": base_price,   # pomocniczo, można usunąć
-        }
-        for m in intervals:
-            row[f"change_{m}m"] = pct[m]
-        rows.append(row)
-
-    out_df = pd.DataFrame(rows)
-    out_df.to_csv(out_path, index=False)
-    print(f"✓ Zapisano: {out_path}  (wierszy: {len(out_df)})")
+    print(f"[4/4] Liczę zmiany i zapisuję {fmt}…")
+    settings = {"intervals": list(intervals), "prices_min": prices_min, "prices_max": prices_max,
+                "limit": int(limit or 0), "format": fmt}
+    study = None
+    if event_study:
+        # porcje roczne event study równolegle — tyle procesów, ile przy parsowaniu cen
+        study = {"lookback": int(lookback), "window": int(window or 0) or None, "workers": workers}
+        settings["event_study"] = {"lookback": int(lookback), "window": int(window or 0)}
+    if symbols != (PRICES_SYMBOL,):
+        settings["symbols"] = list(symbols)
+    if incremental:
+        rows = len(run_incremental(tweets, store, intervals, out_path, settings, price_sig,
+                                   checkpoint_every, fmt, study, price_dir, benchmarks, benchmark_files))
+    else:
+        # porcjami: pamięć rośnie z chunk_rows, nie z liczbą wierszy wyniku
+        step = max(1, int(chunk_rows))
+        with ImpactWriter(out_path, fmt, intervals, study is not None, tuple(benchmarks)) as writer:
+            for pos in range(0, len(tweets), step):
+                writer.write(impact_frame(tweets.iloc[pos:pos + step], store, intervals, typed=fmt != "csv",
+                                          study=study, benchmarks=benchmarks))
+        rows = writer.rows
+        # manifest także po pełnym runie — kolejny --incremental liczy już tylko różnicę
+        starts = tweets["created_at"].astype("int64")
+        manifest = {"version": MANIFEST_VERSION, "settings": settings,
+                    "last_tweet_ns": int(starts.max()) if len(starts) else None,
+                    "price_files": price_sig, "checkpoint": None}
+        if benchmark_files:
+            manifest["benchmark_files"] = {sym: sig for sym, (_, sig) in benchmark_files.items()}
+        write_manifest(manifest_path_for(out_path), manifest)
+    print(f"✓ Zapisano: {out_path}  (wierszy: {rows})")
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser(description="Eksport tweetów do CSV z % zmianą (OPEN).")
@@ -157,9 +499,35 @@ if __name__ == "__main__":
     ap.add_argument("--prices-min", type=str, default=PRICES_MIN, help="Dolna granica czasu (UTC).")
     ap.add_argument("--prices-max", type=str, default=PRICES_MAX, help="Górna granica czasu (UTC).")
     ap.add_argument("--preview", action="store_true", help="Zapisz do pliku preview i nadpisz --limit=3.")
+    ap.add_argument("--no-cache", action="store_true", help="Parsuj CSV cen i tweetów od zera (bez data/.cache).")
+    ap.add_argument("--workers", type=int, default=0, help="Procesy do parsowania CSV cen i porcji event study (0 = wszystkie rdzenie).")
+    ap.add_argument("--intervals", type=str, default="1-20,30,60", help="Interwały w minutach, np. '1-20,30,60'.")
+    ap.add_argument("--incremental", action="store_true",
+                    help="Licz tylko nowe tweety / tweety dotknięte nowymi plikami cen; wznawia przerwany run.")
+    ap.add_argument("--checkpoint-every", type=int, default=CHECKPOINT_EVERY,
+                    help="Co ile tweetów zapisywać checkpoint w trybie --incremental.")
+    ap.add_argument("--format", choices=sorted(OUTPUT_FORMATS), default="csv",
+                    help="Format wyniku: csv (domyślnie), parquet lub arrow (IPC); dwa ostatnie wymagają pyarrow.")
+    ap.add_argument("--chunk-rows", type=int, default=CHUNK_ROWS,
+                    help="Ile tweetów liczyć i zapisywać naraz (row group).")
+    ap.add_argument("--event-study", action="store_true",
+                    help="Dodaj kolumny event study: dryf/zmienność przed tweetem, zwroty nadwyżkowe, wychylenie HIGH/LOW.")
+    ap.add_argument("--lookback", type=int, default=DEFAULT_LOOKBACK,
+                    help="Okno bazowe event study w minutach przed tweetem.")
+    ap.add_argument("--window", type=int, default=0,
+                    help="Okno wychylenia HIGH/LOW w minutach po tweecie (0 = największy interwał).")
+    ap.add_argument("--symbols", type=str, default="",
+                    help=f"Symbole cen po przecinku, np. 'TSLA,SPY' (katalogi data/<SYMBOL>_sorted): pierwszy "
+                         f"wyznacza wiersze i kolumny change_*, kolejne dokładają <SYM>_change_* (domyślnie {PRICES_SYMBOL}).")
     args = ap.parse_args()
+    intervals = parse_intervals(args.intervals)
+    opts = dict(prices_min=args.prices_min, prices_max=args.prices_max, use_cache=not args.no_cache,
+                workers=args.workers, intervals=intervals, incremental=args.incremental,
+                checkpoint_every=args.checkpoint_every, fmt=args.format, chunk_rows=args.chunk_rows,
+                event_study=args.event_study, lookback=args.lookback, window=args.window,
+                symbols=parse_symbols(args.symbols))
 
     if args.preview:
-        run(limit=3, prices_min=args.prices_min, prices_max=args.prices_max, out_path=OUT_CSV_PREVIEW)
+        run(limit=3, out_path=OUT_CSV_PREVIEW, **opts)
     else:
-        run(limit=args.limit, prices_min=args.prices_min, prices_max=args.prices_max, out_path=OUT_CSV)
+        run(limit=args.limit, out_path=OUT_CSV, **opts)
@@ -0,0 +1,22 @@
+# gunicorn.conf.py — uruchomienie produkcyjne: gunicorn -c gunicorn.conf.py app:app
+# preload_app: app.py (tweety, indeksy, mapowanie cache cen) ładuje się RAZ w procesie master,
+# workery powstają przez fork i dzielą te strony pamięci (copy-on-write; ceny to mmap plików .npy).
+# Dzięki temu liczbę workerów można skalować do liczby rdzeni bez mnożenia RAM i czasu startu.
+import os
+
+# preload: dane wczytane w masterze PRZED forkiem (wątek rozgrzewania nie przeżyłby forka)
+os.environ.setdefault("APP_WARMUP", "sync")
+# obserwator nowych plików danych: opt-in, startuje w każdym workerze (post_fork), nie w masterze —
+# każdy worker podmienia własne globalne dane; cache na dysku przebudowuje tylko jeden naraz
+# (blokada plikowa prices.cache_lock), pozostałe tylko mapują gotowe pliki
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", "0") or 0) or (os.cpu_count() or 1)
+preload_app = True
+# parsowanie przy pustym cache może potrwać — nie zabijaj workera w trakcie pierwszego startu
+timeout = int(os.environ.get("GUNICORN_TIMEOUT", "120"))
+
+
+def post_fork(server, worker):
+    import app
+    app.start_watcher()
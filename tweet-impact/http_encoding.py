@@ -0,0 +1,60 @@
+# http_encoding.py — szybka serializacja JSON i kompresja odpowiedzi (Accept-Encoding)
+# orjson / brotli są opcjonalne: bez nich json.dumps i sam gzip.
+import gzip, json
+import numpy as np
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+JSON_MIMETYPE = "application/json"
+COMPRESS_MIN_BYTES = 1024     # mniejszych odpowiedzi nie opłaca się kompresować
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5            # kompromis CPU/rozmiar dla odpowiedzi liczonych na żywo
+
+_ORJSON_OPTS = (orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS | orjson.OPT_SORT_KEYS) if orjson else 0
+
+
+def _default(o):
+    if isinstance(o, np.ndarray):
+        return o.tolist()
+    if isinstance(o, np.generic):
+        return o.item()
+    raise TypeError(f"{type(o).__name__} nie jest serializowalny do JSON")
+
+
+def dumps(obj) -> bytes:
+    """JSON jako bytes (UTF-8); tablice numpy serializowane bez .tolist(), gdy jest orjson."""
+    if orjson is not None:
+        return orjson.dumps(obj, option=_ORJSON_OPTS)
+    return json.dumps(obj, default=_default, separators=(",", ":"), sort_keys=True,
+                      ensure_ascii=False).encode("utf-8")
+
+
+def available_encodings() -> tuple:
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def pick_encoding(accept_encodings) -> str:
+    """Najlepsze kodowanie z request.accept_encodings (werkzeug Accept; q=0 = odmowa) albo None."""
+    for enc in available_encodings():
+        if accept_encodings and accept_encodings[enc] > 0:
+            return enc
+    return None
+
+
+def compress(body: bytes, encoding: str):
+    """(body, encoding) — małe odpowiedzi i brak wspólnego kodowania: bez zmian, encoding=None."""
+    if not encoding or len(body) < COMPRESS_MIN_BYTES:
+        return body, None
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY), "br"
+    if encoding == "gzip":
+        return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0), "gzip"
+    return body, None
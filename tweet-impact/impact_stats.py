@@ -0,0 +1,164 @@
+# impact_stats.py — zmaterializowana macierz % zmian tweety × minuty (+1..+60) do zapytań /api/stats
+# Macierz liczona raz (change_matrix na magazynie cen) i odświeżana przyrostowo: przy nowych danych
+# liczymy tylko wiersze nowych tweetów i tweetów, których okno trafia w minuty zmienione w cenach.
+# Zapytanie = pozycje z TweetIndex.query (te same filtry co lista) + agregaty po grupach w numpy.
+import warnings
+import numpy as np
+
+from prices import file_day_range
+from price_store import NS_PER_MIN
+
+STATS_INTERVALS = tuple(range(1, 61))
+DEFAULT_QUANTILES = (0.1, 0.25, 0.5, 0.75, 0.9)
+# nazwy wymiarów grupowania -> kolumna TweetIndex ("year" albo flaga)
+GROUP_COLUMNS = {"year": "year", "isreply": "isReply", "reply": "isReply", "isretweet": "isRetweet",
+                 "retweet": "isRetweet", "isquote": "isQuote", "quote": "isQuote"}
+
+
+def changed_minutes(old, new):
+    """
+    Posortowane minuty epoki, w których ceny mogły się zmienić między magazynami. PriceStore: indeks OPEN
+    (minute_keys / minute_opens) — minuty nowe, usunięte albo ze zmienioną ceną. PartitionedPriceStore:
+    doby plików dodanych / usuniętych / zmienionych wg sygnatury, bez wczytywania partycji.
+    None, gdy tego nie da się ustalić — wtedy trzeba przeliczyć wszystko.
+    """
+    if all(hasattr(s, "signature") for s in (old, new)):
+        return changed_file_minutes(old, new)
+    if not all(hasattr(s, "minute_keys") for s in (old, new)):
+        return None
+    ok, ov = np.asarray(old.minute_keys), np.asarray(old.minute_opens)
+    nk, nv = np.asarray(new.minute_keys), np.asarray(new.minute_opens)
+
+    def unchanged(keys, vals, ref_keys, ref_vals):
+        if not len(ref_keys):
+            return np.zeros(len(keys), dtype=bool)
+        pos = np.minimum(np.searchsorted(ref_keys, keys), len(ref_keys) - 1)
+        same_val = (ref_vals[pos] == vals) | (np.isnan(ref_vals[pos]) & np.isnan(vals))
+        return (ref_keys[pos] == keys) & same_val
+
+    return np.union1d(nk[~unchanged(nk, nv, ok, ov)], ok[~unchanged(ok, ov, nk, nv)])
+
+
+def changed_file_minutes(old, new):
+    """Minuty dób lokalnych plików, które różnią się (ścieżka, mtime_ns, rozmiar) między dwoma drzewami cen."""
+    if old.base_dir != new.base_dir or old.source_tz != new.source_tz:
+        return None
+    changed = {tuple(f) for f in old.signature} ^ {tuple(f) for f in new.signature}
+    minutes = []
+    for rel in sorted({f[0] for f in changed}):
+        day = file_day_range(rel, new.source_tz)
+        if day is None:
+            return None
+        minutes.append(np.arange(day[0] // NS_PER_MIN, -(-day[1] // NS_PER_MIN), dtype=np.int64))
+    return np.unique(np.concatenate(minutes)) if minutes else np.empty(0, dtype=np.int64)
+
+
+class ImpactMatrix:
+    """
+    Niezmienna migawka: indeks tweetów + magazyn cen + macierz pct [len(index), len(intervals)] (float32,
+    NaN = brak ceny), wiersze w kolejności pozycji TweetIndex. refreshed() buduje NOWĄ migawkę,
+    kopiując niezmienione wiersze z poprzedniej.
+    """
+
+    def __init__(self, index, store, intervals=STATS_INTERVALS, previous: "ImpactMatrix" = None):
+        self.index = index
+        self.store = store
+        self.intervals = tuple(int(m) for m in intervals)
+        self.generation = previous.generation + 1 if previous is not None else 0
+        self.version = f"{self.generation}-{store.version}"
+
+        n = len(index)
+        starts = np.asarray(index.created_ts, dtype=np.int64) * 10**9
+        self.pct = np.full((n, len(self.intervals)), np.nan, dtype=np.float32)
+        todo = np.ones(n, dtype=bool)
+
+        if previous is not None and previous.intervals == self.intervals and n:
+            # te same tweety (po id) — wiersze z poprzedniej migawki
+            src = previous.index.positions(index.tweet_ids)
+            reuse = src >= 0
+            if previous.store is not store:
+                changed = changed_minutes(previous.store, store)
+                if changed is None:
+                    reuse[:] = False
+                elif len(changed):
+                    base = starts // NS_PER_MIN
+                    hits = (np.searchsorted(changed, base + max(self.intervals), side="right")
+                            - np.searchsorted(changed, base, side="left"))
+                    reuse &= hits == 0
+            self.pct[reuse] = previous.pct[src[reuse]]
+            todo = ~reuse
+
+        self.computed = int(todo.sum())
+        if self.computed and not store.empty:
+            _, _, pct = store.change_matrix(starts[todo], self.intervals)
+            self.pct[todo] = pct
+
+    def refreshed(self, index, store) -> "ImpactMatrix":
+        """Migawka dla nowego indeksu / magazynu (self, gdy oba te same)."""
+        if index is self.index and store is self.store:
+            return self
+        return ImpactMatrix(index, store, self.intervals, previous=self)
+
+    @property
+    def nbytes(self) -> int:
+        return int(self.pct.nbytes)
+
+    # --- agregaty ---
+    def columns(self, intervals) -> np.ndarray:
+        """Kolumny macierzy dla interwałów (ValueError, gdy któregoś nie ma w macierzy)."""
+        lookup = {m: j for j, m in enumerate(self.intervals)}
+        missing = [m for m in intervals if m not in lookup]
+        if missing:
+            raise ValueError(f"interwały spoza macierzy: {missing} (dostępne 1..{max(self.intervals)})")
+        return np.asarray([lookup[m] for m in intervals], dtype=np.int64)
+
+    def group_stats(self, positions, group_by=(), intervals=None, quantiles=DEFAULT_QUANTILES) -> list:
+        """
+        Agregaty % zmian dla wierszy positions, pogrupowane po kolumnach group_by (year / flagi).
+        Każda grupa: {"key", "tweets", "count", "mean", "median", "quantiles": {q: [...]}} —
+        listy wyrównane do intervals (None, gdy w grupie brak cen dla interwału).
+        """
+        intervals = tuple(intervals or self.intervals)
+        cols = self.columns(intervals)
+        positions = np.asarray(positions, dtype=np.int64)
+
+        keys = []
+        codes = np.zeros(len(positions), dtype=np.int64)
+        for name in group_by:
+            col = self.index.year if name == "year" else self.index.flags[name]
+            values, inverse = np.unique(col[positions], return_inverse=True)
+            codes = codes * len(values) + inverse
+            keys.append((name, values))
+
+        out = []
+        order = np.argsort(codes, kind="stable")
+        bounds = np.flatnonzero(np.diff(codes[order])) + 1
+        for rows in (np.split(order, bounds) if len(order) else []):
+            key = {}
+            code = int(codes[rows[0]])
+            for name, values in reversed(keys):
+                code, k = divmod(code, len(values))
+                key[name] = values[k].item()
+            key = {name: key[name] for name, _ in keys}
+            out.append({"key": key, "tweets": int(len(rows)),
+                        **self._aggregate(self.pct[positions[rows]][:, cols], quantiles)})
+        return out
+
+    @staticmethod
+    def _aggregate(block: np.ndarray, quantiles) -> dict:
+        valid = ~np.isnan(block)
+        count = valid.sum(axis=0)
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore", RuntimeWarning)   # kolumny bez żadnej ceny -> NaN
+            mean = np.nanmean(block, axis=0, dtype=np.float64)
+            qs = np.nanquantile(block.astype(np.float64), (0.5,) + tuple(quantiles), axis=0)
+
+        def clean(a):
+            return [None if np.isnan(v) else round(float(v), 4) for v in a]
+
+        return {
+            "count": count.tolist(),
+            "mean": clean(mean),
+            "median": clean(qs[0]),
+            "quantiles": {str(q): clean(row) for q, row in zip(quantiles, qs[1:])},
+        }
@@ -0,0 +1,133 @@
+# ingest.py — dociąganie nowych danych bez restartu: obserwator plików (polling) w wątku w tle
+# Watcher co `interval` s woła funkcje sprawdzające (np. "prices", "tweets"); każda sama wykrywa
+# zmianę, buduje NOWY obiekt danych i podmienia go jednym przypisaniem (atomowo dla czytelników).
+# AppendedCsv: odczyt tylko wierszy dopisanych na końcu CSV (np. all_musk_posts.csv).
+import os, io, time, hashlib, threading, traceback
+import pandas as pd
+
+TAIL_CHECK_BYTES = 4096     # końcówka pliku porównywana przy dopisywaniu (wykrywa nadpisanie całości)
+
+
+class Watcher:
+    def __init__(self, interval: float, checks):
+        """checks: lista (nazwa, funkcja) — funkcja zwraca True, gdy wczytała nowe dane."""
+        self.interval = float(interval)
+        self.checks = list(checks)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._state = {name: {"polls": 0, "changes": 0, "last_change": None, "seconds": None, "error": None}
+                       for name, _ in self.checks}
+        self.thread = None
+
+    def poll_once(self) -> dict:
+        """Jedno przejście po wszystkich sprawdzeniach; {nazwa: zmiana?}. Błąd jednego nie blokuje reszty."""
+        out = {}
+        for name, fn in self.checks:
+            t0 = time.perf_counter()
+            try:
+                changed = bool(fn())
+                error = None
+            except Exception as e:
+                traceback.print_exc()
+                print(f"[ingest] {name}: {e}")
+                changed, error = False, f"{type(e).__name__}: {e}"
+            with self._lock:
+                st = self._state[name]
+                st["polls"] += 1
+                st["error"] = error
+                if changed:
+                    st["changes"] += 1
+                    st["last_change"] = time.strftime("%Y-%m-%dT%H:%M:%S%z")
+                    st["seconds"] = round(time.perf_counter() - t0, 3)
+            out[name] = changed
+        return out
+
+    def _loop(self, wait_for):
+        if wait_for is not None:
+            wait_for()
+        while not self._stop.wait(self.interval):
+            self.poll_once()
+
+    def start(self, wait_for=None) -> threading.Thread:
+        """Wątek w tle; wait_for (np. WARMUP.wait) — najpierw poczekaj na pierwsze wczytanie danych."""
+        if self.thread is not None and self.thread.is_alive():
+            return self.thread
+        self._stop.clear()
+        self.thread = threading.Thread(target=self._loop, args=(wait_for,), name="ingest", daemon=True)
+        self.thread.start()
+        return self.thread
+
+    def stop(self):
+        self._stop.set()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {"interval": self.interval, "running": bool(self.thread and self.thread.is_alive()),
+                    **{name: dict(st) for name, st in self._state.items()}}
+
+
+class AppendedCsv:
+    """
+    Pozycja odczytu w CSV dopisywanym na końcu. mark() zapamiętuje stan pliku (przed pełnym
+    wczytaniem), poll() zwraca:
+      None              – bez zmian (albo ostatni wiersz jeszcze niedopisany),
+      ("append", df)    – tylko nowe wiersze (kolumny jak w nagłówku pliku),
+      ("reload", None)  – plik podmieniony / skrócony / zmieniony w środku — trzeba wczytać całość.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.offset = None
+        self.mtime_ns = None
+        self.columns = None
+        self.tail = None
+
+    def _digest(self, f, end: int) -> str:
+        f.seek(max(0, end - TAIL_CHECK_BYTES))
+        return hashlib.blake2b(f.read(end - max(0, end - TAIL_CHECK_BYTES)), digest_size=8).hexdigest()
+
+    def mark(self):
+        try:
+            st = os.stat(self.path)
+            self.columns = list(pd.read_csv(self.path, nrows=0).columns)
+            with open(self.path, "rb") as f:
+                self.tail = self._digest(f, st.st_size)
+        except (OSError, ValueError):
+            self.offset = self.mtime_ns = self.columns = self.tail = None
+            return
+        self.offset, self.mtime_ns = st.st_size, st.st_mtime_ns
+
+    def poll(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            if self.offset is None:
+                return None
+            self.mark()
+            return "reload", None
+        if self.offset is not None and (st.st_size, st.st_mtime_ns) == (self.offset, self.mtime_ns):
+            return None
+        if self.offset is None or st.st_size < self.offset:
+            self.mark()
+            return "reload", None
+
+        with open(self.path, "rb") as f:
+            if self._digest(f, self.offset) != self.tail:
+                self.mark()
+                return "reload", None
+            f.seek(self.offset)
+            chunk = f.read(st.st_size - self.offset)
+        # tylko pełne wiersze; niedokończony (albo urwany w środku pola w cudzysłowie) — przy kolejnym poll
+        end = chunk.rfind(b"\n") + 1
+        if end <= 0:
+            return None
+        try:
+            df = pd.read_csv(io.BytesIO(chunk[:end]), header=None, names=self.columns, low_memory=False)
+        except (ValueError, pd.errors.ParserError):
+            return None
+
+        with open(self.path, "rb") as f:
+            self.tail = self._digest(f, self.offset + end)
+        self.offset += end
+        self.mtime_ns = st.st_mtime_ns if self.offset == st.st_size else None
+        return "append", df
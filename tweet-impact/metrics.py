@@ -0,0 +1,164 @@
+# metrics.py — lekka instrumentacja: fazy żądań (Server-Timing), histogramy opóźnień, czasy startu
+# Eksport w formacie tekstowym Prometheusa (GET /metrics). Bez zależności; każda metryka ma własny lock.
+import time, threading
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# granice kubełków w sekundach (jak domyślne w prometheus_client, dogęszczone poniżej 5 ms)
+LATENCY_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1,
+                   0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(v)}"' for k, v in sorted(labels.items())) + "}"
+
+
+class Histogram:
+    """Histogram kumulatywny per zestaw etykiet: kubełki, suma, licznik."""
+
+    def __init__(self, name: str, help_text: str, buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.buckets = tuple(buckets)
+        self._series = {}   # klucz etykiet -> [counts per bucket (+Inf), sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        i = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            items = [(dict(k), list(c), s) for k, (c, s) in sorted(self._series.items())]
+        for labels, counts, total in items:
+            cum = 0
+            for bound, n in zip(self.buckets + (float("inf"),), counts):
+                cum += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{self.name}_bucket{_labels({**labels, 'le': le})} {cum}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {total!r}")
+            lines.append(f"{self.name}_count{_labels(labels)} {cum}")
+        return lines
+
+
+class Gauge:
+    """Wartość ustawiana wprost albo liczona przy odczycie (fn zwraca listę (etykiety: dict, wartość))."""
+
+    def __init__(self, name: str, help_text: str, fn=None, kind: str = "gauge"):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.fn = fn
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def set(self, value: float, **labels):
+        with self._lock:
+            self._values[tuple(sorted(labels.items()))] = float(value)
+
+    def render(self) -> list:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        if self.fn is not None:
+            values = {tuple(sorted(labels.items())): v for labels, v in self.fn()}
+        else:
+            with self._lock:
+                values = dict(self._values)
+        for key, value in sorted(values.items()):
+            lines.append(f"{self.name}{_labels(dict(key))} {float(value)!r}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        """Dodaje metrykę; ta sama nazwa zastępuje poprzednią (np. ponowny import app.py)."""
+        self.metrics = [m for m in self.metrics if m.name != metric.name] + [metric]
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for m in self.metrics:
+            lines.extend(m.render())
+        return "\n".join(lines) + "\n"
+
+
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+REGISTRY = Registry()
+REQUEST_SECONDS = REGISTRY.register(Histogram(
+    "tweet_impact_request_seconds", "Czas obsługi żądania HTTP (endpoint, status)."))
+PHASE_SECONDS = REGISTRY.register(Histogram(
+    "tweet_impact_phase_seconds", "Czas faz na gorącej ścieżce (endpoint, faza)."))
+STARTUP_SECONDS = REGISTRY.register(Gauge(
+    "tweet_impact_startup_seconds", "Czasy faz startu aplikacji (wczytanie i indeksy)."))
+
+
+# ===== Fazy żądania =====
+_local = threading.local()
+
+
+def begin_request(endpoint: str):
+    """Start pomiaru żądania w bieżącym wątku (before_request)."""
+    _local.endpoint = endpoint
+    _local.phases = {}
+    _local.started = time.perf_counter()
+
+
+def end_request(status: int):
+    """Koniec żądania: (całkowity czas s, {faza: s}); zapis do histogramu. None poza żądaniem."""
+    started = getattr(_local, "started", None)
+    if started is None:
+        return None
+    total = time.perf_counter() - started
+    REQUEST_SECONDS.observe(total, endpoint=_local.endpoint, status=status)
+    phases = _local.phases
+    _local.started = None
+    return total, phases
+
+
+@contextmanager
+def phase(name: str):
+    """Mierzy fazę: suma czasu fazy w bieżącym żądaniu (Server-Timing) + histogram faz."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        endpoint = getattr(_local, "endpoint", None) if getattr(_local, "started", None) else None
+        if endpoint is not None:
+            _local.phases[name] = _local.phases.get(name, 0.0) + dt
+        PHASE_SECONDS.observe(dt, endpoint=endpoint or "-", phase=name)
+
+
+def server_timing(total: float, phases: dict) -> str:
+    """Nagłówek Server-Timing: faza;dur=ms, …, total;dur=ms."""
+    parts = [f"{name};dur={dt * 1000:.3f}" for name, dt in phases.items()]
+    parts.append(f"total;dur={total * 1000:.3f}")
+    return ", ".join(parts)
+
+
+@contextmanager
+def startup_phase(name: str):
+    """Czas fazy startu (wczytanie tweetów, cen, budowa indeksów) -> gauge + log."""
+    t0 = time.perf_counter()
+    try:
+        yield
+    finally:
+        dt = time.perf_counter() - t0
+        STARTUP_SECONDS.set(dt, phase=name)
+        print(f"[startup] {name}: {dt:.2f} s")
@@ -0,0 +1,468 @@
+# price_store.py — indeks cen minutowych budowany raz przy starcie
+# Okna czasowe wyszukiwane binarnie (searchsorted) po posortowanej tablicy int64 ns,
+# zwracane jako widoki (iloc na zakresie) — bez maskowania całej ramki i bez .copy().
+# PartitionedPriceStore: to samo API, ale lata (data/TSLA_sorted/<rok>/) ładowane leniwie, z limitem pamięci.
+# open_price_store: magazyn wprost nad plikami cache (mmap) — workery WSGI dzielą te same strony pamięci.
+import os, json, hashlib, threading, contextlib
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+from prices import (PRICE_COLUMNS, PRICES_SOURCE_TZ, CACHE_MANIFEST, empty_prices, load_price_arrays,
+                    arrays_to_frame, cache_dir_for, cache_lock, list_price_files, tree_signature)
+
+NS_PER_MIN = 60 * 10**9
+STORE_MANIFEST = "store.json"
+STORE_FILES = ("minute_keys", "minute_opens")
+
+
+def ts_ns(ts) -> int:
+    """pd.Timestamp / datetime / unix ns -> int ns UTC."""
+    if isinstance(ts, (int, np.integer)):
+        return int(ts)
+    ts = pd.Timestamp(ts)
+    if ts.tzinfo is None:
+        ts = ts.tz_localize("UTC")
+    return int(ts.value)
+
+
+def _ts_utc(ns: int) -> pd.Timestamp:
+    return pd.Timestamp(int(ns), tz="UTC")
+
+
+class PriceStoreBase:
+    """
+    Wspólne zapytania nad magazynem cen. Podklasa dostarcza: between, arrays_between,
+    next_ts_at_or_after, open_at_minutes, describe, empty, version.
+    """
+
+    def window(self, start, minutes: int = 15):
+        """
+        (df_window, used_start, reason) — reason in ["ok","fallback_next","no_data"].
+        Gdy w [start, start+minutes] brak notowań, okno startuje od najbliższego punktu >= start.
+        """
+        start = pd.Timestamp(start)
+        span = minutes * NS_PER_MIN
+        win = self.between(start, ts_ns(start) + span)
+        if not win.empty:
+            return win, start, "ok"
+
+        nxt = self.next_ts_at_or_after(start)
+        if nxt is not None:
+            return self.between(nxt, nxt + span), _ts_utc(nxt), "fallback_next"
+
+        return win, start, "no_data"
+
+    def windows_many(self, starts, ends) -> list:
+        """Lista słowników tablic (jak arrays_between) dla par [start, end] (int ns)."""
+        return [self.arrays_between(int(s), int(e)) for s, e in zip(starts, ends)]
+
+    def percent_changes(self, start, intervals=(1,2,3,4,5,6,7,8,9,10,15,30,60)):
+        """
+        {minuty: %zmiana} OPEN w minucie start+m względem OPEN w minucie start (None gdy brak ceny).
+        Wszystkie interwały w jednym lookupie.
+        """
+        base_minute = ts_ns(start) // NS_PER_MIN
+        offsets = np.asarray((0,) + tuple(intervals), dtype=np.int64)
+        vals, found = self.open_at_minutes(base_minute + offsets)
+        base = vals[0]
+        if not found[0] or base == 0:
+            return {m: None for m in intervals}
+        pct = (vals[1:] - base) / base * 100
+        return {m: (round(float(p), 2) if ok else None)
+                for m, p, ok in zip(intervals, pct, found[1:])}
+
+    def change_matrix(self, starts, intervals):
+        """
+        Wektorowo dla wielu chwil naraz: starts (int ns UTC) × intervals (minuty).
+        Zwraca (base, found, pct): base/found – OPEN w minucie startu, pct – macierz
+        [len(starts), len(intervals)] % zmian (NaN gdy brak ceny lub base == 0), bez zaokrąglenia.
+        """
+        base_minutes = np.asarray(starts, dtype=np.int64) // NS_PER_MIN
+        offsets = np.asarray(tuple(intervals), dtype=np.int64)
+        base, found = self.open_at_minutes(base_minutes)
+        vals, vfound = self.open_at_minutes(base_minutes[:, None] + offsets[None, :])
+        ok = vfound & (found & (base != 0))[:, None]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            pct = (vals - base[:, None]) / base[:, None] * 100
+        return base, found, np.where(ok, pct, np.nan)
+
+
+class PriceStore(PriceStoreBase):
+    """
+    Posortowane ceny + indeks czasu (int64 ns UTC).
+    Zwracane ramki to widoki na self.df — traktuj je jako tylko do odczytu.
+    """
+
+    def __init__(self, df: pd.DataFrame):
+        if df is None or df.empty:
+            df = empty_prices()
+            ts = np.empty(0, dtype=np.int64)
+        else:
+            if not df["datetime"].is_monotonic_increasing:
+                df = df.sort_values("datetime", kind="stable").reset_index(drop=True)
+            ts = df["datetime"].astype("int64").to_numpy()
+        self._df = df if list(df.columns) == PRICE_COLUMNS else df[PRICE_COLUMNS]
+        self.ts = ts
+        # kolumny OHLC jako tablice float64 (do odpowiedzi kolumnowych i obliczeń wsadowych)
+        self.cols = {c: self._df[c].to_numpy(dtype=np.float64) for c in PRICE_COLUMNS[1:]}
+        self._build_minute_index()
+        self.version = self._content_version()
+
+    @classmethod
+    def from_arrays(cls, arrays: dict, minute_keys=None, minute_opens=None, version=None):
+        """
+        Magazyn bezpośrednio nad tablicami (np. mmap z cache) — bez kopiowania do DataFrame.
+        Posortowane po czasie jak z load_price_arrays. Indeks minut / wersję można podać gotowe.
+        """
+        store = cls.__new__(cls)
+        store._df = None
+        store.ts = arrays["datetime"]
+        store.cols = {c: arrays[c] for c in PRICE_COLUMNS[1:]}
+        if minute_keys is None or minute_opens is None:
+            store._build_minute_index()
+        else:
+            store.minute_keys, store.minute_opens = minute_keys, minute_opens
+        store.version = version or store._content_version()
+        return store
+
+    @property
+    def df(self) -> pd.DataFrame:
+        """Cała ramka cen — przy magazynie nad mmap budowana dopiero przy pierwszym użyciu."""
+        if self._df is None:
+            self._df = arrays_to_frame({"datetime": self.ts, **self.cols})
+        return self._df
+
+    def _content_version(self) -> str:
+        """Stempel wersji danych (hash treści) — ten sam po restarcie i w każdym workerze."""
+        h = hashlib.blake2b(digest_size=8)
+        h.update(np.ascontiguousarray(self.ts).data)
+        for c in PRICE_COLUMNS[1:]:
+            h.update(np.ascontiguousarray(self.cols[c]).data)
+        return h.hexdigest()
+
+    def _build_minute_index(self):
+        """
+        Minuta epoki -> OPEN ostatniego notowania w tej minucie (jak dawne _minute_close_at).
+        Tylko minuty z notowaniami (posortowane klucze): ~700 tys. zamiast ~7,7 mln gęstych slotów.
+        """
+        keys = self.ts // NS_PER_MIN
+        if len(keys):
+            last = np.append(np.flatnonzero(np.diff(keys)), len(keys) - 1)
+        else:
+            last = np.empty(0, dtype=np.int64)
+        self.minute_keys = keys[last]
+        self.minute_opens = np.asarray(self.cols["open"], dtype=np.float64)[last]
+
+    def __len__(self):
+        return len(self.ts)
+
+    @property
+    def empty(self) -> bool:
+        return len(self.ts) == 0
+
+    # --- indeksy ---
+    def bounds(self, start, end):
+        """Zakres pozycji [lo, hi) dla czasu w [start, end] (obustronnie domknięte)."""
+        lo = int(np.searchsorted(self.ts, ts_ns(start), side="left"))
+        hi = int(np.searchsorted(self.ts, ts_ns(end), side="right"))
+        return lo, max(lo, hi)
+
+    def bounds_many(self, starts, ends):
+        """Wektorowo: tablice int ns [start, end] -> tablice (lo, hi) pozycji."""
+        lo = np.searchsorted(self.ts, np.asarray(starts, dtype=np.int64), side="left")
+        hi = np.searchsorted(self.ts, np.asarray(ends, dtype=np.int64), side="right")
+        return lo, np.maximum(lo, hi)
+
+    def next_at_or_after(self, start):
+        """Pozycja pierwszego notowania >= start albo None."""
+        pos = int(np.searchsorted(self.ts, ts_ns(start), side="left"))
+        return pos if pos < len(self.ts) else None
+
+    # --- wycinki ---
+    def between(self, start, end) -> pd.DataFrame:
+        """Notowania w [start, end] BEZ przesuwania (widok; nad mmap — mała ramka z wycinków)."""
+        lo, hi = self.bounds(start, end)
+        if self._df is not None:
+            return self._df.iloc[lo:hi]
+        df = arrays_to_frame({"datetime": self.ts[lo:hi], **{c: a[lo:hi] for c, a in self.cols.items()}})
+        df.index = pd.RangeIndex(lo, hi)
+        return df
+
+    def arrays_between(self, start, end) -> dict:
+        """Jak between, ale słownik tablic numpy (datetime = int64 ns) — widoki, bez pandas."""
+        lo, hi = self.bounds(start, end)
+        return {"datetime": self.ts[lo:hi], **{c: a[lo:hi] for c, a in self.cols.items()}}
+
+    def windows_many(self, starts, ends) -> list:
+        """Wszystkie okna naraz: dwa searchsorted na tablicach granic, potem same wycinki."""
+        lo, hi = self.bounds_many(starts, ends)
+        return [{"datetime": self.ts[a:b], **{c: arr[a:b] for c, arr in self.cols.items()}}
+                for a, b in zip(lo.tolist(), hi.tolist())]
+
+    def next_ts_at_or_after(self, start):
+        """Czas (int ns) pierwszego notowania >= start albo None."""
+        pos = self.next_at_or_after(start)
+        return None if pos is None else int(self.ts[pos])
+
+    @property
+    def nbytes(self) -> int:
+        frame = int(self._df.memory_usage(index=True).sum()) if self._df is not None else 0
+        return int(frame + self.ts.nbytes + sum(a.nbytes for a in self.cols.values())
+                   + self.minute_keys.nbytes + self.minute_opens.nbytes)
+
+    def describe(self) -> dict:
+        return {
+            "rows": int(len(self)),
+            "min": str(_ts_utc(self.ts[0])) if len(self) else None,
+            "max": str(_ts_utc(self.ts[-1])) if len(self) else None,
+        }
+
+    # --- ceny per minuta ---
+    def open_at_minutes(self, minutes):
+        """
+        Wektorowo: tablica minut epoki -> (open, found). Brak notowania => found=False, open=NaN.
+        """
+        minutes = np.asarray(minutes, dtype=np.int64)
+        if not len(self.minute_keys):
+            return np.full(minutes.shape, np.nan), np.zeros(minutes.shape, dtype=bool)
+        pos = np.searchsorted(self.minute_keys, minutes)
+        pos_c = np.minimum(pos, len(self.minute_keys) - 1)
+        found = self.minute_keys[pos_c] == minutes
+        return np.where(found, self.minute_opens[pos_c], np.nan), found
+
+
+# ===== Magazyn współdzielony (mmap) =====
+# Obok cache kolumn (prices.py) trzymamy gotowy indeks minut i wersję danych; każdy proces
+# otwiera je przez np.load(mmap_mode="r"), więc N workerów = jedna kopia w page cache systemu.
+def _manifest_digest(cache_dir: str):
+    """Skrót manifest.json cache kolumn — zmienia się przy każdej przebudowie cache."""
+    try:
+        with open(os.path.join(cache_dir, CACHE_MANIFEST), "rb") as f:
+            return hashlib.blake2b(f.read(), digest_size=8).hexdigest()
+    except OSError:
+        return None
+
+
+def _read_store_files(cache_dir: str, source: str):
+    """(minute_keys, minute_opens, version) z mmap albo None, gdy brak / nieaktualne."""
+    try:
+        with open(os.path.join(cache_dir, STORE_MANIFEST), encoding="utf-8") as f:
+            meta = json.load(f)
+        if meta.get("source") != source:
+            return None
+        keys, opens = (np.load(os.path.join(cache_dir, f"{name}.npy"), mmap_mode="r") for name in STORE_FILES)
+    except (OSError, ValueError):
+        return None
+    if len(keys) != meta.get("minutes") or len(opens) != len(keys):
+        return None
+    return keys, opens, meta.get("version")
+
+
+def _write_store_files(cache_dir: str, source: str, store: "PriceStore"):
+    """Zapis atomowy per plik, store.json na końcu (jak write_cache w prices.py)."""
+    meta_path = os.path.join(cache_dir, STORE_MANIFEST)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(meta_path)
+    for name in STORE_FILES:
+        tmp = os.path.join(cache_dir, f"{name}.{os.getpid()}.tmp.npy")
+        np.save(tmp, np.ascontiguousarray(getattr(store, name)))
+        os.replace(tmp, os.path.join(cache_dir, f"{name}.npy"))
+    tmp = f"{meta_path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"source": source, "minutes": int(len(store.minute_keys)), "version": store.version}, f)
+    os.replace(tmp, meta_path)
+
+
+def open_price_store(base_dir: str, source_tz: str = PRICES_SOURCE_TZ, use_cache: bool = True,
+                     workers=None, cache_dir: str = None, progress=None) -> PriceStore:
+    """
+    PriceStore wprost nad plikami cache (mmap, tylko do odczytu) — bez kopii w pamięci procesu.
+    Pierwszy proces po zmianie danych buduje cache i indeks minut, kolejne tylko je mapują.
+    Bez cache (use_cache=False) — zwykły magazyn w pamięci.
+    """
+    if not use_cache:
+        return PriceStore(arrays_to_frame(load_price_arrays(base_dir, source_tz, False, workers,
+                                                            progress=progress)))
+
+    cache_dir = cache_dir or cache_dir_for(base_dir)
+    arrays = load_price_arrays(base_dir, source_tz, True, workers, cache_dir=cache_dir, progress=progress)
+    source = _manifest_digest(cache_dir)
+    derived = _read_store_files(cache_dir, source) if source else None
+    if derived is not None:
+        return PriceStore.from_arrays(arrays, *derived)
+
+    if not source:
+        return PriceStore.from_arrays(arrays)
+    with cache_lock(cache_dir):
+        derived = _read_store_files(cache_dir, source)
+        if derived is not None:
+            return PriceStore.from_arrays(arrays, *derived)
+        store = PriceStore.from_arrays(arrays)
+        try:
+            _write_store_files(cache_dir, source, store)
+        except OSError as e:
+            print(f"[prices] nie zapisano indeksu minut w {cache_dir}: {e}")
+    return store
+
+
+# ===== Partycje roczne ładowane leniwie =====
+class PartitionedPriceStore(PriceStoreBase):
+    """
+    Magazyn cen podzielony na lata (katalogi <base_dir>/<rok>/). Rok ładowany przy pierwszym
+    zapytaniu, które go potrzebuje (przez cache .npy z prices.py), zwalniany LRU po przekroczeniu
+    memory_limit bajtów. Granice partycji to północ 1 stycznia czasu lokalnego (pliki są w dniach
+    lokalnych), więc okna przechodzące przez granicę roku sklejamy z dwóch partycji.
+    """
+
+    def __init__(self, base_dir: str, source_tz: str = PRICES_SOURCE_TZ, memory_limit: int = 512 * 2**20,
+                 use_cache: bool = True, workers=None):
+        self.base_dir = base_dir
+        self.source_tz = source_tz
+        self.memory_limit = int(memory_limit)
+        self.use_cache = use_cache
+        self.workers = workers
+
+        self.years = sorted(int(d) for d in os.listdir(base_dir)
+                            if d.isdigit() and len(d) == 4 and os.path.isdir(os.path.join(base_dir, d)))
+        edges = [pd.Timestamp(f"{y}-01-01", tz=source_tz).value for y in self.years]
+        if self.years:
+            edges.append(pd.Timestamp(f"{self.years[-1] + 1}-01-01", tz=source_tz).value)
+        self.part_lo = np.asarray(edges[:-1], dtype=np.int64)
+        self.part_hi = np.asarray(edges[1:], dtype=np.int64)
+
+        # wersja = sygnatura plików (bez czytania treści) — stała między workerami; sama sygnatura
+        # (ścieżka, mtime_ns, rozmiar) wskazuje też, które doby zmieniły się względem innego magazynu
+        sig = tree_signature(base_dir, list_price_files(base_dir))
+        self.signature = sig
+        self.version = hashlib.blake2b(repr(sig).encode("utf-8"), digest_size=8).hexdigest()
+
+        self._parts = OrderedDict()     # indeks partycji -> PriceStore
+        self._lock = threading.RLock()
+        self.loads = 0
+        self.evictions = 0
+
+    @property
+    def empty(self) -> bool:
+        return not self.years
+
+    def __len__(self):
+        """Liczba wierszy w aktualnie załadowanych partycjach."""
+        with self._lock:
+            return sum(len(s) for s in self._parts.values())
+
+    @property
+    def nbytes(self) -> int:
+        with self._lock:
+            return sum(s.nbytes for s in self._parts.values())
+
+    # --- partycje ---
+    def _part_of(self, ns):
+        """Indeks partycji dla czasu (tablica int ns); -1 / len(years) poza zakresem."""
+        k = np.searchsorted(self.part_lo, np.asarray(ns, dtype=np.int64), side="right") - 1
+        return np.where(np.asarray(ns) >= self.part_hi[-1], len(self.years), k) if self.years else k
+
+    def _parts_between(self, start_ns: int, end_ns: int) -> range:
+        if not self.years or end_ns < start_ns:
+            return range(0)
+        k0 = max(int(self._part_of(start_ns)), 0)
+        k1 = min(int(self._part_of(end_ns)), len(self.years) - 1)
+        return range(k0, k1 + 1)
+
+    def partition(self, k: int) -> PriceStore:
+        """PriceStore roku years[k] — z pamięci albo wczytany (i ewentualnie zwolnienie starych)."""
+        with self._lock:
+            store = self._parts.get(k)
+            if store is not None:
+                self._parts.move_to_end(k)
+                return store
+            year = str(self.years[k])
+            store = open_price_store(os.path.join(self.base_dir, year), self.source_tz, self.use_cache,
+                                     self.workers, cache_dir=os.path.join(cache_dir_for(self.base_dir), year))
+            self._parts[k] = store
+            self.loads += 1
+            # LRU: zwalniamy najdawniej używane, nigdy właśnie wczytanej (trwające zapytania
+            # trzymają własne referencje, więc zwolnienie nie psuje ich wyników)
+            while len(self._parts) > 1 and sum(s.nbytes for s in self._parts.values()) > self.memory_limit:
+                self._parts.popitem(last=False)
+                self.evictions += 1
+            return store
+
+    # --- zapytania ---
+    def between(self, start, end) -> pd.DataFrame:
+        s, e = ts_ns(start), ts_ns(end)
+        parts = [self.partition(k).between(s, e) for k in self._parts_between(s, e)]
+        if not parts:
+            return empty_prices()
+        hits = [p for p in parts if not p.empty]
+        if len(hits) <= 1:
+            return hits[0] if hits else parts[0]
+        return pd.concat(hits)
+
+    def arrays_between(self, start, end) -> dict:
+        s, e = ts_ns(start), ts_ns(end)
+        parts = [self.partition(k).arrays_between(s, e) for k in self._parts_between(s, e)]
+        if len(parts) == 1:
+            return parts[0]
+        if not parts:
+            return {"datetime": np.empty(0, dtype=np.int64),
+                    **{c: np.empty(0, dtype=np.float64) for c in PRICE_COLUMNS[1:]}}
+        return {c: np.concatenate([p[c] for p in parts]) for c in PRICE_COLUMNS}
+
+    def next_ts_at_or_after(self, start):
+        s = ts_ns(start)
+        if not self.years:
+            return None
+        for k in range(max(int(self._part_of(s)), 0), len(self.years)):
+            nxt = self.partition(k).next_ts_at_or_after(s)
+            if nxt is not None:
+                return nxt
+        return None
+
+    def open_at_minutes(self, minutes):
+        minutes = np.asarray(minutes, dtype=np.int64)
+        flat = minutes.ravel()
+        vals = np.full(flat.shape, np.nan)
+        found = np.zeros(flat.shape, dtype=bool)
+        if self.years and len(flat):
+            k = self._part_of(flat * NS_PER_MIN)
+            for kk in np.unique(k).tolist():
+                if kk < 0 or kk >= len(self.years):
+                    continue
+                sel = k == kk
+                vals[sel], found[sel] = self.partition(kk).open_at_minutes(flat[sel])
+        return vals.reshape(minutes.shape), found.reshape(minutes.shape)
+
+    def change_matrix(self, starts, intervals):
+        """
+        Jak PriceStoreBase.change_matrix, ale po kolei dla grup startów z tej samej partycji: rok jest
+        wczytany raz i obsługuje wszystkie swoje starty, zanim LRU go zwolni (bez przeładowań przy małym
+        memory_limit). Okna przez granicę roku dociągają jeszcze następną partycję.
+        """
+        starts, intervals = np.asarray(starts, dtype=np.int64), tuple(intervals)
+        base, found = np.full(len(starts), np.nan), np.zeros(len(starts), dtype=bool)
+        pct = np.full((len(starts), len(intervals)), np.nan)
+        k = self._part_of(starts // NS_PER_MIN * NS_PER_MIN)
+        for kk in np.unique(k).tolist():
+            sel = np.flatnonzero(k == kk)
+            base[sel], found[sel], pct[sel] = super().change_matrix(starts[sel], intervals)
+        return base, found, pct
+
+    def describe(self) -> dict:
+        with self._lock:
+            loaded = list(self._parts.items())
+        first = loaded and min(loaded)[1]
+        last = loaded and max(loaded)[1]
+        return {
+            "rows": int(sum(len(s) for _, s in loaded)),
+            "min": first.describe()["min"] if loaded else None,
+            "max": last.describe()["max"] if loaded else None,
+            "partitions": {
+                "available": self.years,
+                "loaded": [self.years[k] for k, _ in loaded],
+                "memory_bytes": int(sum(s.nbytes for _, s in loaded)),
+                "memory_limit": self.memory_limit,
+                "loads": self.loads,
+                "evictions": self.evictions,
+            },
+        }
@@ -0,0 +1,391 @@
+# prices.py — wspólne wczytywanie cen minutowych (TSLA_sorted) dla app.py i export_dataset.py
+# + binarny cache kolumnowy (.npy, mmap) przebudowywany tylko gdy zmieni się drzewo CSV
+import os, glob, json, contextlib, multiprocessing
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from zoneinfo import ZoneInfo
+
+try:
+    import fcntl
+except ImportError:   # Windows: bez blokady między procesami
+    fcntl = None
+
+PRICES_SOURCE_TZ = "Europe/Warsaw"
+PRICE_COLUMNS = ["datetime", "open", "high", "low", "close"]
+OHLC_COLUMNS = ["open", "high", "low", "close"]
+
+CACHE_VERSION = 1
+CACHE_MANIFEST = "manifest.json"
+
+
+def to_utc(series, source_tz: str):
+    """
+    Zamienia kolumnę czasu na tz-aware UTC.
+    - Jeśli wartości mają już strefę (np. '2025-03-10 15:31:00+01:00') -> tylko konwersja do UTC.
+    - Jeśli są 'naive' (bez strefy), interpretuj je jako source_tz (Europe/Warsaw), potem do UTC.
+    Obsługuje zmiany czasu (DST).
+    """
+    s = pd.to_datetime(series, errors="coerce", utc=False)
+
+    # tz-aware?
+    try:
+        has_tz = s.dt.tz is not None
+    except Exception:
+        has_tz = False
+
+    if has_tz:
+        return s.dt.tz_convert("UTC")
+
+    # Naive -> potraktuj jako lokalne Europe/Warsaw
+    tz = ZoneInfo(source_tz)
+    # pandas>=2.2: parametry dla DST; jeśli masz 2.1, usuń je
+    s = s.dt.tz_localize(tz, nonexistent="shift_forward", ambiguous="NaT")
+    return s.dt.tz_convert("UTC")
+
+
+def empty_prices() -> pd.DataFrame:
+    return pd.DataFrame(columns=PRICE_COLUMNS)
+
+
+# ===== Pojedynczy plik dzienny =====
+def list_price_files(base_dir: str) -> list:
+    """Wszystkie CSV w drzewie YYYY/MM/DD, posortowane po ścieżce (= po dacie)."""
+    return sorted(glob.glob(os.path.join(base_dir, "**", "*.csv"), recursive=True))
+
+
+def read_price_file(path: str, source_tz: str = PRICES_SOURCE_TZ):
+    """
+    Wczytuje jeden dzienny CSV -> df [datetime(UTC), open, high, low, close].
+    Zwraca None, gdy plik nie ma kolumny czasu. Błędy parsowania lecą wyżej.
+    """
+    raw = pd.read_csv(path, low_memory=False)
+
+    # wybierz kolumnę czasu
+    dt_col = next((c for c in ["datetime", "time", "timestamp", "date", "Date", "Time"] if c in raw.columns), None)
+    if not dt_col:
+        return None
+
+    def pick(col):
+        if col in raw.columns: return raw[col]
+        if col.capitalize() in raw.columns: return raw[col.capitalize()]
+        if col.upper() in raw.columns: return raw[col.upper()]
+        raise KeyError(col)
+
+    return pd.DataFrame({
+        "datetime": to_utc(raw[dt_col], source_tz),
+        "open":  pd.to_numeric(pick("open"),  errors="coerce"),
+        "high":  pd.to_numeric(pick("high"),  errors="coerce"),
+        "low":   pd.to_numeric(pick("low"),   errors="coerce"),
+        "close": pd.to_numeric(pick("close"), errors="coerce"),
+    }).dropna(subset=["datetime"])
+
+
+def _read_price_file_safe(args):
+    """Wersja dla puli procesów: zamiast wyjątku zwraca (df|None, komunikat|None)."""
+    path, source_tz = args
+    try:
+        part = read_price_file(path, source_tz)
+    except Exception as e:
+        return None, str(e)
+    if part is not None:
+        # pliki dzienne bywają zapisane malejąco (21:54, 21:53, …) — sortujemy lokalnie
+        part = part.sort_values("datetime", kind="stable")
+    return part, None
+
+
+def resolve_workers(workers=None) -> int:
+    """None / 0 -> liczba rdzeni; 1 -> bez puli procesów."""
+    if not workers:
+        workers = os.cpu_count() or 1
+    return max(1, int(workers))
+
+
+def process_pool_context():
+    """
+    Kontekst dla ProcessPoolExecutor: forkserver (gdzie brak — spawn), nie domyślny fork.
+    Fork kopiuje proces razem z wątkami (rozgrzewanie, obserwator, Flask) i ich zajętymi blokadami.
+    """
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+
+
+def parse_price_files(files: list, source_tz: str = PRICES_SOURCE_TZ, workers=None,
+                      progress=None) -> pd.DataFrame:
+    """
+    Parsuje pliki (równolegle w puli procesów, gdy workers > 1); błędne pliki pomija z komunikatem.
+    Pliki są podzielone po dniach, więc wyniki sklejamy w kolejności ścieżek — bez globalnego sortowania.
+    progress – opcjonalnie progress(gotowe, wszystkie) po każdym pliku.
+    """
+    def collect(results_iter):
+        out = []
+        for res in results_iter:
+            out.append(res)
+            if progress is not None:
+                progress(len(out), len(jobs))
+        return out
+
+    workers = min(resolve_workers(workers), max(1, len(files)))
+    jobs = [(path, source_tz) for path in files]
+
+    results = None
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers, mp_context=process_pool_context()) as pool:
+                chunk = max(1, len(jobs) // (workers * 4))
+                results = collect(pool.map(_read_price_file_safe, jobs, chunksize=chunk))
+        except (OSError, RuntimeError) as e:
+            # np. brak fork/spawn w środowisku — lecimy sekwencyjnie
+            print(f"[prices] pula procesów niedostępna ({e}), wczytuję sekwencyjnie")
+            results = None
+    if results is None:
+        results = collect(_read_price_file_safe(job) for job in jobs)
+
+    frames = []
+    for path, (part, err) in zip(files, results):
+        if err is not None:
+            print(f"[prices] pomijam {path}: {err}")
+            continue
+        if part is not None:
+            frames.append(part)
+
+    if not frames:
+        return empty_prices()
+
+    all_prices = pd.concat(frames, ignore_index=True)
+    if not all_prices["datetime"].is_monotonic_increasing:
+        # pliki nakładają się w czasie (nietypowe drzewo) — wtedy pełne sortowanie
+        all_prices = all_prices.sort_values("datetime", kind="stable")
+    return all_prices.reset_index(drop=True)
+
+
+# ===== Cache binarny =====
+# Układ: <data>/.cache/<nazwa_katalogu>/{datetime,open,high,low,close}.npy + manifest.json
+# datetime = int64 ns od epoki (UTC), OHLC = float64. Manifest trzyma (ścieżka, mtime_ns, rozmiar)
+# każdego pliku źródłowego — różnica => aktualizacja: parsujemy tylko nowe / zmienione pliki dzienne
+# i wklejamy je w miejsce ich dni (pełna przebudowa, gdy nazwa pliku nie jest datą).
+def cache_dir_for(base_dir: str) -> str:
+    base_dir = os.path.abspath(base_dir)
+    return os.path.join(os.path.dirname(base_dir), ".cache", os.path.basename(base_dir))
+
+
+@contextlib.contextmanager
+def cache_lock(cache_dir: str):
+    """
+    Wyłączna blokada (plik <cache_dir>.lock) na czas budowy / aktualizacji cache: kilka workerów
+    gunicorna (każdy z obserwatorem) nie przebudowuje tego samego katalogu naraz — czekający po
+    zwolnieniu blokady tylko mapują gotowe pliki. Nie zagnieżdżać (flock nie jest reentrant).
+    """
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(os.path.abspath(cache_dir)), exist_ok=True)
+    with open(cache_dir + ".lock", "a") as f:
+        fcntl.flock(f, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(f, fcntl.LOCK_UN)
+
+
+def tree_signature(base_dir: str, files: list) -> list:
+    sig = []
+    for path in files:
+        st = os.stat(path)
+        sig.append([os.path.relpath(path, base_dir), st.st_mtime_ns, st.st_size])
+    return sig
+
+
+def frame_to_arrays(df: pd.DataFrame) -> dict:
+    arrays = {"datetime": df["datetime"].astype("int64").to_numpy() if len(df)
+              else np.empty(0, dtype=np.int64)}
+    for col in OHLC_COLUMNS:
+        arrays[col] = df[col].to_numpy(dtype=np.float64)
+    return arrays
+
+
+def arrays_to_frame(arrays: dict) -> pd.DataFrame:
+    return pd.DataFrame({
+        "datetime": pd.to_datetime(np.asarray(arrays["datetime"], dtype=np.int64), utc=True),
+        **{col: np.asarray(arrays[col], dtype=np.float64) for col in OHLC_COLUMNS},
+    })
+
+
+def _read_manifest(cache_dir: str, source_tz: str):
+    """Manifest cache (dict) albo None, gdy brak / inna wersja formatu / inna strefa źródła."""
+    try:
+        with open(os.path.join(cache_dir, CACHE_MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("version") != CACHE_VERSION or manifest.get("source_tz") != source_tz:
+        return None
+    return manifest
+
+
+def _map_arrays(cache_dir: str, rows):
+    try:
+        arrays = {col: np.load(os.path.join(cache_dir, f"{col}.npy"), mmap_mode="r")
+                  for col in PRICE_COLUMNS}
+    except (OSError, ValueError):
+        return None
+    if any(len(a) != rows for a in arrays.values()):
+        return None
+    return arrays
+
+
+def read_cache(cache_dir: str, signature: list, source_tz: str):
+    """Zwraca słownik tablic (mmap) albo None, gdy cache brak / nieaktualny."""
+    manifest = _read_manifest(cache_dir, source_tz)
+    if manifest is None or manifest.get("files") != signature:
+        return None
+    return _map_arrays(cache_dir, manifest.get("rows"))
+
+
+def file_day_range(rel_path: str, source_tz: str = PRICES_SOURCE_TZ):
+    """
+    Doba lokalna pliku dziennego (nazwa YYYY-MM-DD.csv) jako [lo, hi) w int ns UTC;
+    None, gdy nazwa nie jest datą (wtedy nie wiadomo, które wiersze cache należą do pliku).
+    """
+    name = os.path.splitext(os.path.basename(rel_path))[0]
+    try:
+        day = pd.Timestamp(datetime.strptime(name, "%Y-%m-%d"))
+    except ValueError:
+        return None
+    tz = ZoneInfo(source_tz)
+    return day.tz_localize(tz).value, (day + pd.Timedelta(days=1)).tz_localize(tz).value
+
+
+def files_end_ns(paths, source_tz: str = PRICES_SOURCE_TZ):
+    """Koniec doby lokalnej ostatniego pliku dziennego (int ns UTC, włącznie) albo None, gdy brak takich plików."""
+    for path in sorted(paths, reverse=True):
+        day = file_day_range(path, source_tz)
+        if day is not None:
+            return day[1] - 1
+    return None
+
+
+def merge_price_arrays(arrays: dict, new_arrays: dict, drop_ranges) -> dict:
+    """
+    arrays bez wierszy z przedziałów drop_ranges ([lo, hi) ns, rozłączne) + new_arrays,
+    posortowane po czasie (stabilnie: przy remisie stare wiersze przed nowymi).
+    """
+    ts = np.asarray(arrays["datetime"])
+    keep = np.ones(len(ts), dtype=bool)
+    for lo, hi in drop_ranges:
+        keep[np.searchsorted(ts, lo, side="left"):np.searchsorted(ts, hi, side="left")] = False
+    out = {col: np.concatenate([np.asarray(arrays[col])[keep], np.asarray(new_arrays[col])])
+           for col in PRICE_COLUMNS}
+    if len(out["datetime"]) > 1 and (np.diff(out["datetime"]) < 0).any():
+        order = np.argsort(out["datetime"], kind="stable")
+        out = {col: a[order] for col, a in out.items()}
+    return out
+
+
+def update_cache_arrays(base_dir: str, cache_dir: str, signature: list, source_tz: str = PRICES_SOURCE_TZ,
+                        workers=None, progress=None):
+    """
+    Nieaktualny cache + zmienione pliki -> nowe tablice bez parsowania całego drzewa:
+    z dotychczasowego cache wypadają doby zmienionych / usuniętych plików, wchodzą ich świeże wiersze.
+    Zwraca (tablice, liczba sparsowanych plików) albo None, gdy potrzebna pełna przebudowa
+    (brak starego cache, nazwa pliku nie jest datą, wiersze pliku poza jego dobą).
+    """
+    manifest = _read_manifest(cache_dir, source_tz)
+    if manifest is None:
+        return None
+    old = {path: (mtime, size) for path, mtime, size in manifest.get("files", [])}
+    new = {path: (mtime, size) for path, mtime, size in signature}
+    changed = [path for path in new if old.get(path) != new[path]]
+    removed = [path for path in old if path not in new]
+    # prawie wszystko się zmieniło — zwykłe parsowanie całości jest równie szybkie
+    if len(changed) > len(new) // 2:
+        return None
+
+    ranges = [file_day_range(path, source_tz) for path in changed + removed]
+    if any(r is None for r in ranges):
+        return None
+    arrays = _map_arrays(cache_dir, manifest.get("rows"))
+    if arrays is None:
+        return None
+
+    parsed = frame_to_arrays(parse_price_files([os.path.join(base_dir, p) for p in changed],
+                                               source_tz, workers, progress))
+    # każdy nowy wiersz musi leżeć w dobie któregoś zmienionego pliku — inaczej nie da się podmienić dób
+    lo, hi = (np.asarray(sorted(r[i] for r in ranges), dtype=np.int64) for i in (0, 1))
+    pos = np.searchsorted(lo, parsed["datetime"], side="right") - 1
+    if not (pos >= 0).all() or not (parsed["datetime"] < hi[np.maximum(pos, 0)]).all():
+        return None
+    return merge_price_arrays(arrays, parsed, ranges), len(changed)
+
+
+def write_cache(cache_dir: str, signature: list, source_tz: str, arrays: dict):
+    """Zapis atomowy per plik; manifest usuwany na start i zapisywany na końcu."""
+    os.makedirs(cache_dir, exist_ok=True)
+    manifest_path = os.path.join(cache_dir, CACHE_MANIFEST)
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(manifest_path)
+
+    # pid w nazwach tymczasowych: kilka workerów może przebudowywać cache jednocześnie
+    for col in PRICE_COLUMNS:
+        tmp = os.path.join(cache_dir, f"{col}.{os.getpid()}.tmp.npy")
+        np.save(tmp, np.ascontiguousarray(arrays[col]))
+        os.replace(tmp, os.path.join(cache_dir, f"{col}.npy"))
+
+    manifest = {
+        "version": CACHE_VERSION,
+        "source_tz": source_tz,
+        "rows": int(len(arrays["datetime"])),
+        "files": signature,
+    }
+    tmp = f"{manifest_path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, manifest_path)
+
+
+def load_price_arrays(base_dir: str, source_tz: str = PRICES_SOURCE_TZ, use_cache: bool = True,
+                      workers=None, cache_dir: str = None, progress=None) -> dict:
+    """
+    Kolumny cen jako tablice numpy (datetime = int64 ns UTC), posortowane po czasie.
+    Przy aktualnym cache: jeden mmap zamiast tysięcy read_csv; po dodaniu / zmianie plików
+    dziennych parsowane są tylko one (update_cache_arrays).
+    workers – liczba procesów do parsowania CSV (None = wszystkie rdzenie).
+    cache_dir – gdzie trzymać cache (domyślnie data/.cache/<nazwa_katalogu>).
+    progress – progress(gotowe, wszystkie) przy parsowaniu CSV (przy trafieniu w cache nie jest wołany).
+    """
+    files = list_price_files(base_dir)
+    if not use_cache:
+        return frame_to_arrays(parse_price_files(files, source_tz, workers, progress))
+
+    cache_dir = cache_dir or cache_dir_for(base_dir)
+    signature = tree_signature(base_dir, files)
+    arrays = read_cache(cache_dir, signature, source_tz)
+    if arrays is not None:
+        return arrays
+
+    with cache_lock(cache_dir):
+        # inny proces mógł zbudować cache, gdy czekaliśmy na blokadę — wtedy tylko mapujemy
+        arrays = read_cache(cache_dir, signature, source_tz)
+        if arrays is not None:
+            return arrays
+        updated = update_cache_arrays(base_dir, cache_dir, signature, source_tz, workers, progress)
+        if updated is not None:
+            arrays, parsed = updated
+            print(f"[prices] aktualizuję cache {cache_dir} (sparsowano {parsed} z {len(files)} plików)")
+        else:
+            print(f"[prices] buduję cache {cache_dir} ({len(files)} plików)…")
+            arrays = frame_to_arrays(parse_price_files(files, source_tz, workers, progress))
+        try:
+            write_cache(cache_dir, signature, source_tz, arrays)
+        except OSError as e:
+            print(f"[prices] nie zapisano cache {cache_dir}: {e}")
+            return arrays
+        # po zapisie mapujemy pliki — kopia z parsowania nie zostaje w pamięci procesu
+        return read_cache(cache_dir, signature, source_tz) or arrays
+
+
+def load_prices(base_dir: str, source_tz: str = PRICES_SOURCE_TZ, use_cache: bool = True,
+                workers=None) -> pd.DataFrame:
+    """df [datetime(UTC), open, high, low, close] posortowany po czasie."""
+    return arrays_to_frame(load_price_arrays(base_dir, source_tz, use_cache, workers))
@@ -0,0 +1,43 @@
+# response_cache.py — mały, ograniczony cache LRU gotowych odpowiedzi HTTP (bezpieczny wątkowo)
+import hashlib, threading
+from collections import OrderedDict
+
+
+def make_etag(*parts) -> str:
+    """Deterministyczny ETag z parametrów żądania i wersji danych (bez cudzysłowów)."""
+    return hashlib.blake2b(repr(parts).encode("utf-8"), digest_size=12).hexdigest()
+
+
+class ResponseCache:
+    """klucz -> (body: bytes, mimetype: str); najdawniej użyte wypadają po przekroczeniu maxsize."""
+
+    def __init__(self, maxsize: int = 1024):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            value = self._data.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
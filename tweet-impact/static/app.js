@@ -1,23 +1,37 @@
 // ===== API helpers =====
+// serwer po starcie wczytuje dane w tle: 503 + Retry-After => ponów po chwili (limit prób)
+const WARMUP_MAX_TRIES = 120;
+async function fetchReady(url, opts){
+  for(let i = 0; ; i++){
+    const r = await fetch(url, opts);
+    if(r.status !== 503 || i >= WARMUP_MAX_TRIES || !r.headers.get('Retry-After')) return r;
+    const wait = parseFloat(r.headers.get('Retry-After')) || 1;
+    await new Promise(res => setTimeout(res, wait * 1000));
+  }
+}
 async function apiList(params){
   const url = '/api/tweets?' + new URLSearchParams(params).toString();
-  const r = await fetch(url);
+  const r = await fetchReady(url);
   if(!r.ok) throw new Error('tweets api');
   return r.json();
 }
-async function apiTweet(id){
-  const r = await fetch('/api/tweet/' + encodeURIComponent(id));
+async function apiTweet(id, params){
+  // params: aktywne filtry listy — prev_id/next_id idą wtedy po przefiltrowanej liście
+  const qs = params ? '?' + new URLSearchParams(params).toString() : '';
+  const r = await fetchReady('/api/tweet/' + encodeURIComponent(id) + qs);
   if(!r.ok) throw new Error('tweet api');
   return r.json();
 }
+// okna dłuższe niż 6 h: świece 5-min liczone na serwerze (dzień = ~300 świec zamiast ~1400)
+const RESAMPLE_ABOVE_MIN = 360;
 async function apiPrice(startUnix, minutes, pre){
-  const r = await fetch('/api/price?' + new URLSearchParams({
-    start:String(startUnix), minutes:String(minutes), pre:String(pre||0)
-  }));
+  // layout=columns: {t:[...], open:[...], high:[...], low:[...], close:[...]} zamiast listy obiektów
+  const params = {start:String(startUnix), minutes:String(minutes), pre:String(pre||0), layout:'columns'};
+  if(minutes + (pre||0) > RESAMPLE_ABOVE_MIN) params.resample = '5min';
+  const r = await fetchReady('/api/price?' + new URLSearchParams(params));
   if(!r.ok) throw new Error('price api');
   return r.json();
 }
-
 // async function apiPrice(startUnix, minutes){
 //   const r = await fetch('/api/price?' + new URLSearchParams({start:String(startUnix), minutes:String(minutes)}));
 //   if(!r.ok) throw new Error('price api');
@@ -32,9 +46,14 @@ const state = {
   total: 0, years: [],
   windowMinutes: 15,           // << nowy stan: długość okna wykresu
   currentTweetId: null,         // << zapamiętanie otwartego tweeta
+  currentTweet: null,           // << ostatnia odpowiedź /api/tweet (created_ts, prev_id, next_id)
   preMinutes: 0  // 0 lub 10
 };
 
+function listFilters(){
+  return {year: state.year, reply: state.reply, retweet: state.retweet, quote: state.quote, q: state.q};
+}
+
 // ===== RENDER: list & filters =====
 async function loadFiltersAndList(initial=false){
   const data = await apiList({
@@ -102,7 +121,7 @@ async function openDetail(tweetId){
   Plotly.purge('chart'); minuteList.textContent = '—';
 
   try{
-    const t = await apiTweet(tweetId);
+    const t = await apiTweet(tweetId, listFilters());
     // header
     detail.innerHTML = `
       <div style="display:flex;justify-content:space-between;align-items:flex-start;gap:12px">
@@ -115,11 +134,22 @@ async function openDetail(tweetId){
             ${t.isQuote ? '<span class="pill">quote</span>' : ''}
           </div>
         </div>
-        <div class="muted">Tweet #${t.tweet_id}</div>
+        <div style="text-align:right">
+          <div class="muted">Tweet #${t.tweet_id}</div>
+          <div style="margin-top:6px;display:flex;gap:6px;justify-content:flex-end">
+            <button id="tw-prev" class="btn" type="button" ${t.prev_id ? '' : 'disabled'}>&larr;</button>
+            <button id="tw-next" class="btn" type="button" ${t.next_id ? '' : 'disabled'}>&rarr;</button>
+          </div>
+        </div>
       </div>
     `;
+    // nawigacja po sąsiednich tweetach bez odpytywania listy
+    if(t.prev_id) document.getElementById('tw-prev').addEventListener('click', ()=> openDetail(t.prev_id));
+    if(t.next_id) document.getElementById('tw-next').addEventListener('click', ()=> openDetail(t.next_id));
+
      // >>> [NOWE] zapamiętujemy bieżącego tweeta
     state.currentTweetId = tweetId;
+    state.currentTweet = t;
 
     // >>> [NOWE] wykres z aktualnym oknem (state.windowMinutes)
     const payload = await renderChart(t.created_ts, state.windowMinutes, state.preMinutes);
@@ -149,7 +179,7 @@ async function openDetail(tweetId){
 
 async function renderChart(startUnix, minutes, pre){
   const payload = await apiPrice(startUnix, minutes, pre);
-  const pts = payload.points || [];
+  const ts = payload.t || [];
   const reason = payload.reason || 'ok';
 
   // Dane czasu do zakresu X:
@@ -158,7 +188,7 @@ async function renderChart(startUnix, minutes, pre){
   const tweetX = toLocal(startUnix);
   tweetX.setSeconds(0, 0); // początek tej minuty
 
-  if(!pts.length){
+  if(!ts.length){
     Plotly.newPlot('chart', [{
       x:[tweetX], y:[null], mode:'lines', name:'brak danych'
     }], {
@@ -174,16 +204,16 @@ async function renderChart(startUnix, minutes, pre){
     return payload;
   }
 
-  const x = pts.map(p=>toLocal(p.t));
+  const x = ts.map(toLocal);
   const ohlcTrace = {
     type:'candlestick', x,
-    open:pts.map(p=>p.open),
-    high:pts.map(p=>p.high),
-    low: pts.map(p=>p.low),
-    close:pts.map(p=>p.close),
+    open:payload.open,
+    high:payload.high,
+    low: payload.low,
+    close:payload.close,
     name:'OHLC'
   };
-  const lineTrace = { x, y: pts.map(p=>p.close), mode:'lines', name:'Close' };
+  const lineTrace = { x, y: payload.close, mode:'lines', name:'Close' };
 
   const layout = {
     margin:{l:40,r:20,t:30,b:40},
@@ -355,7 +385,7 @@ window.addEventListener('DOMContentLoaded', ()=>{
       // jeśli mamy otwartego tweeta — przerysuj wykres i % zmian
       if (state.currentTweetId) {
         try {
-          const t = await apiTweet(state.currentTweetId);
+          const t = state.currentTweet || await apiTweet(state.currentTweetId);
           const payload = await renderChart(t.created_ts, state.windowMinutes, state.preMinutes);
           renderPctList(payload.pct_changes);
         } catch (e) {
@@ -371,7 +401,7 @@ window.addEventListener('DOMContentLoaded', ()=>{
       state.preMinutes = preCk.checked ? 10 : 0;
       if (state.currentTweetId) {
         try {
-          const t = await apiTweet(state.currentTweetId);
+          const t = state.currentTweet || await apiTweet(state.currentTweetId);
           const payload = await renderChart(t.created_ts, state.windowMinutes, state.preMinutes);
           renderPctList(payload.pct_changes);
         } catch (e) {
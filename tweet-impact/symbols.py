@@ -0,0 +1,109 @@
+# symbols.py — rejestr symboli: drzewa cen data/<SYMBOL>_sorted, magazyn cen per symbol otwierany leniwie
+# Pierwsze użycie symbolu = otwarcie (mmap) albo zbudowanie jego cache .npy, więc pamięć i czas startu
+# rosną z liczbą faktycznie używanych symboli, a nie wszystkich katalogów na dysku.
+import os, glob, threading
+
+SYMBOL_DIR_SUFFIX = "_sorted"
+
+
+def symbol_for_dir(base_dir: str) -> str:
+    """data/TSLA_sorted -> "TSLA"."""
+    name = os.path.basename(os.path.normpath(base_dir))
+    if name.endswith(SYMBOL_DIR_SUFFIX):
+        name = name[:-len(SYMBOL_DIR_SUFFIX)]
+    return name.upper()
+
+
+def discover_symbols(data_dir: str) -> dict:
+    """{symbol: katalog} dla podkatalogów data_dir o nazwie <SYMBOL>_sorted."""
+    out = {}
+    for path in sorted(glob.glob(os.path.join(data_dir, "*" + SYMBOL_DIR_SUFFIX))):
+        if os.path.isdir(path):
+            out[symbol_for_dir(path)] = path
+    return out
+
+
+def parse_symbols(spec) -> tuple:
+    """'tsla, spy,TSLA' -> ("TSLA", "SPY") — bez powtórzeń, w kolejności podania."""
+    return tuple(dict.fromkeys(s.strip().upper() for s in (spec or "").split(",") if s.strip()))
+
+
+class SymbolRegistry:
+    def __init__(self, data_dir: str, opener, signature, pinned: dict = None):
+        """
+        opener(katalog) -> magazyn cen; signature(katalog) -> sygnatura plików (wykrywanie zmian).
+        pinned: {symbol: (katalog, getter)} — symbole, których magazynem zarządza kto inny
+        (np. domyślny PRICE_STORE z rozgrzewaniem i obserwatorem); getter() zwraca bieżący magazyn.
+        """
+        self.data_dir = data_dir
+        self.opener = opener
+        self.signature = signature
+        self.pinned = dict(pinned or {})
+        self._lock = threading.Lock()
+        self._opening = {}       # symbol -> Lock: równoległe pierwsze żądania otwierają magazyn raz
+        self._stores = {}        # symbol -> (magazyn, sygnatura); podmieniany w całości (atomowo)
+        self.dirs = {}
+        self.scan()
+
+    def scan(self) -> dict:
+        """Ponowne wykrycie katalogów (nowe symbole bez restartu)."""
+        dirs = discover_symbols(self.data_dir) if os.path.isdir(self.data_dir) else {}
+        dirs.update({sym: path for sym, (path, _) in self.pinned.items()})
+        self.dirs = dict(sorted(dirs.items()))
+        return self.dirs
+
+    @property
+    def symbols(self) -> list:
+        return list(self.dirs)
+
+    def get(self, symbol: str):
+        """Magazyn cen symbolu (KeyError, gdy nieznany); otwierany przy pierwszym użyciu."""
+        symbol = symbol.upper()
+        if symbol in self.pinned:
+            return self.pinned[symbol][1]()
+        entry = self._stores.get(symbol)
+        if entry is not None:
+            return entry[0]
+        path = self.dirs[symbol]
+        with self._lock:
+            opening = self._opening.setdefault(symbol, threading.Lock())
+        with opening:
+            entry = self._stores.get(symbol)
+            if entry is None:
+                print(f"[prices] symbol {symbol}: otwieram {path}")
+                signature = self.signature(path)
+                entry = (self.opener(path), signature)
+                with self._lock:
+                    self._stores = {**self._stores, symbol: entry}
+        return entry[0]
+
+    def loaded(self) -> list:
+        return sorted(set(self._stores) | set(self.pinned))
+
+    def refresh(self) -> list:
+        """
+        Dla obserwatora: nowe katalogi + ponowne otwarcie załadowanych symboli, których pliki się
+        zmieniły (symbole pinned odświeża ich właściciel). Zwraca listę odświeżonych / usuniętych symboli.
+        """
+        self.scan()
+        changed = []
+        for symbol, (_, signature) in list(self._stores.items()):
+            path = self.dirs.get(symbol)
+            if path is None:
+                with self._lock:
+                    self._stores = {s: e for s, e in self._stores.items() if s != symbol}
+                changed.append(symbol)
+                continue
+            new_signature = self.signature(path)
+            if new_signature == signature:
+                continue
+            entry = (self.opener(path), new_signature)
+            with self._lock:
+                self._stores = {**self._stores, symbol: entry}
+            changed.append(symbol)
+        return changed
+
+    def describe(self) -> dict:
+        loaded = set(self.loaded())
+        return {sym: {"loaded": sym in loaded, **({"version": self.get(sym).version} if sym in loaded else {})}
+                for sym in self.dirs}
@@ -0,0 +1,119 @@
+# synthetic_data.py — generator danych testowych w układzie jak data/ (do benchmarków)
+# Ceny: drzewo <out>/<YYYY>/<MM>/<DD>/<YYYY-MM-DD>.csv, czas lokalny (Europe/Warsaw, naive),
+# sesja 15:30–21:54, wiersze malejąco + kolumna "% change" — jak prawdziwe pliki TSLA_sorted.
+# Tweety: CSV z kolumnami jak all_musk_posts.csv (id, fullText, createdAt, isReply, ...).
+# Skala mnoży liczbę wierszy: gęstość notowań (1× = bary 1-min, 10× = co 6 s, ...) i liczbę tweetów.
+# (100× historii w latach nie zmieściłoby się w zakresie datetime64[ns] — długość historii to osobny parametr.)
+import os, json, shutil
+import numpy as np
+import pandas as pd
+
+SESSION_START = (15, 30)          # czas lokalny pierwszego notowania dnia
+SESSION_MINUTES = 385             # 15:30 .. 21:54 włącznie
+HISTORY_END = "2025-03-07"
+HISTORY_YEARS = 15
+TWEETS_PER_SCALE = 20_000
+TWEETS_FROM = "2017-09-18"        # jak domyślny prices_min w app.load_tweets
+TWEETS_IN_SESSION = 0.6           # część tweetów w godzinach sesji (reszta odpada w filtrze app.py)
+WORDS = ("tesla", "spacex", "mars", "model", "cyber", "truck", "stock", "is", "the", "great",
+         "doge", "ai", "rocket", "launch", "battery", "starship", "falcon", "robotaxi", "fsd", "x")
+MARKER = "synthetic.json"
+
+
+def trading_days(end: str = HISTORY_END, years: int = HISTORY_YEARS) -> pd.DatetimeIndex:
+    """Dni robocze (pon–pt) z ostatnich `years` lat do `end` włącznie."""
+    end_ts = pd.Timestamp(end)
+    return pd.bdate_range(end_ts - pd.DateOffset(years=years), end_ts)
+
+
+def generate_price_tree(out_dir: str, scale: int = 1, years: int = HISTORY_YEARS, end: str = HISTORY_END,
+                        seed: int = 0) -> dict:
+    """Zapisuje drzewo dziennych CSV; zwraca {"files", "rows"}. Błądzenie losowe (geometryczne) ceny."""
+    rng = np.random.default_rng(seed)
+    step_s = 60.0 / max(1, int(scale))
+    rows_per_day = SESSION_MINUTES * max(1, int(scale))
+    offsets = pd.to_timedelta(np.arange(rows_per_day) * step_s, unit="s")
+    price = 20.0
+    files = rows = 0
+    for day in trading_days(end, years):
+        times = day + pd.Timedelta(hours=SESSION_START[0], minutes=SESSION_START[1]) + offsets
+        steps = rng.normal(0.0, 0.0015 / np.sqrt(scale), rows_per_day)
+        close = price * np.exp(np.cumsum(steps))
+        open_ = np.r_[price, close[:-1]]
+        spread = np.abs(rng.normal(0.0, 0.0008, rows_per_day)) * close
+        high = np.maximum(open_, close) + spread
+        low = np.minimum(open_, close) - spread
+        price = float(close[-1])
+
+        df = pd.DataFrame({
+            "datetime": times.strftime("%Y-%m-%d %H:%M:%S"),
+            "open": open_.round(4), "high": high.round(4), "low": low.round(4), "close": close.round(4),
+            "% change": (close / open_ - 1) * 100,
+        }).iloc[::-1]
+        day_dir = os.path.join(out_dir, f"{day:%Y}", f"{day:%m}", f"{day:%d}")
+        os.makedirs(day_dir, exist_ok=True)
+        df.to_csv(os.path.join(day_dir, f"{day:%Y-%m-%d}.csv"), index=False)
+        files += 1
+        rows += rows_per_day
+    return {"files": files, "rows": rows}
+
+
+def generate_tweets_csv(path: str, scale: int = 1, start: str = TWEETS_FROM, end: str = HISTORY_END,
+                        seed: int = 0) -> dict:
+    """Zapisuje CSV tweetów (kolejność jak w eksporcie: od najnowszych); zwraca {"rows"}."""
+    rng = np.random.default_rng(seed + 1)
+    n = TWEETS_PER_SCALE * max(1, int(scale))
+    days = pd.bdate_range(start, end)
+
+    # część w sesji (czas lokalny 15:35–21:50), reszta w dowolnej chwili zakresu
+    n_session = int(n * TWEETS_IN_SESSION)
+    local = (days[rng.integers(0, len(days), n_session)]
+             + pd.to_timedelta(15 * 3600 + 35 * 60 + rng.integers(0, 375 * 60, n_session), unit="s"))
+    in_session = local.tz_localize("Europe/Warsaw", nonexistent="shift_forward", ambiguous="NaT").tz_convert("UTC")
+    lo, hi = pd.Timestamp(start, tz="UTC").value, pd.Timestamp(end, tz="UTC").value
+    anytime = pd.to_datetime(rng.integers(lo, hi, n - n_session), utc=True)
+    created = pd.DatetimeIndex(np.r_[in_session.dropna().asi8, anytime.asi8]).tz_localize("UTC").sort_values()[::-1]
+
+    texts = [" ".join(rng.choice(WORDS, k)) for k in rng.integers(2, 14, len(created))]
+    df = pd.DataFrame({
+        "id": rng.choice(np.arange(10**17, 10**17 + 50 * len(created)), len(created), replace=False),
+        "fullText": texts,
+        "createdAt": created.strftime("%Y-%m-%dT%H:%M:%S.000Z"),
+        "isReply": rng.random(len(created)) < 0.4,
+        "isRetweet": rng.random(len(created)) < 0.1,
+        "isQuote": rng.random(len(created)) < 0.1,
+        "likeCount": rng.integers(0, 100_000, len(created)),
+        "lang": "en",
+    })
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    df.to_csv(path, index=False)
+    return {"rows": int(len(df))}
+
+
+def ensure_dataset(out_dir: str, scale: int = 1, years: int = HISTORY_YEARS, seed: int = 0) -> dict:
+    """
+    Zbiór w out_dir: prices/ (drzewo cen) + tweets.csv. Generowany raz — kolejne wywołania
+    z tymi samymi parametrami tylko czytają marker.
+    """
+    params = {"scale": int(scale), "years": int(years), "seed": int(seed), "end": HISTORY_END}
+    marker = os.path.join(out_dir, MARKER)
+    try:
+        with open(marker, encoding="utf-8") as f:
+            info = json.load(f)
+        if info.get("params") == params:
+            return info
+    except (OSError, ValueError):
+        pass
+
+    print(f"[bench] generuję dane syntetyczne {params} -> {out_dir}")
+    info = {
+        "params": params,
+        "prices_dir": os.path.join(out_dir, "prices"),
+        "tweets_csv": os.path.join(out_dir, "tweets.csv"),
+    }
+    shutil.rmtree(info["prices_dir"], ignore_errors=True)   # stare drzewo mogło mieć inne lata / gęstość
+    info["prices"] = generate_price_tree(info["prices_dir"], scale, years, HISTORY_END, seed)
+    info["tweets"] = generate_tweets_csv(info["tweets_csv"], scale, seed=seed)
+    with open(marker, "w", encoding="utf-8") as f:
+        json.dump(info, f, indent=2)
+    return info
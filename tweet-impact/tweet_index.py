@@ -0,0 +1,303 @@
+# tweet_index.py — warstwa zapytań dla /api/tweets budowana raz przy starcie
+# Flagi jako tablice bool, kubełki lat, gotowa lista lat i teksty dat do wyświetlenia;
+# kombinacja filtrów -> tablica pozycji (LRU), a strona listy to zwykły wycinek.
+# Wyszukiwanie q: indeks odwrócony (token -> posortowane pozycje), AND po słowach; słowo pasuje do
+# dowolnego fragmentu tokenu (jak dawny substring: "sla" -> "tesla").
+import re, threading
+from collections import OrderedDict
+import numpy as np
+import pandas as pd
+
+FLAG_COLUMNS = ("isReply", "isRetweet", "isQuote")
+RESULT_CACHE_SIZE = 256
+
+TOKEN_RE = re.compile(r"\w+")
+# zapytanie "wyrażalne" tokenami: same słowa rozdzielone spacjami (reszta -> zwykły substring)
+SIMPLE_QUERY_RE = re.compile(r"\s*\w+(?:\s+\w+)*\s*")
+
+
+class InvertedIndex:
+    """
+    token (małe litery) -> posortowane pozycje tweetów, w układzie CSR:
+    vocab (posortowane tokeny), offsets, postings. Słowo zapytania = wyszukanie w sklejonym słowniku
+    (vocab_text) i suma postings tokenów, które je zawierają.
+    """
+
+    def __init__(self, texts):
+        texts = pd.Series(texts, dtype=object).fillna("").astype(str)
+        tokens = texts.str.lower().str.findall(TOKEN_RE).explode().dropna()
+        pairs = pd.DataFrame({"token": tokens.to_numpy(dtype=object),
+                              "pos": tokens.index.to_numpy(dtype=np.int64)})
+        pairs = pairs.drop_duplicates().sort_values(["token", "pos"], kind="stable")
+
+        vocab, first = np.unique(pairs["token"].to_numpy(dtype=object), return_index=True)
+        self._set_csr(vocab.tolist(), np.append(first, len(pairs)), pairs["pos"].to_numpy(dtype=np.int64))
+
+    def _set_csr(self, vocab: list, offsets, postings):
+        self.vocab = vocab
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.postings = postings
+        # słownik sklejony "\n" (tokeny \w+ go nie zawierają) + początki tokenów: pozycja trafienia -> token
+        self.vocab_text = "\n".join(self.vocab)
+        self.vocab_starts = np.cumsum([0] + [len(t) + 1 for t in self.vocab[:-1]]).astype(np.int64)
+
+    def __len__(self):
+        return len(self.vocab)
+
+    def prepended(self, texts) -> "InvertedIndex":
+        """
+        NOWY indeks z texts dopisanymi na początku (pozycje 0..len(texts)-1, dotychczasowe przesunięte
+        o len(texts)). Tokenizujemy tylko nowe teksty; słowniki i postings scalamy wektorowo — w bloku tokenu
+        nowe pozycje idą przed przesuniętymi starymi, więc blok zostaje posortowany.
+        """
+        head = InvertedIndex(texts)
+        k = len(texts)
+        old_vocab = np.asarray(self.vocab, dtype=object)
+        head_vocab = np.asarray(head.vocab, dtype=object)
+        at = np.searchsorted(old_vocab, head_vocab)
+        known = at < len(old_vocab)
+        known[known] = old_vocab[at[known]] == head_vocab[known]
+        added_at = at[~known]
+        vocab = np.insert(old_vocab, added_at, head_vocab[~known])
+
+        # indeksy tokenów w scalonym słowniku
+        old_idx = np.arange(len(old_vocab)) + np.searchsorted(added_at, np.arange(len(old_vocab)), side="right")
+        head_idx = np.empty(len(head_vocab), dtype=np.int64)
+        head_idx[known] = old_idx[at[known]]
+        head_idx[~known] = added_at + np.arange(len(added_at))
+
+        old_cnt, head_cnt = np.diff(self.offsets), np.diff(head.offsets)
+        cnt = np.zeros(len(vocab), dtype=np.int64)
+        cnt[head_idx] = head_cnt
+        head_in_block = cnt[old_idx]
+        cnt[old_idx] += old_cnt
+        offsets = np.append(0, np.cumsum(cnt))
+
+        postings = np.empty(int(offsets[-1]), dtype=np.int64)
+        postings[np.repeat(offsets[head_idx] - head.offsets[:-1], head_cnt) + np.arange(len(head.postings))] = \
+            head.postings
+        postings[np.repeat(offsets[old_idx] + head_in_block - self.offsets[:-1], old_cnt)
+                 + np.arange(len(self.postings))] = self.postings + k
+
+        out = InvertedIndex.__new__(InvertedIndex)
+        out._set_csr(vocab.tolist(), offsets, postings)
+        return out
+
+    def infix(self, term: str) -> np.ndarray:
+        """Pozycje tweetów z tokenem zawierającym term w dowolnym miejscu (posortowane, unikalne)."""
+        found = [m.start() for m in re.finditer(re.escape(term), self.vocab_text)]
+        if not found:
+            return np.empty(0, dtype=np.int64)
+        ids = np.unique(np.searchsorted(self.vocab_starts, found, side="right") - 1)
+        if len(ids) == 1:
+            return self.postings[self.offsets[ids[0]]:self.offsets[ids[0] + 1]]
+        return np.unique(np.concatenate([self.postings[self.offsets[i]:self.offsets[i + 1]] for i in ids]))
+
+    def search(self, q: str):
+        """AND po słowach zapytania (każde jako fragment tokenu). None, gdy zapytania nie da się wyrazić tokenami."""
+        if not SIMPLE_QUERY_RE.fullmatch(q):
+            return None
+        result = None
+        # najdłuższe słowa najpierw — zwykle najbardziej selektywne
+        for term in sorted(set(TOKEN_RE.findall(q.lower())), key=len, reverse=True):
+            hits = self.infix(term)
+            result = hits if result is None else np.intersect1d(result, hits, assume_unique=True)
+            if not len(result):
+                break
+        return result
+
+
+class TweetIndex:
+    """
+    Indeks na ramce tweetów (kolejność jak w ramce: od najnowszych). Migawka tylko do odczytu —
+    appended() buduje nową z dopisanymi tweetami, przesuwając istniejące tablice zamiast liczyć je od nowa.
+    """
+
+    ROW_ARRAYS = ("year", "tweet_ids", "created_ts", "texts", "created_display")
+
+    def __init__(self, df: pd.DataFrame, display_tz=None, cache_size: int = RESULT_CACHE_SIZE):
+        self.df = df.reset_index(drop=True)
+        self.display_tz = display_tz
+        n = len(self.df)
+
+        rows = self._row_arrays(self.df, display_tz)
+        self.flags = rows["flags"]
+        for name in self.ROW_ARRAYS:
+            setattr(self, name, rows[name])
+        self.years = sorted(np.unique(self.year).tolist(), reverse=True)
+        self.year_positions = {int(y): np.flatnonzero(self.year == y) for y in self.years}
+        self.all_positions = np.arange(n)
+
+        # tweet_id -> ranga liczona od najstarszego wiersza (przy duplikatach wygrywa pierwszy w ramce, jak dawne
+        # row.iloc[0]); pozycja = len - 1 - ranga, więc dopisanie nowszych tweetów na początek rang nie zmienia
+        self._rank_by_id = dict(zip(self.tweet_ids[::-1].tolist(), range(n)))
+        self.text_index = InvertedIndex(self.texts)
+        self._init_cache(cache_size)
+
+    def _init_cache(self, cache_size: int):
+        self._cache = OrderedDict()
+        self._cache_size = cache_size
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _row_arrays(df: pd.DataFrame, display_tz) -> dict:
+        """Tablice per wiersz ramki: flagi (bool), rok, id (tekst), czas unix s, tekst, data do wyświetlenia."""
+        n = len(df)
+        # --- NORMALIZACJA FLAG -> bool (NaN -> False, 0/1/0.0/1.0 -> False/True) ---
+        flags = {}
+        for col in FLAG_COLUMNS:
+            if col in df.columns:
+                s = df[col]
+                flags[col] = (s.notna() & s.where(s.notna(), False).astype(bool)).to_numpy()
+            else:
+                flags[col] = np.zeros(n, dtype=bool)
+
+        created = pd.to_datetime(df["created_at"], utc=True) if n else pd.Series([], dtype="datetime64[ns, UTC]")
+        local = created.dt.tz_convert(display_tz) if (n and display_tz is not None) else created
+        return {
+            "flags": flags,
+            "year": created.dt.year.to_numpy(dtype=np.int64) if n else np.empty(0, dtype=np.int64),
+            "tweet_ids": df["tweet_id"].astype(str).to_numpy() if n else np.empty(0, dtype=object),
+            "created_ts": (created.astype("int64").to_numpy() // 10**9) if n else np.empty(0, dtype=np.int64),
+            "texts": df["text"].to_numpy() if n else np.empty(0, dtype=object),
+            "created_display": (local.dt.strftime("%Y-%m-%d %H:%M:%S %Z").to_numpy() if n
+                                else np.empty(0, dtype=object)),
+        }
+
+    def __len__(self):
+        return len(self.df)
+
+    def appended(self, new: pd.DataFrame) -> "TweetIndex":
+        """
+        Migawka z dopisanymi tweetami new (kolumny jak df), bez id już obecnych; self, gdy nic nowego.
+        Zwykłe dopisywanie (nowe nie starsze niż najnowszy dotychczasowy) trafia na początek: tablice
+        i postings są doklejane / przesuwane o len(new), tokenizujemy i formatujemy tylko nowe wiersze.
+        Starsze tweety w środku historii -> pełna budowa na scalonej ramce.
+        """
+        ranks = self._rank_by_id
+        new = new[np.fromiter((t not in ranks for t in new["tweet_id"].astype(str)), dtype=bool, count=len(new))]
+        if new.empty:
+            return self
+        new = new.sort_values("created_at", ascending=False, kind="stable").reset_index(drop=True)
+        n, k = len(self.df), len(new)
+        if not n or new["created_at"].iloc[-1] < self.df["created_at"].iloc[0]:
+            merged = pd.concat([new, self.df], ignore_index=True) if n else new
+            return TweetIndex(merged.sort_values("created_at", ascending=False, kind="stable"),
+                              self.display_tz, self._cache_size)
+
+        out = TweetIndex.__new__(TweetIndex)
+        out.df = pd.concat([new, self.df], ignore_index=True)
+        out.display_tz = self.display_tz
+        rows = self._row_arrays(new, self.display_tz)
+        out.flags = {col: np.concatenate([rows["flags"][col], self.flags[col]]) for col in FLAG_COLUMNS}
+        for name in self.ROW_ARRAYS:
+            setattr(out, name, np.concatenate([rows[name], getattr(self, name)]))
+        out.years = sorted(set(self.years) | set(np.unique(rows["year"]).tolist()), reverse=True)
+        out.year_positions = {
+            y: np.concatenate([np.flatnonzero(rows["year"] == y),
+                               self.year_positions.get(y, self.all_positions[:0]) + k])
+            for y in out.years}
+        out.all_positions = np.arange(n + k)
+        out._rank_by_id = dict(ranks)   # kopia — stara migawka obsługuje jeszcze trwające żądania
+        out._rank_by_id.update(zip(rows["tweet_ids"][::-1].tolist(), range(n, n + k)))
+        out.text_index = self.text_index.prepended(rows["texts"])
+        out._init_cache(self._cache_size)
+        return out
+
+    # --- filtry ---
+    def _flag_filter(self, pos: np.ndarray, col: str, mode: int) -> np.ndarray:
+        """mode: 1 = tylko z flagą, -1 = tylko bez flagi, inne = bez filtra."""
+        if mode == 1:
+            return pos[self.flags[col][pos]]
+        if mode == -1:
+            return pos[~self.flags[col][pos]]
+        return pos
+
+    def _text_filter(self, pos: np.ndarray, q: str) -> np.ndarray:
+        if not q or not len(pos):
+            return pos
+        hits = self.text_index.search(q)
+        if hits is not None:
+            return np.intersect1d(pos, hits, assume_unique=True)
+        # fallback: zwykły substring (bez regexów), tylko po już przefiltrowanych pozycjach
+        mask = pd.Series(self.texts[pos], dtype=object).str.contains(q, case=False, regex=False, na=False)
+        return pos[mask.to_numpy(dtype=bool)]
+
+    def _compute(self, year, f_reply: int, f_retweet: int, f_quote: int, q: str) -> np.ndarray:
+        if q:
+            # filtry bez q też idą przez LRU — kolejne litery zapytania nie liczą flag od nowa
+            return self._text_filter(self.query(year, f_reply, f_retweet, f_quote, ""), q)
+        pos = self.all_positions if year is None else self.year_positions.get(year, self.all_positions[:0])
+        pos = self._flag_filter(pos, "isReply", f_reply)
+        pos = self._flag_filter(pos, "isRetweet", f_retweet)
+        return self._flag_filter(pos, "isQuote", f_quote)
+
+    def query(self, year=None, f_reply: int = 0, f_retweet: int = 0, f_quote: int = 0, q: str = "") -> np.ndarray:
+        """Pozycje tweetów spełniających filtry (rosnąco = od najnowszych). Wynik z LRU, tylko do odczytu."""
+        key = (year, f_reply, f_retweet, f_quote, q or "")
+        with self._lock:
+            hit = self._cache.get(key)
+            if hit is not None:
+                self._cache.move_to_end(key)
+                return hit
+        pos = self._compute(*key)
+        pos.flags.writeable = False
+        with self._lock:
+            self._cache[key] = pos
+            while len(self._cache) > self._cache_size:
+                self._cache.popitem(last=False)
+        return pos
+
+    # --- pojedynczy tweet + nawigacja ---
+    def position(self, tweet_id):
+        """Pozycja tweeta po id (słownik) albo None."""
+        rank = self._rank_by_id.get(str(tweet_id))
+        return None if rank is None else len(self) - 1 - rank
+
+    def positions(self, tweet_ids) -> np.ndarray:
+        """Pozycje wielu tweetów po id (-1 = brak)."""
+        ranks, last = self._rank_by_id, len(self) - 1
+        return np.fromiter((last - ranks[t] if t in ranks else -1 for t in map(str, tweet_ids)),
+                           dtype=np.int64, count=len(tweet_ids))
+
+    def neighbors(self, i: int, positions=None):
+        """
+        (poprzedni, następny) wokół pozycji i w danej liście pozycji (domyślnie: wszystkie tweety).
+        Gdy i nie należy do listy — sąsiedzi miejsca, w którym by się znalazł.
+        """
+        positions = self.all_positions if positions is None else positions
+        k = int(np.searchsorted(positions, i, side="left"))
+        prev_pos = int(positions[k - 1]) if k > 0 else None
+        if k < len(positions) and positions[k] == i:
+            k += 1
+        next_pos = int(positions[k]) if k < len(positions) else None
+        return prev_pos, next_pos
+
+    def detail(self, i: int, positions=None) -> dict:
+        prev_pos, next_pos = self.neighbors(i, positions)
+        return {
+            "tweet_id": self.tweet_ids[i],
+            "text": self.texts[i],
+            "isReply": bool(self.flags["isReply"][i]),
+            "isRetweet": bool(self.flags["isRetweet"][i]),
+            "isQuote": bool(self.flags["isQuote"][i]),
+            "created_ts": int(self.created_ts[i]),
+            "created_display": self.created_display[i],
+            "prev_id": None if prev_pos is None else self.tweet_ids[prev_pos],
+            "next_id": None if next_pos is None else self.tweet_ids[next_pos],
+        }
+
+    # --- wiersze do JSON ---
+    def item(self, i: int) -> dict:
+        return {
+            "tweet_id": self.tweet_ids[i],
+            "text": self.texts[i],
+            "created_at_display": self.created_display[i],
+            "isReply": bool(self.flags["isReply"][i]),
+            "isRetweet": bool(self.flags["isRetweet"][i]),
+            "isQuote": bool(self.flags["isQuote"][i]),
+            "year": int(self.year[i]),
+        }
+
+    def items(self, positions) -> list:
+        return [self.item(int(i)) for i in positions]
@@ -0,0 +1,222 @@
+# tweets.py — wspólne wczytywanie tweetów (all_musk_posts.csv) dla app.py i export_dataset.py
+# + binarny snapshot znormalizowanej tabeli (.npy) przebudowywany tylko gdy zmieni się plik CSV
+import os, json
+import numpy as np
+import pandas as pd
+
+from prices import cache_lock
+from price_store import NS_PER_MIN
+
+TWEET_COLUMNS = ["tweet_id", "text", "created_at", "isReply", "isRetweet", "isQuote"]
+FLAG_COLUMNS = ["isReply", "isRetweet", "isQuote"]
+# kolumny źródłowe, które w ogóle czytamy (reszta pliku — likeCount, lang, … — jest pomijana)
+SOURCE_COLUMNS = ["id", "fullText", "text", "createdAt"] + FLAG_COLUMNS
+
+# godziny sesji (czas PL, uwzględnia DST): minuty doby [15:35, 21:50]
+SESSION_TZ = "Europe/Warsaw"
+SESSION_MINUTES = (15 * 60 + 35, 21 * 60 + 50)
+
+SNAPSHOT_VERSION = 1
+SNAPSHOT_MANIFEST = "manifest.json"
+STRING_SEP = "\x00"
+
+
+def empty_tweets() -> pd.DataFrame:
+    return pd.DataFrame(columns=TWEET_COLUMNS)
+
+
+# ===== Parsowanie CSV =====
+def _read_arrow(path: str, present: list) -> pd.DataFrame:
+    """Szybka ścieżka: pyarrow.csv z jawnymi typami (wielowątkowo). ValueError, gdy wartość nie pasuje do typu."""
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    from pyarrow import csv as pa_csv
+
+    types = {"id": pa.int64(), "fullText": pa.string(), "text": pa.string(),
+             "createdAt": pa.timestamp("ns", tz="UTC"), **{f: pa.bool_() for f in FLAG_COLUMNS}}
+    # teksty tweetów mogą zawierać znaki nowej linii w cudzysłowie (jak w pd.read_csv)
+    table = pa_csv.read_csv(path, parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+                            convert_options=pa_csv.ConvertOptions(
+                                include_columns=present, column_types={c: types[c] for c in present}))
+    out = {}
+    for col in present:
+        arr = table.column(col)
+        if col in FLAG_COLUMNS:
+            arr = pc.fill_null(arr, False)
+        out[col] = arr.to_pandas()
+    return pd.DataFrame(out)
+
+
+def _read_pandas(path: str, present: list) -> pd.DataFrame:
+    """Fallback (bez pyarrow albo nietypowe wartości): silnik C, tylko potrzebne kolumny."""
+    text_cols = {c: str for c in ("fullText", "text", "createdAt") if c in present}
+    return pd.read_csv(path, usecols=present, dtype=text_cols, low_memory=False)
+
+
+def read_tweets_csv(path: str) -> pd.DataFrame:
+    """Surowe kolumny SOURCE_COLUMNS obecne w pliku (bez normalizacji)."""
+    header = list(pd.read_csv(path, nrows=0).columns)
+    present = [c for c in SOURCE_COLUMNS if c in header]
+    try:
+        return _read_arrow(path, present)
+    except (ImportError, ValueError):   # ArrowInvalid dziedziczy po ValueError
+        return _read_pandas(path, present)
+
+
+def normalize_tweets(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Surowe wiersze CSV -> TWEET_COLUMNS w kolejności pliku: created_at tz-aware UTC (wiersze bez
+    daty odrzucone), text bez NaN, flagi bool (brak = False).
+    """
+    if "createdAt" not in df.columns:
+        raise ValueError("Brakuje kolumny 'createdAt' w pliku z tweetami.")
+    out = pd.DataFrame({
+        "tweet_id": df["id"] if "id" in df.columns else np.arange(1, len(df) + 1),
+        "text": (df["fullText"] if "fullText" in df.columns else df["text"] if "text" in df.columns
+                 else pd.Series("", index=df.index)).fillna("").astype(str),
+        "created_at": pd.to_datetime(df["createdAt"], errors="coerce", utc=True),
+    })
+    for flag in FLAG_COLUMNS:
+        out[flag] = df[flag].where(df[flag].notna(), False).astype(bool) if flag in df.columns else False
+    return out.dropna(subset=["created_at"]).reset_index(drop=True)
+
+
+# ===== Filtry =====
+def session_mask(created_at, tz: str = SESSION_TZ, minutes=SESSION_MINUTES) -> np.ndarray:
+    """
+    Tweety z godzin sesji: minuta doby czasu lokalnego (int64) w [minutes[0], minutes[1]].
+    Jedna konwersja strefy + arytmetyka na int64 zamiast wielu akcesorów dt.hour / dt.minute.
+    """
+    local = pd.DatetimeIndex(created_at).tz_convert(tz).tz_localize(None)
+    minute_of_day = local.asi8 // NS_PER_MIN % (24 * 60)
+    return (minute_of_day >= minutes[0]) & (minute_of_day <= minutes[1])
+
+
+def filter_tweets(df: pd.DataFrame, prices_min, prices_max=None, session: bool = False,
+                  ascending: bool = True) -> pd.DataFrame:
+    """
+    Tabela po normalize_tweets -> zakres [prices_min, prices_max] (None = bez górnej granicy),
+    opcjonalnie tylko godziny sesji, posortowana po created_at (stabilnie).
+    """
+    keep = (df["created_at"] >= pd.to_datetime(prices_min, utc=True)).to_numpy()
+    if prices_max is not None:
+        keep &= (df["created_at"] <= pd.to_datetime(prices_max, utc=True)).to_numpy()
+    if session and len(df):
+        keep &= session_mask(df["created_at"])
+    return (df[keep].sort_values("created_at", ascending=ascending, kind="stable")
+            .reset_index(drop=True))
+
+
+# ===== Snapshot binarny =====
+# Układ: <data>/.cache/tweets-<nazwa_pliku>/{tweet_id,created_at,isReply,isRetweet,isQuote,text_lengths}.npy
+# + text.bin (UTF-8 wszystkich tekstów sklejonych separatorem, długości w text_lengths) + manifest.json z
+# (mtime_ns, rozmiar) pliku źródłowego. tweet_id jako int64 albo — gdy id nie są liczbami — jak tekst.
+def snapshot_dir_for(csv_path: str) -> str:
+    csv_path = os.path.abspath(csv_path)
+    stem = os.path.splitext(os.path.basename(csv_path))[0]
+    return os.path.join(os.path.dirname(csv_path), ".cache", f"tweets-{stem}")
+
+
+def source_signature(csv_path: str) -> list:
+    st = os.stat(csv_path)
+    return [st.st_mtime_ns, st.st_size]
+
+
+def _save_strings(snap_dir: str, name: str, values):
+    """Teksty sklejone separatorem STRING_SEP (UTF-8) + długości (do odczytu, gdy separator jest w tekście)."""
+    values = [str(v) for v in values]
+    np.save(os.path.join(snap_dir, f"{name}_lengths.npy"), np.fromiter(map(len, values), dtype=np.int64,
+                                                                        count=len(values)))
+    with open(os.path.join(snap_dir, f"{name}.bin"), "wb") as f:
+        f.write(STRING_SEP.join(values).encode("utf-8"))
+
+
+def _load_strings(snap_dir: str, name: str) -> np.ndarray:
+    lengths = np.load(os.path.join(snap_dir, f"{name}_lengths.npy"))
+    with open(os.path.join(snap_dir, f"{name}.bin"), "rb") as f:
+        blob = f.read().decode("utf-8")
+    out = np.empty(len(lengths), dtype=object)
+    if not len(lengths):
+        return out
+    parts = blob.split(STRING_SEP)
+    if len(parts) != len(lengths):   # separator wewnątrz któregoś tekstu — cięcie po długościach
+        starts = np.concatenate([[0], np.cumsum(lengths[:-1] + 1)]).tolist()
+        parts = [blob[a:a + n] for a, n in zip(starts, lengths.tolist())]
+    out[:] = parts
+    return out
+
+
+def write_snapshot(snap_dir: str, signature: list, df: pd.DataFrame):
+    """Zapis do katalogu tymczasowego i podmiana całości; manifest na końcu."""
+    tmp = f"{snap_dir}.{os.getpid()}.tmp"
+    os.makedirs(tmp, exist_ok=True)
+    ids = df["tweet_id"]
+    id_kind = "int" if pd.api.types.is_integer_dtype(ids) else "str"
+    if id_kind == "int":
+        np.save(os.path.join(tmp, "tweet_id.npy"), ids.to_numpy(dtype=np.int64))
+    else:
+        _save_strings(tmp, "tweet_id", ids)
+    _save_strings(tmp, "text", df["text"])
+    np.save(os.path.join(tmp, "created_at.npy"), df["created_at"].astype("int64").to_numpy())
+    for flag in FLAG_COLUMNS:
+        np.save(os.path.join(tmp, f"{flag}.npy"), df[flag].to_numpy(dtype=bool))
+    with open(os.path.join(tmp, SNAPSHOT_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump({"version": SNAPSHOT_VERSION, "source": signature, "rows": int(len(df)),
+                   "id_kind": id_kind}, f)
+
+    old = f"{snap_dir}.{os.getpid()}.old"
+    if os.path.isdir(snap_dir):
+        os.replace(snap_dir, old)
+    os.replace(tmp, snap_dir)
+    if os.path.isdir(old):
+        for name in os.listdir(old):
+            os.remove(os.path.join(old, name))
+        os.rmdir(old)
+
+
+def read_snapshot(snap_dir: str, signature: list):
+    """Tabela jak normalize_tweets albo None, gdy snapshotu brak / nieaktualny / uszkodzony."""
+    try:
+        with open(os.path.join(snap_dir, SNAPSHOT_MANIFEST), encoding="utf-8") as f:
+            manifest = json.load(f)
+        if manifest.get("version") != SNAPSHOT_VERSION or manifest.get("source") != signature:
+            return None
+        ids = (np.load(os.path.join(snap_dir, "tweet_id.npy")) if manifest.get("id_kind") == "int"
+               else _load_strings(snap_dir, "tweet_id"))
+        df = pd.DataFrame({
+            "tweet_id": ids,
+            "text": _load_strings(snap_dir, "text"),
+            "created_at": pd.DatetimeIndex(np.load(os.path.join(snap_dir, "created_at.npy")).view("M8[ns]"))
+                          .tz_localize("UTC"),
+            **{flag: np.load(os.path.join(snap_dir, f"{flag}.npy")) for flag in FLAG_COLUMNS},
+        })
+    except (OSError, ValueError, UnicodeDecodeError):
+        return None
+    return df if len(df) == manifest.get("rows") else None
+
+
+def load_tweet_table(csv_path: str, use_cache: bool = True, snap_dir: str = None) -> pd.DataFrame:
+    """
+    Znormalizowana tabela tweetów (normalize_tweets) w kolejności pliku, jeszcze bez filtrów
+    zakresu / sesji. Przy aktualnym snapshocie — bez parsowania CSV.
+    snap_dir – gdzie trzymać snapshot (domyślnie data/.cache/tweets-<nazwa_pliku>).
+    """
+    if not use_cache:
+        return normalize_tweets(read_tweets_csv(csv_path))
+    snap_dir = snap_dir or snapshot_dir_for(csv_path)
+    signature = source_signature(csv_path)
+    df = read_snapshot(snap_dir, signature)
+    if df is not None:
+        return df
+
+    with cache_lock(snap_dir):
+        df = read_snapshot(snap_dir, signature)   # zbudowany przez inny proces w międzyczasie
+        if df is not None:
+            return df
+        print(f"[tweets] buduję snapshot {snap_dir}…")
+        df = normalize_tweets(read_tweets_csv(csv_path))
+        try:
+            write_snapshot(snap_dir, signature, df)
+        except OSError as e:
+            print(f"[tweets] nie zapisano snapshotu {snap_dir}: {e}")
+    return df
@@ -0,0 +1,78 @@
+# warmup.py — stan rozgrzewania danych w tle (etapy: tweety, ceny)
+# Import app.py nie czeka na parsowanie danych: etapy lecą w wątku, /health pokazuje postęp,
+# a endpointy sprawdzają ready(etap) i do tego czasu odpowiadają szybkim 503 "warming_up".
+import time, threading, traceback
+
+PENDING, LOADING, READY, FAILED = "pending", "loading", "ready", "error"
+
+
+class Warmup:
+    def __init__(self, stages):
+        self._lock = threading.Lock()
+        self._events = {name: threading.Event() for name in stages}
+        self._state = {name: {"state": PENDING, "done": 0, "total": None, "seconds": None, "error": None}
+                       for name in stages}
+        self._started = {}
+        self.thread = None
+
+    # --- przejścia stanów (wołane z wątku rozgrzewania) ---
+    def begin(self, name: str):
+        with self._lock:
+            self._state[name].update(state=LOADING, done=0, total=None, error=None)
+            self._started[name] = time.perf_counter()
+
+    def progress(self, name: str, done: int, total: int = None):
+        with self._lock:
+            self._state[name].update(done=int(done), total=None if total is None else int(total))
+
+    def finish(self, name: str):
+        with self._lock:
+            st = self._state[name]
+            st.update(state=READY, seconds=round(time.perf_counter() - self._started.get(name, 0.0), 3))
+            if st["total"] is not None:
+                st["done"] = st["total"]
+        self._events[name].set()
+
+    def fail(self, name: str, error: BaseException):
+        with self._lock:
+            self._state[name].update(state=FAILED, error=f"{type(error).__name__}: {error}")
+        # oczekujący nie wiszą w nieskończoność — ready() i tak zwróci False
+        self._events[name].set()
+
+    # --- odczyt ---
+    def ready(self, name: str = None) -> bool:
+        with self._lock:
+            names = [name] if name else list(self._state)
+            return all(self._state[n]["state"] == READY for n in names)
+
+    def wait(self, name: str = None, timeout: float = None) -> bool:
+        """Czeka na etap (albo wszystkie); True, gdy gotowe. Przy błędzie etapu wraca od razu (False)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for n in ([name] if name else list(self._events)):
+            left = None if deadline is None else max(0.0, deadline - time.monotonic())
+            if not self._events[n].wait(left):
+                return False
+        return self.ready(name)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {name: dict(st) for name, st in self._state.items()}
+
+    # --- uruchomienie ---
+    def run(self, steps):
+        """steps: lista (etap, funkcja); etapy po kolei, błąd etapu nie blokuje następnych."""
+        for name, fn in steps:
+            self.begin(name)
+            try:
+                fn()
+            except Exception as e:
+                traceback.print_exc()
+                print(f"[startup] etap {name} nieudany: {e}")
+                self.fail(name, e)
+            else:
+                self.finish(name)
+
+    def start(self, steps) -> threading.Thread:
+        self.thread = threading.Thread(target=self.run, args=(steps,), name="warmup", daemon=True)
+        self.thread.start()
+        return self.thread